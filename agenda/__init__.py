@@ -0,0 +1 @@
+"""Núcleo compartilhado pelos sistemas de agendamento (isa3.py e webcrudpetPY.py)"""
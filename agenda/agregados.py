@@ -0,0 +1,134 @@
+"""Agregados de faturamento por dia, por mês e geral, mantidos incrementalmente"""
+import math
+
+# Chave do grupo que acumula todo o histórico
+GERAL = 'geral'
+
+
+def centavos(valor):
+    """Converte um valor em reais para centavos inteiros (ValueError se não for finito)"""
+    em_centavos = float(valor) * 100
+    if not math.isfinite(em_centavos):
+        raise ValueError(f'valor fora do intervalo: {valor}')
+    return round(em_centavos)
+
+
+def chaves_do_agendamento(agendamento):
+    """Grupos afetados por um agendamento: o dia, o mês e o geral"""
+    data = agendamento.data
+    return (data, data[:7], GERAL)
+
+
+def _grupo_vazio():
+    return {'quantidade': 0, 'total': 0, 'taxas': 0, 'servicos': {}, 'clientes': {}}
+
+
+class Agregados:
+    """Totais (em centavos) por dia, mês e geral.
+
+    ``precificar`` recebe um agendamento e devolve ``(valor_servico, taxa)``;
+    cada inclusão soma a contribuição do agendamento nos grupos dele e cada
+    exclusão subtrai, então consultar um grupo custa O(1).
+    """
+
+    def __init__(self, precificar, assinatura_precos=None):
+        self.precificar = precificar
+        self.assinatura_precos = assinatura_precos
+        self.grupos = {}
+
+    def adicionar(self, agendamento):
+        """Soma o agendamento nos grupos dele"""
+        self._aplicar(agendamento, 1)
+
+    def remover(self, agendamento):
+        """Subtrai o agendamento dos grupos dele"""
+        self._aplicar(agendamento, -1)
+
+    def _aplicar(self, agendamento, sinal):
+        valor_servico, taxa = self.precificar(agendamento)
+        taxa = centavos(taxa)
+        total = centavos(valor_servico) + taxa
+        servico = getattr(agendamento, 'servico', None)
+        cliente = getattr(agendamento, 'cliente', None)
+
+        for chave in chaves_do_agendamento(agendamento):
+            grupo = self.grupos.get(chave)
+            if grupo is None:
+                grupo = self.grupos[chave] = _grupo_vazio()
+            grupo['quantidade'] += sinal
+            grupo['total'] += sinal * total
+            grupo['taxas'] += sinal * taxa
+
+            por_servico = grupo['servicos'].setdefault(servico, [0, 0])
+            por_servico[0] += sinal
+            por_servico[1] += sinal * total
+            if por_servico[0] == 0:
+                del grupo['servicos'][servico]
+
+            grupo['clientes'][cliente] = grupo['clientes'].get(cliente, 0) + sinal
+            if grupo['clientes'][cliente] == 0:
+                del grupo['clientes'][cliente]
+
+            if grupo['quantidade'] == 0:
+                del self.grupos[chave]
+
+    def resumo(self, chave):
+        """Totais de um grupo convertidos para reais"""
+        return resumir(self.grupos.get(chave))
+
+    def exportar(self, chaves=None):
+        """Grupos em formato JSON (todos, ou só as chaves pedidas)"""
+        if chaves is None:
+            return {'precos': self.assinatura_precos, 'grupos': self.grupos}
+        return {chave: self.grupos.get(chave) for chave in chaves}
+
+    def importar(self, dados):
+        """Restaura grupos salvos; devolve False se eles não servirem mais"""
+        if not dados or dados.get('precos') != self.assinatura_precos:
+            return False
+        self.grupos = dados['grupos']
+        return True
+
+    def reconstruir(self, agendamentos):
+        """Recalcula todos os grupos do zero"""
+        self.grupos = {}
+        for agendamento in agendamentos:
+            self.adicionar(agendamento)
+
+
+def totais_por_dia(grupos):
+    """(dia, quantidade, total, taxas) dos grupos diários, em centavos e em ordem de data"""
+    return sorted(
+        (chave, grupo['quantidade'], grupo['total'], grupo['taxas'])
+        for chave, grupo in grupos.items() if len(chave) == 10
+    )
+
+
+def resumir(grupo):
+    """Converte um grupo (em centavos) no resumo em reais; None vira um resumo zerado"""
+    grupo = grupo or _grupo_vazio()
+    return {
+        'quantidade': grupo['quantidade'],
+        'total': grupo['total'] / 100,
+        'taxas': grupo['taxas'] / 100,
+        'servicos': {servico: (qtd, receita / 100) for servico, (qtd, receita) in grupo['servicos'].items()},
+        'clientes': dict(grupo['clientes'])
+    }
+
+
+def somar_grupos(grupos):
+    """Junta grupos disjuntos (por exemplo, o geral de cada mês) em um só"""
+    soma = _grupo_vazio()
+    for grupo in grupos:
+        if not grupo:
+            continue
+        soma['quantidade'] += grupo['quantidade']
+        soma['total'] += grupo['total']
+        soma['taxas'] += grupo['taxas']
+        for servico, (quantidade, receita) in grupo['servicos'].items():
+            por_servico = soma['servicos'].setdefault(servico, [0, 0])
+            por_servico[0] += quantidade
+            por_servico[1] += receita
+        for cliente, quantidade in grupo['clientes'].items():
+            soma['clientes'][cliente] = soma['clientes'].get(cliente, 0) + quantidade
+    return soma
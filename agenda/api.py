@@ -0,0 +1,466 @@
+"""API HTTP local (ASGI) sobre o mesmo repositório das interfaces.
+
+Rotas (respostas em JSON):
+
+    GET    /saude
+    GET    /agendamentos?de=&ate=&tamanho=&cursor=&ordem=asc|desc
+    POST   /agendamentos
+    GET    /agendamentos/{id}
+    PUT    /agendamentos/{id}        (só os campos enviados mudam)
+    DELETE /agendamentos/{id}
+    GET    /pesquisa?termo=&limite=
+    GET    /disponibilidade?data=&servico=
+    GET    /saldo/dia?data=           (studio)
+    GET    /saldo/mes?ano=&mes=       (studio)
+    GET    /estatisticas/mes?ano=&mes= (studio)
+
+Os handlers são assíncronos; o repositório (o mesmo objeto em cache usado
+pelas páginas, ver ``abrir_repositorio``) é acessado por um pool pequeno
+de threads, para o laço de eventos nunca esperar o disco. As gravações
+passam por uma fila única: as inclusões que chegam enquanto a anterior
+grava são conferidas e gravadas juntas, com um único ``inserir_lote``.
+Pesquisas repetidas são reaproveitadas até a próxima gravação.
+
+Uso: python -m agenda.api studio|pet [--porta 8000] [--backend json] [--dados arquivo.json]
+(precisa do uvicorn, importado só na hora de servir)
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from urllib.parse import parse_qs
+
+from agenda import gravacao, studio
+from agenda.repositorio import BACKENDS
+from agenda.transferencia import ESQUEMAS, conferir_lote, validar
+
+# Threads que acessam o repositório (as consultas já se revezam na trava dele)
+TRABALHADORES = 4
+
+# Máximo de gravações aplicadas de uma vez pelo escritor
+LIMITE_LOTE = 500
+
+TAMANHO_PAGINA = 50
+LIMITE_PAGINA = 500
+LIMITE_PESQUISA = 100
+
+# Pesquisas lembradas (por termo e limite) enquanto o repositório não muda
+LIMITE_PESQUISAS_GUARDADAS = 256
+
+
+class ErroHTTP(Exception):
+    """Erro com status HTTP e mensagem para o cliente"""
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+def _inteiro(parametros, nome, padrao=None, minimo=None, maximo=None):
+    """Parâmetro inteiro da query string (400 se não for número ou estiver fora de ``minimo``..``maximo``)"""
+    valor = parametros.get(nome, padrao)
+    if valor is None:
+        raise ErroHTTP(400, f'parâmetro obrigatório: {nome}')
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        raise ErroHTTP(400, f'parâmetro inválido: {nome}')
+    if (minimo is not None and valor < minimo) or (maximo is not None and valor > maximo):
+        raise ErroHTTP(400, f'parâmetro fora do intervalo {minimo}..{maximo}: {nome}')
+    return valor
+
+
+def _obrigatorio(parametros, nome):
+    """Parâmetro de texto obrigatório da query string"""
+    valor = parametros.get(nome)
+    if not valor:
+        raise ErroHTTP(400, f'parâmetro obrigatório: {nome}')
+    return valor
+
+
+def _data(parametros, nome, obrigatoria=False):
+    """Parâmetro de data 'YYYY-MM-DD' da query string (400 se não for uma data válida)"""
+    valor = _obrigatorio(parametros, nome) if obrigatoria else parametros.get(nome)
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor).isoformat()
+    except ValueError:
+        raise ErroHTTP(400, f'parâmetro inválido: {nome}')
+
+
+def _cursor_de_texto(texto):
+    """'inicio.id' -> (inicio, id)"""
+    try:
+        inicio, id_agendamento = texto.split('.')
+        return int(inicio), int(id_agendamento)
+    except ValueError:
+        raise ErroHTTP(400, 'cursor inválido')
+
+
+def _para_json(objeto):
+    """Registros (Agendamento/AgendamentoPet) viram o dicionário do formato JSON"""
+    if hasattr(objeto, 'para_dict'):
+        return objeto.para_dict()
+    raise TypeError(f'{type(objeto).__name__} não é serializável')
+
+
+class EscritorEmLote:
+    """Fila única de gravações, aplicadas em ordem por uma só tarefa.
+
+    Inclusões seguidas na fila viram um lote: conferidas dia a dia (como na
+    importação) e gravadas com um único ``inserir_lote``. Edições e
+    exclusões são aplicadas uma a uma, na ordem em que chegaram.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.fila = None
+        self.tarefa = None
+        self.lotes = 0
+        self.gravacoes = 0
+
+    async def enviar(self, operacao, *argumentos):
+        """Põe a gravação na fila e espera o resultado (ou a exceção)"""
+        if self.tarefa is None:
+            self.fila = asyncio.Queue()
+            self.tarefa = asyncio.get_running_loop().create_task(self._rodar())
+        futuro = asyncio.get_running_loop().create_future()
+        await self.fila.put((operacao, argumentos, futuro))
+        return await futuro
+
+    async def _rodar(self):
+        laco = asyncio.get_running_loop()
+        while True:
+            pedidos = [await self.fila.get()]
+            # O que chegou enquanto o lote anterior gravava vai junto
+            while len(pedidos) < LIMITE_LOTE and not self.fila.empty():
+                pedidos.append(self.fila.get_nowait())
+            resultados = await laco.run_in_executor(self.api.executor, self._aplicar, pedidos)
+            for (_, _, futuro), resultado in zip(pedidos, resultados):
+                if futuro.cancelled():
+                    continue
+                if isinstance(resultado, Exception):
+                    futuro.set_exception(resultado)
+                else:
+                    futuro.set_result(resultado)
+
+    def _aplicar(self, pedidos):
+        """Aplica os pedidos em ordem (na thread do pool); devolve um resultado por pedido"""
+        repositorio = self.api.repositorio()
+        resultados = [None] * len(pedidos)
+        posicao = 0
+        while posicao < len(pedidos):
+            operacao, argumentos, _ = pedidos[posicao]
+            if operacao != 'criar':
+                try:
+                    resultados[posicao] = getattr(self.api, '_' + operacao)(repositorio, *argumentos)
+                except Exception as e:
+                    resultados[posicao] = e
+                posicao += 1
+                continue
+
+            # Inclusões seguidas: um lote só
+            fim = posicao
+            while fim < len(pedidos) and pedidos[fim][0] == 'criar':
+                fim += 1
+            lote = [(indice, None, pedidos[indice][1][0]) for indice in range(posicao, fim)]
+
+            def rejeitar(indice, dados, motivo):
+                resultados[indice] = ErroHTTP(409, motivo)
+
+            try:
+                aceitos = conferir_lote(repositorio, self.api.esquema, lote, rejeitar)
+                if aceitos:
+                    repositorio.inserir_lote(aceitos)
+                for indice, _, agendamento in lote:
+                    if resultados[indice] is None:
+                        resultados[indice] = agendamento
+            except Exception as e:
+                for indice in range(posicao, fim):
+                    resultados[indice] = e
+            self.lotes += 1
+            self.gravacoes += fim - posicao
+            posicao = fim
+        return resultados
+
+
+class API:
+    """Aplicação ASGI de um sistema ('studio' ou 'pet')"""
+
+    def __init__(self, sistema, arquivo=None, backend='json', trabalhadores=TRABALHADORES):
+        self.sistema = sistema
+        self.esquema = ESQUEMAS[sistema]
+        self.arquivo = arquivo or self.esquema.ARQUIVO_DADOS
+        self.backend = backend
+        self.executor = ThreadPoolExecutor(trabalhadores, thread_name_prefix='agenda-api')
+        self.escritor = EscritorEmLote(self)
+        self.pesquisas = {}
+        self.rotas = [
+            ('GET', re.compile(r'/saude'), self.saude),
+            ('GET', re.compile(r'/agendamentos'), self.listar),
+            ('POST', re.compile(r'/agendamentos'), self.criar),
+            ('GET', re.compile(r'/agendamentos/(\d+)'), self.obter),
+            ('PUT', re.compile(r'/agendamentos/(\d+)'), self.atualizar),
+            ('DELETE', re.compile(r'/agendamentos/(\d+)'), self.excluir),
+            ('GET', re.compile(r'/pesquisa'), self.pesquisar),
+            ('GET', re.compile(r'/disponibilidade'), self.disponibilidade),
+            ('GET', re.compile(r'/saldo/dia'), self.saldo_dia),
+            ('GET', re.compile(r'/saldo/mes'), self.saldo_mes),
+            ('GET', re.compile(r'/estatisticas/mes'), self.estatisticas_mes),
+        ]
+
+    def repositorio(self):
+        """Repositório do cache (reaberto se os arquivos mudaram por fora, como nas páginas)"""
+        return self.esquema.abrir(self.arquivo, self.backend)
+
+    async def _ler(self, funcao, *argumentos):
+        """Roda ``funcao(repositorio, *argumentos)`` no pool de threads"""
+        def executar():
+            return funcao(self.repositorio(), *argumentos)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, executar)
+
+    # ASGI
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._ciclo_de_vida(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        corpo = b''
+        while True:
+            mensagem = await receive()
+            corpo += mensagem.get('body', b'')
+            if not mensagem.get('more_body'):
+                break
+        parametros = {
+            chave: valores[-1]
+            for chave, valores in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()
+        }
+
+        try:
+            status, resposta = await self._despachar(scope['method'], scope['path'], parametros, corpo)
+        except ErroHTTP as e:
+            status, resposta = e.status, {'erro': e.mensagem}
+        except Exception as e:
+            status, resposta = 500, {'erro': f'{type(e).__name__}: {e}'}
+
+        if resposta is None:
+            conteudo, cabecalhos = b'', []
+        else:
+            conteudo = json.dumps(resposta, ensure_ascii=False, default=_para_json).encode('utf-8')
+            cabecalhos = [(b'content-type', b'application/json; charset=utf-8')]
+        cabecalhos.append((b'content-length', str(len(conteudo)).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': cabecalhos})
+        await send({'type': 'http.response.body', 'body': conteudo})
+
+    async def _ciclo_de_vida(self, receive, send):
+        """Responde ao protocolo lifespan (no shutdown encerra o pool e espera as gravações adiadas)"""
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensagem['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                gravacao.sincronizar()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _despachar(self, metodo, caminho, parametros, corpo):
+        """Encontra a rota e chama o handler; devolve (status, resposta)"""
+        caminho = caminho.rstrip('/') or '/'
+        metodos = []
+        for metodo_rota, padrao, handler in self.rotas:
+            encontrado = padrao.fullmatch(caminho)
+            if not encontrado:
+                continue
+            if metodo_rota != metodo:
+                metodos.append(metodo_rota)
+                continue
+            argumentos = [int(grupo) for grupo in encontrado.groups()]
+            if metodo in ('POST', 'PUT'):
+                try:
+                    dados = json.loads(corpo or b'{}')
+                except ValueError:
+                    raise ErroHTTP(400, 'corpo JSON inválido')
+                if not isinstance(dados, dict):
+                    raise ErroHTTP(400, 'o corpo deve ser um objeto JSON')
+                argumentos.append(dados)
+            return await handler(parametros, *argumentos)
+        if metodos:
+            raise ErroHTTP(405, f"método não permitido (use {', '.join(metodos)})")
+        raise ErroHTTP(404, 'rota não encontrada')
+
+    def _so_studio(self):
+        if self.esquema is not studio:
+            raise ErroHTTP(404, f'rota disponível só no sistema studio (este é {self.sistema})')
+
+    # Consultas
+
+    async def saude(self, parametros):
+        total = await self._ler(lambda repositorio: repositorio.contar())
+        return 200, {
+            'sistema': self.sistema,
+            'backend': self.backend,
+            'agendamentos': total,
+            'lotes_gravados': self.escritor.lotes,
+            'gravacoes': self.escritor.gravacoes
+        }
+
+    async def listar(self, parametros):
+        tamanho = _inteiro(parametros, 'tamanho', TAMANHO_PAGINA, minimo=1, maximo=LIMITE_PAGINA)
+        cursor = _cursor_de_texto(parametros['cursor']) if parametros.get('cursor') else None
+        crescente = parametros.get('ordem', 'asc') != 'desc'
+        de, ate = _data(parametros, 'de'), _data(parametros, 'ate')
+        pagina, proximo = await self._ler(
+            lambda repositorio: repositorio.pagina(tamanho, cursor, de, ate, crescente=crescente)
+        )
+        return 200, {
+            'agendamentos': pagina,
+            'proximo_cursor': f'{proximo[0]}.{proximo[1]}' if proximo else None
+        }
+
+    async def obter(self, parametros, id_agendamento):
+        agendamento = await self._ler(lambda repositorio: repositorio.obter(id_agendamento))
+        if agendamento is None:
+            raise ErroHTTP(404, f'Agendamento {id_agendamento} não encontrado')
+        return 200, agendamento
+
+    async def pesquisar(self, parametros):
+        termo = _obrigatorio(parametros, 'termo')
+        limite = min(_inteiro(parametros, 'limite', LIMITE_PESQUISA), LIMITE_PESQUISA)
+        return 200, {'agendamentos': await self._ler(self._pesquisar, termo, limite)}
+
+    def _pesquisar(self, repositorio, termo, limite):
+        """Pesquisa do repositório, reaproveitada até a próxima gravação (mesma ``versao``)"""
+        chave = (termo, limite)
+        guardada = self.pesquisas.get(chave)
+        if guardada is not None and guardada[0] == repositorio.versao:
+            return guardada[1]
+        versao = repositorio.versao
+        encontrados = repositorio.pesquisar(termo, limite=limite)
+        if len(self.pesquisas) >= LIMITE_PESQUISAS_GUARDADAS:
+            self.pesquisas.clear()
+        self.pesquisas[chave] = (versao, encontrados)
+        return encontrados
+
+    async def disponibilidade(self, parametros):
+        data = _data(parametros, 'data', obrigatoria=True)
+        servico = parametros.get('servico')
+
+        def consultar(repositorio):
+            resposta = {'data': data, 'ocupados': repositorio.horas_ocupadas(data)}
+            if self.esquema is studio:
+                resposta['livres'] = studio.listar_horarios_disponiveis(repositorio, data, servico)
+            return resposta
+        return 200, await self._ler(consultar)
+
+    async def saldo_dia(self, parametros):
+        self._so_studio()
+        return 200, await self._ler(studio.calcular_saldo_dia, _data(parametros, 'data'))
+
+    async def saldo_mes(self, parametros):
+        self._so_studio()
+        ano = _inteiro(parametros, 'ano', datetime.now().year)
+        mes = _inteiro(parametros, 'mes', datetime.now().month, minimo=1, maximo=12)
+        if not 1 <= mes <= 12:
+            raise ErroHTTP(400, 'parâmetro inválido: mes')
+        return 200, await self._ler(studio.calcular_saldo_mes, ano, mes)
+
+    async def estatisticas_mes(self, parametros):
+        self._so_studio()
+        ano = _inteiro(parametros, 'ano', datetime.now().year)
+        mes = _inteiro(parametros, 'mes', datetime.now().month, minimo=1, maximo=12)
+        if not 1 <= mes <= 12:
+            raise ErroHTTP(400, 'parâmetro inválido: mes')
+        return 200, await self._ler(studio.calcular_estatisticas_mes, ano, mes)
+
+    # Gravações (sempre pela fila do escritor)
+
+    def _validar(self, dados):
+        """Registro pronto para gravar, ou 422 com o motivo"""
+        agendamento, motivo = validar(self.esquema, dados)
+        if motivo:
+            raise ErroHTTP(422, motivo)
+        return agendamento
+
+    async def criar(self, parametros, dados):
+        if self.esquema is studio:
+            dados = _completar_studio(dados)
+            dados.setdefault('data_cadastro', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        agendamento = await self.escritor.enviar('criar', self._validar(dados))
+        return 201, agendamento
+
+    async def atualizar(self, parametros, id_agendamento, dados):
+        return 200, await self.escritor.enviar('atualizar', id_agendamento, dados)
+
+    async def excluir(self, parametros, id_agendamento):
+        await self.escritor.enviar('excluir', id_agendamento)
+        return 204, None
+
+    def _atualizar(self, repositorio, id_agendamento, dados):
+        """Edição (na thread do escritor): mescla os campos, valida e confere o horário"""
+        anterior = repositorio.obter(id_agendamento)
+        if anterior is None:
+            raise ErroHTTP(404, f'Agendamento {id_agendamento} não encontrado')
+        guardados = anterior.para_dict()
+        if 'tipo_taxa' in dados:
+            # A taxa guardada valia para a zona antiga: recalculada a partir da nova
+            guardados.pop('taxa_deslocamento', None)
+        dados = dict(guardados, **dados)
+        if self.esquema is studio:
+            dados = _completar_studio(dados)
+            dados['data_edicao'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        agendamento = self._validar(dados)
+        agendamento.id = id_agendamento
+        outros = [existente for existente in repositorio.do_dia(agendamento.data) if existente.id != id_agendamento]
+        motivo = self.esquema.verificador_de_conflitos(outros)(agendamento)
+        if motivo:
+            raise ErroHTTP(409, motivo)
+        repositorio.atualizar(agendamento)
+        return agendamento
+
+    def _excluir(self, repositorio, id_agendamento):
+        if repositorio.obter(id_agendamento) is None:
+            raise ErroHTTP(404, f'Agendamento {id_agendamento} não encontrado')
+        repositorio.excluir(id_agendamento)
+
+
+def _completar_studio(dados):
+    """Preenche a taxa a partir da zona (``tipo_taxa``), como o formulário faz"""
+    dados = dict(dados)
+    dados.pop('valor_total', None)  # sempre recalculado
+    if dados.get('tipo_taxa') in studio.TAXAS_DESLOCAMENTO and 'taxa_deslocamento' not in dados:
+        dados['taxa_deslocamento'] = studio.TAXAS_DESLOCAMENTO[dados['tipo_taxa']]
+    return dados
+
+
+def criar_app(sistema, arquivo=None, backend=None, trabalhadores=TRABALHADORES):
+    """Aplicação ASGI pronta para qualquer servidor (uvicorn, hypercorn...)"""
+    return API(sistema, arquivo, backend or os.environ.get('AGENDA_BACKEND', 'json'), trabalhadores)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('sistema', choices=sorted(ESQUEMAS))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--dados', help='arquivo de dados do sistema (padrão: o do próprio sistema)')
+    parser.add_argument('--backend', choices=BACKENDS, default=os.environ.get('AGENDA_BACKEND', 'json'))
+    parser.add_argument('--trabalhadores', type=int, default=TRABALHADORES, help='threads de acesso ao repositório')
+    args = parser.parse_args(argumentos)
+
+    import uvicorn
+
+    app = criar_app(args.sistema, args.dados, args.backend, args.trabalhadores)
+    uvicorn.run(app, host=args.host, port=args.porta, interface='asgi3', log_level='warning', access_log=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Arquivo morto: meses encerrados em arquivos colunares compactados (NumPy .npz).
+
+Cada campo do registro vira uma coluna (um membro do .npz), então um
+relatório lê e descompacta só as colunas que usa. Inteiros são gravados
+como ``int64``; textos como ``str``, com uma máscara ``<campo>__nulo``
+quando há None; o resto (``extras``) como JSON em ``<campo>__json``.
+
+O numpy só é importado quando um arquivo é lido ou gravado.
+"""
+import dataclasses
+import json
+import os
+
+from agenda import metricas
+from agenda.diario import Diario, _estado_arquivo
+
+EXTENSAO = '.npz'
+
+# Membro com os dados derivados do mês (agregados), em JSON
+MEMBRO_EXTRAS = '__extras__'
+
+
+def gravar_mes(caminho, agendamentos, tipo_registro, extras=None):
+    """Grava os agendamentos (de um mês) coluna a coluna, de forma atômica"""
+    import numpy as np
+
+    agendamentos = sorted(agendamentos, key=lambda agendamento: agendamento.id)
+    membros = {MEMBRO_EXTRAS: np.array(json.dumps(extras or {}, ensure_ascii=False))}
+    for campo in dataclasses.fields(tipo_registro):
+        valores = [getattr(agendamento, campo.name) for agendamento in agendamentos]
+        if all(type(valor) is int for valor in valores):
+            membros[campo.name] = np.array(valores, dtype=np.int64)
+        elif all(valor is None or isinstance(valor, str) for valor in valores):
+            membros[campo.name] = np.array(['' if valor is None else valor for valor in valores], dtype=str)
+            if None in valores:
+                membros[campo.name + '__nulo'] = np.array([valor is None for valor in valores], dtype=bool)
+        else:
+            membros[campo.name + '__json'] = np.array(
+                [json.dumps(valor, ensure_ascii=False) for valor in valores], dtype=str
+            )
+
+    temporario = caminho + '.tmp'
+    with open(temporario, 'wb') as f:
+        np.savez_compressed(f, **membros)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+    metricas.contar_io(gravados=metricas.tamanho_arquivo(caminho))
+
+
+def ler_colunas(caminho, campos):
+    """Lê só as colunas pedidas: dicionário campo -> lista de valores (em ordem de id)"""
+    import numpy as np
+
+    with np.load(caminho) as arquivo:
+        membros = set(arquivo.files)
+        resultado = {}
+        for campo in campos:
+            if campo in membros:
+                valores = arquivo[campo].tolist()
+                if campo + '__nulo' in membros:
+                    valores = [None if nulo else valor for valor, nulo in zip(valores, arquivo[campo + '__nulo'].tolist())]
+            elif campo + '__json' in membros:
+                valores = [json.loads(valor) for valor in arquivo[campo + '__json'].tolist()]
+            else:
+                raise KeyError(f'Coluna inexistente no arquivo morto: {campo}')
+            resultado[campo] = valores
+        # Só os membros lidos saem do disco (tamanho compactado)
+        metricas.contar_io(lidos=sum(
+            arquivo.zip.getinfo(membro + '.npy').compress_size
+            for membro in membros
+            if membro.split('__')[0] in campos and membro != MEMBRO_EXTRAS
+        ))
+        return resultado
+
+
+def ler_extras(caminho):
+    """Lê só os dados derivados guardados junto com o mês"""
+    import numpy as np
+
+    with np.load(caminho) as arquivo:
+        metricas.contar_io(lidos=arquivo.zip.getinfo(MEMBRO_EXTRAS + '.npy').compress_size)
+        return json.loads(arquivo[MEMBRO_EXTRAS].item())
+
+
+def ler_agendamentos(caminho, tipo_registro):
+    """Reconstrói os registros do mês (todas as colunas)"""
+    campos = [campo.name for campo in dataclasses.fields(tipo_registro)]
+    colunas = ler_colunas(caminho, campos)
+    return [tipo_registro(*linha) for linha in zip(*(colunas[campo] for campo in campos))]
+
+
+class DiarioArquivado(Diario):
+    """Diário somente leitura sobre um mês do arquivo morto.
+
+    Permite abrir o mês como um ``RepositorioJSON`` comum para consultas;
+    para gravar, o mês precisa voltar antes para o formato JSON.
+    """
+
+    def carregar(self):
+        """Lê todos os registros e os extras do arquivo .npz"""
+        self.agendamentos = {
+            agendamento.id: agendamento
+            for agendamento in ler_agendamentos(self.arquivo_snapshot, self.tipo_registro)
+        }
+        self.extras = ler_extras(self.arquivo_snapshot)
+        self.reaplicadas = []
+        self.operacoes_no_log = 0
+        self.maior_id = max(self.agendamentos, default=0)
+        self.compactacao_pendente = False
+        return list(self.agendamentos.values())
+
+    def assinatura(self):
+        """Identifica a versão do arquivo .npz em disco"""
+        return (_estado_arquivo(self.arquivo_snapshot), None)
+
+    def registrar_lote(self, operacoes):
+        raise RuntimeError('Mês arquivado é somente leitura; reative-o antes de gravar')
+
+    def compactar(self, extras=None):
+        raise RuntimeError('Mês arquivado é somente leitura; reative-o antes de gravar')
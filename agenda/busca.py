@@ -0,0 +1,228 @@
+"""Índice de busca por nome/telefone: textos distintos de cada campo, em ordem"""
+import heapq
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate
+
+# Separa os textos no texto corrido de cada campo (não aparece em nomes e telefones)
+SEPARADOR = '\x00'
+
+# Textos distintos incluídos ou retirados que o texto corrido tolera antes de ser remontado
+LIMITE_ALTERACOES = 256
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos ('José' -> 'jose')"""
+    if texto and texto.isascii():
+        return texto.lower()
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+class IndiceBusca:
+    """Busca por trecho (substring) ignorando caixa e acentos.
+
+    Muitos agendamentos repetem o mesmo nome (ou telefone), e a relevância
+    de um resultado só depende do texto do campo e do termo. Por isso cada
+    campo guarda os seus textos distintos (com os ids de cada um), a lista
+    ordenada desses textos, a lista ordenada das palavras e um texto corrido
+    com todos os textos, onde ``str.find`` acha trechos de qualquer tamanho.
+    A busca percorre os níveis de relevância do melhor para o pior, já em
+    ordem, e para assim que junta ``limite`` resultados.
+    """
+
+    def __init__(self, campos, agendamentos=()):
+        self.campos = tuple(campos)
+        self.textos = {}
+        self.indices = [_Campo() for _ in self.campos]
+        # Carga inicial: as listas são ordenadas uma vez só no final
+        for agendamento in agendamentos:
+            textos = self._textos(agendamento)
+            self.textos[agendamento.id] = textos
+            for indice, texto in zip(self.indices, textos):
+                indice.ids.setdefault(texto, []).append(agendamento.id)
+        for indice in self.indices:
+            indice.ordenar()
+
+    def _textos(self, agendamento):
+        """Textos normalizados dos campos indexados"""
+        return tuple(normalizar(getattr(agendamento, campo)) for campo in self.campos)
+
+    def adicionar(self, agendamento):
+        """Indexa (ou reindexa) os campos do agendamento"""
+        self.remover(agendamento.id)
+        textos = self._textos(agendamento)
+        self.textos[agendamento.id] = textos
+        for indice, texto in zip(self.indices, textos):
+            indice.incluir(texto, agendamento.id)
+
+    def remover(self, id_agendamento):
+        """Retira o agendamento do índice"""
+        textos = self.textos.pop(id_agendamento, None)
+        if textos is None:
+            return
+        for indice, texto in zip(self.indices, textos):
+            indice.retirar(texto, id_agendamento)
+
+    def buscar(self, termo, campos=None, limite=None):
+        """Ids que contêm o termo em algum dos campos, do mais ao menos relevante.
+
+        A relevância é: campo igual ao termo, campo começando pelo termo,
+        palavra começando pelo termo e, por fim, trecho no meio (o nível
+        que conta é o melhor entre os campos). Dentro de um nível vêm os
+        campos na ordem de ``campos`` do índice, os textos em ordem e, no
+        mesmo texto, os ids em ordem. Com ``limite`` devolve só os
+        ``limite`` primeiros, sem percorrer o resto.
+        """
+        posicoes = sorted(self._posicoes(campos))
+        termo = normalizar(termo).strip()
+        if not termo or SEPARADOR in termo or limite is not None and limite <= 0:
+            return []
+
+        encontrados = []
+        vistos = set()
+        for nivel in (_Campo.iguais, _Campo.comecando, _Campo.com_palavra, _Campo.no_meio):
+            for posicao in posicoes:
+                indice = self.indices[posicao]
+                for texto in nivel(indice, termo):
+                    for id_agendamento in indice.ids[texto]:
+                        if id_agendamento in vistos:
+                            continue
+                        vistos.add(id_agendamento)
+                        encontrados.append(id_agendamento)
+                        if len(encontrados) == limite:
+                            return encontrados
+        return encontrados
+
+    def _posicoes(self, campos):
+        """Posições dos campos pedidos dentro de ``self.campos``"""
+        if campos is None:
+            return range(len(self.campos))
+        if isinstance(campos, str):
+            campos = (campos,)
+        for campo in campos:
+            if campo not in self.campos:
+                raise ValueError(f'Campo não indexado: {campo}')
+        return [self.campos.index(campo) for campo in campos]
+
+
+class _Campo:
+    """Textos distintos de um campo e as listas ordenadas para achá-los.
+
+    ``ids`` leva cada texto aos ids (em ordem) que o têm; ``ordenados`` e
+    ``palavras`` (pares palavra, texto) ficam sempre em ordem. O texto
+    corrido é montado a partir de ``ordenados`` e remontado depois de
+    ``LIMITE_ALTERACOES`` textos novos ou retirados; os novos do meio
+    tempo ficam em ``novos`` e os retirados são ignorados na busca.
+    ``caracteres`` (todos os que já apareceram no campo) descarta na hora
+    os termos que não podem estar lá, como letras num telefone.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.ordenados = []
+        self.palavras = []
+        self.montados = []
+        self.inicios = []
+        self.corrido = ''
+        self.caracteres = set()
+        self.novos = set()
+        self.alteracoes = 0
+
+    def ordenar(self):
+        """Ordena tudo depois da carga inicial"""
+        for ids in self.ids.values():
+            ids.sort()
+        self.ordenados = sorted(self.ids)
+        self.palavras = sorted((palavra, texto) for texto in self.ordenados for palavra in _palavras(texto))
+        self.montar()
+
+    def montar(self):
+        """(Re)monta o texto corrido com os textos atuais"""
+        self.montados = list(self.ordenados)
+        self.inicios = [0, *accumulate(len(texto) + 1 for texto in self.montados[:-1])]
+        self.corrido = SEPARADOR.join(self.montados)
+        self.caracteres = set(self.corrido)
+        self.novos = set()
+        self.alteracoes = 0
+
+    def incluir(self, texto, id_agendamento):
+        ids = self.ids.get(texto)
+        if ids is not None:
+            insort(ids, id_agendamento)
+            return
+        self.ids[texto] = [id_agendamento]
+        insort(self.ordenados, texto)
+        for palavra in _palavras(texto):
+            insort(self.palavras, (palavra, texto))
+        self.novos.add(texto)
+        self.caracteres.update(texto)
+        self.alteracoes += 1
+
+    def retirar(self, texto, id_agendamento):
+        ids = self.ids[texto]
+        del ids[bisect_left(ids, id_agendamento)]
+        if ids:
+            return
+        del self.ids[texto]
+        del self.ordenados[bisect_left(self.ordenados, texto)]
+        for palavra in _palavras(texto):
+            del self.palavras[bisect_left(self.palavras, (palavra, texto))]
+        self.novos.discard(texto)
+        self.alteracoes += 1
+
+    def iguais(self, termo):
+        """Nível 0: o texto é o próprio termo"""
+        return (termo,) if termo in self.ids else ()
+
+    def comecando(self, termo):
+        """Nível 1: textos que começam pelo termo, em ordem"""
+        ordenados = self.ordenados
+        posicao = bisect_left(ordenados, termo)
+        while posicao < len(ordenados) and ordenados[posicao].startswith(termo):
+            if ordenados[posicao] != termo:
+                yield ordenados[posicao]
+            posicao += 1
+
+    def com_palavra(self, termo):
+        """Nível 2: textos com uma palavra (que não a primeira) começando pelo termo"""
+        inicio_palavra = ' ' + termo
+        primeira = termo.split(' ')[0]
+        palavras = self.palavras
+        vistos = set()
+        posicao = bisect_left(palavras, (primeira,))
+        while posicao < len(palavras) and palavras[posicao][0].startswith(primeira):
+            texto = palavras[posicao][1]
+            if texto not in vistos and inicio_palavra in texto and not texto.startswith(termo):
+                vistos.add(texto)
+                yield texto
+            posicao += 1
+
+    def no_meio(self, termo):
+        """Nível 3: textos com o termo no meio de uma palavra, em ordem"""
+        if not self.caracteres.issuperset(termo):
+            return
+        if self.alteracoes > max(LIMITE_ALTERACOES, len(self.montados) // 8):
+            self.montar()
+        inicio_palavra = ' ' + termo
+        novos = sorted(texto for texto in self.novos if termo in texto)
+        vistos = set()
+        for texto in heapq.merge(self._no_corrido(termo), novos):
+            if (texto not in vistos and texto in self.ids
+                    and not texto.startswith(termo) and inicio_palavra not in texto):
+                vistos.add(texto)
+                yield texto
+
+    def _no_corrido(self, termo):
+        """Textos do texto corrido que contêm o termo, em ordem (cada um uma vez)"""
+        corrido, inicios, montados = self.corrido, self.inicios, self.montados
+        posicao = corrido.find(termo)
+        while posicao != -1:
+            numero = bisect_right(inicios, posicao) - 1
+            yield montados[numero]
+            posicao = corrido.find(termo, inicios[numero] + len(montados[numero]) + 1)
+
+
+def _palavras(texto):
+    """Palavras distintas de um texto normalizado"""
+    return {palavra for palavra in texto.split(' ') if palavra}
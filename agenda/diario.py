@@ -0,0 +1,226 @@
+"""Persistência em diário: snapshot JSON + log de operações append-only (JSONL)"""
+import copy
+import json
+import os
+import warnings
+
+from agenda import gravacao, metricas
+
+# Número de operações no log que dispara a compactação em snapshot
+LIMITE_COMPACTACAO = 500
+
+# Erros de ``de_dict`` com registros malformados (data/hora inválida, campo faltando)
+ERROS_DE_REGISTRO = (AttributeError, KeyError, OverflowError, TypeError, ValueError)
+
+
+class Diario:
+    """Mantém os agendamentos em um snapshot JSON e um log de operações.
+
+    Cada inclusão, edição ou exclusão vira uma linha no arquivo ``.log.jsonl``;
+    o snapshot (o próprio arquivo ``.json`` de sempre) só é reescrito na
+    compactação, quando o log passa de ``limite_compactacao`` linhas.
+
+    O snapshot pode guardar dados derivados (``extras``) que valem para o
+    estado compactado; as operações reaplicadas do log depois dele ficam em
+    ``reaplicadas`` como pares ``(anterior, novo)`` para quem precisar
+    atualizar esses dados.
+
+    O maior id já usado fica gravado no snapshot (``ultimo_id``), então ids
+    de agendamentos excluídos nunca são reaproveitados.
+
+    Com ``tipo_registro`` (uma classe com ``de_dict``/``para_dict``) os
+    agendamentos ficam em memória já convertidos para esse tipo. Registros
+    que não convertem (datas antigas malformadas, por exemplo) não derrubam
+    o carregamento: vão para ``quarentena`` e para o arquivo
+    ``.quarentena.jsonl``, com um aviso, e saem do snapshot na compactação.
+    """
+
+    def __init__(self, arquivo_snapshot, limite_compactacao=LIMITE_COMPACTACAO, tipo_registro=None):
+        self.arquivo_snapshot = arquivo_snapshot
+        self.tipo_registro = tipo_registro
+        self.arquivo_log = os.path.splitext(arquivo_snapshot)[0] + '.log.jsonl'
+        self.arquivo_quarentena = os.path.splitext(arquivo_snapshot)[0] + '.quarentena.jsonl'
+        self.limite_compactacao = limite_compactacao
+        self.agendamentos = {}
+        self.extras = {}
+        self.reaplicadas = []
+        self.quarentena = []
+        self.operacoes_no_log = 0
+        self.maior_id = 0
+        self.compactacao_pendente = False
+
+    def carregar(self):
+        """Reconstrói o estado a partir do snapshot e do final do log"""
+        gravacao.sincronizar()
+        self.agendamentos = {}
+        self.extras = {}
+        self.reaplicadas = []
+        self.quarentena = []
+        self.operacoes_no_log = 0
+        self.maior_id = 0
+
+        precisa_compactar = False
+        if os.path.exists(self.arquivo_snapshot):
+            with open(self.arquivo_snapshot, 'r', encoding='utf-8') as f:
+                conteudo = json.load(f)
+            # Formato antigo: apenas a lista de agendamentos
+            if isinstance(conteudo, list):
+                conteudo = {'agendamentos': conteudo}
+            registros = conteudo.pop('agendamentos', [])
+            self.maior_id = conteudo.pop('ultimo_id', 0)
+            self.extras = conteudo
+            for registro in registros:
+                try:
+                    agendamento = self._de_json(registro)
+                except ERROS_DE_REGISTRO as erro:
+                    self._isolar(registro, erro)
+                    precisa_compactar = True
+                    continue
+                # Arquivos antigos podem ter ids repetidos (id = len + 1)
+                if not isinstance(registro.get('id'), int) or registro['id'] in self.agendamentos:
+                    registro['id'] = self.maior_id + 1
+                    agendamento = self._de_json(registro)
+                    precisa_compactar = True
+                self._aplicar('insert', registro['id'], agendamento)
+
+        if os.path.exists(self.arquivo_log):
+            with open(self.arquivo_log, 'r', encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        operacao = json.loads(linha)
+                    except ValueError:
+                        # Última linha incompleta (gravação interrompida)
+                        precisa_compactar = True
+                        break
+                    anterior = self.agendamentos.get(operacao['id'])
+                    dados = operacao.get('dados')
+                    try:
+                        agendamento = self._de_json(dados) if dados else None
+                    except ERROS_DE_REGISTRO as erro:
+                        self._isolar(dados, erro)
+                        precisa_compactar = True
+                        continue
+                    self._aplicar(operacao['op'], operacao['id'], agendamento)
+                    self.reaplicadas.append((anterior, self.agendamentos.get(operacao['id'])))
+                    self.operacoes_no_log += 1
+
+        metricas.contar_io(
+            lidos=metricas.tamanho_arquivo(self.arquivo_snapshot) + metricas.tamanho_arquivo(self.arquivo_log)
+        )
+        metricas.somar_registros(len(self.agendamentos))
+        if self.quarentena:
+            self._gravar_quarentena()
+
+        # Quem carregou decide quando compactar (depois de montar seus extras)
+        self.compactacao_pendente = precisa_compactar
+        return list(self.agendamentos.values())
+
+    def assinatura(self):
+        """Identifica a versão dos arquivos em disco (mtime e tamanho)"""
+        return (_estado_arquivo(self.arquivo_snapshot), _estado_arquivo(self.arquivo_log))
+
+    def proximo_id(self):
+        """Retorna o próximo id da sequência (nunca reaproveita ids excluídos)"""
+        return self.maior_id + 1
+
+    def registrar(self, operacao, id_agendamento, agendamento=None):
+        """Acrescenta uma operação (insert, update ou delete) ao log"""
+        self.registrar_lote([(operacao, id_agendamento, agendamento)])
+
+    def registrar_lote(self, operacoes):
+        """Acrescenta várias operações ``(operacao, id, agendamento)`` ao log em uma única gravação"""
+        linhas = []
+        for operacao, id_agendamento, agendamento in operacoes:
+            linha = {'op': operacao, 'id': id_agendamento}
+            if operacao != 'delete':
+                linha['dados'] = self._para_json(agendamento)
+            linhas.append(json.dumps(linha, ensure_ascii=False) + '\n')
+
+        texto = ''.join(linhas)
+        gravacao.acrescentar(self.arquivo_log, texto)
+        metricas.contar_io(gravados=len(texto.encode('utf-8')))
+
+        for operacao, id_agendamento, agendamento in operacoes:
+            self._aplicar(operacao, id_agendamento, agendamento)
+        self.operacoes_no_log += len(operacoes)
+
+    def precisa_compactar(self):
+        """Indica se o log já passou do limite (ou se o carregamento pediu)"""
+        return self.compactacao_pendente or self.operacoes_no_log >= self.limite_compactacao
+
+    def compactar(self, extras=None):
+        """Grava o estado atual (e os extras) no snapshot e esvazia o log"""
+        if extras is not None:
+            self.extras = extras
+        conteudo = dict(self.extras)
+        if gravacao.adiada():
+            # Os extras (agregados) continuam mudando na memória até a gravação
+            conteudo = copy.deepcopy(conteudo)
+        conteudo['ultimo_id'] = self.maior_id
+        # Os registros são substituídos, nunca alterados: a lista de agora basta para a gravação adiada
+        agendamentos = list(self.agendamentos.values())
+
+        def escrever(f):
+            conteudo['agendamentos'] = [self._para_json(agendamento) for agendamento in agendamentos]
+            json.dump(conteudo, f, ensure_ascii=False, indent=4)
+
+        gravacao.substituir(self.arquivo_snapshot, escrever)
+        if not gravacao.adiada():
+            metricas.contar_io(gravados=metricas.tamanho_arquivo(self.arquivo_snapshot))
+
+        # Se o processo cair aqui, reaplicar o log sobre o snapshot novo é inofensivo
+        gravacao.esvaziar(self.arquivo_log)
+        self.operacoes_no_log = 0
+        self.reaplicadas = []
+        self.compactacao_pendente = False
+
+    def _de_json(self, dados):
+        """Converte um agendamento lido do JSON para o tipo em memória"""
+        return self.tipo_registro.de_dict(dados) if self.tipo_registro else dados
+
+    def _isolar(self, registro, erro):
+        """Põe em quarentena um registro que não pôde ser convertido"""
+        self.quarentena.append((registro, f'{type(erro).__name__}: {erro}'))
+        # O id continua reservado, para o registro poder ser corrigido e devolvido
+        if isinstance(registro, dict) and isinstance(registro.get('id'), int):
+            self.maior_id = max(self.maior_id, registro['id'])
+
+    def _gravar_quarentena(self):
+        """Guarda os registros em quarentena (sem repetir os já guardados) e avisa"""
+        linhas = [
+            json.dumps({'erro': erro, 'dados': registro}, ensure_ascii=False) + '\n'
+            for registro, erro in self.quarentena
+        ]
+        if os.path.exists(self.arquivo_quarentena):
+            with open(self.arquivo_quarentena, 'r', encoding='utf-8') as f:
+                guardadas = set(f)
+            linhas = [linha for linha in linhas if linha not in guardadas]
+        if linhas:
+            with open(self.arquivo_quarentena, 'a', encoding='utf-8') as f:
+                f.writelines(linhas)
+        warnings.warn(
+            f'{len(self.quarentena)} agendamento(s) inválido(s) em {self.arquivo_snapshot} foram ignorados '
+            f'e guardados em {self.arquivo_quarentena}',
+            stacklevel=3
+        )
+
+    def _para_json(self, agendamento):
+        """Converte um agendamento em memória para o formato JSON"""
+        return agendamento.para_dict() if self.tipo_registro else agendamento
+
+    def _aplicar(self, operacao, id_agendamento, dados):
+        """Aplica uma operação ao estado em memória"""
+        if operacao == 'delete':
+            self.agendamentos.pop(id_agendamento, None)
+        else:
+            self.agendamentos[id_agendamento] = dados
+            self.maior_id = max(self.maior_id, id_agendamento)
+
+
+def _estado_arquivo(caminho):
+    """Retorna (mtime_ns, tamanho) do arquivo, ou None se ele não existir"""
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        return gravacao.assinatura(caminho, None)
+    return gravacao.assinatura(caminho, (estado.st_mtime_ns, estado.st_size))
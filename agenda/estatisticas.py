@@ -0,0 +1,76 @@
+"""Estatísticas de faturamento numa única passada pelos agendamentos, combináveis entre partições.
+
+``Estatisticas`` acumula, a cada agendamento, as contagens por serviço,
+por cliente e por dia e o faturamento por dia; os "top 5" saem
+com ``heapq.nlargest``, que dá o mesmo resultado (e a mesma ordem nos
+empates) que ordenar tudo e cortar, sem ordenar tudo. Acumuladores de
+partições diferentes se juntam com ``juntar``.
+"""
+import heapq
+
+from agenda.registros import MINUTOS_POR_DIA, data_do_dia
+
+# Quantos itens entram em cada ranking
+TOP = 5
+
+
+class Estatisticas:
+    """Contagens e faturamento de um conjunto de agendamentos.
+
+    ``precos`` (serviço -> preço em reais) vale para os agendamentos sem
+    valor cadastrado, a mesma regra de ``studio.obter_valor_agendamento``.
+    """
+
+    def __init__(self, precos):
+        self.precos = precos
+        self.servicos = {}
+        self.clientes = {}
+        # Por dia (número do dia, ver ``registros.dia_de``): a data só é montada no resultado
+        self.agendamentos_por_dia = {}
+        self.faturamento_por_dia = {}
+
+    def adicionar_colunas(self, colunas):
+        """Acumula, numa passada, as colunas ``inicio``, ``cliente``, ``servico``, ``valor_centavos`` e ``taxa_centavos``"""
+        servicos, clientes = self.servicos, self.clientes
+        agendamentos, faturamento = self.agendamentos_por_dia, self.faturamento_por_dia
+        precos = self.precos
+        for inicio, cliente, servico, valor_centavos, taxa_centavos in zip(
+            colunas['inicio'], colunas['cliente'], colunas['servico'], colunas['valor_centavos'], colunas['taxa_centavos']
+        ):
+            dia = inicio // MINUTOS_POR_DIA
+            servicos[servico] = servicos.get(servico, 0) + 1
+            clientes[cliente] = clientes.get(cliente, 0) + 1
+            agendamentos[dia] = agendamentos.get(dia, 0) + 1
+            valor_servico = valor_centavos / 100 if valor_centavos > 0 else precos.get(servico, 0)
+            faturamento[dia] = faturamento.get(dia, 0) + valor_servico + taxa_centavos / 100
+        return self
+
+    def juntar(self, outro):
+        """Soma a este acumulador o de outra partição"""
+        for destino, origem in (
+            (self.servicos, outro.servicos),
+            (self.clientes, outro.clientes),
+            (self.agendamentos_por_dia, outro.agendamentos_por_dia),
+            (self.faturamento_por_dia, outro.faturamento_por_dia)
+        ):
+            for chave, valor in origem.items():
+                destino[chave] = destino.get(chave, 0) + valor
+        return self
+
+    def resultado(self, top=TOP):
+        """Rankings (os ``top`` maiores, em ordem decrescente) e o faturamento por data"""
+        def maiores(contagens):
+            return heapq.nlargest(top, contagens.items(), key=lambda item: item[1])
+
+        # Dia do mês ('05') de cada data, na ordem em que as datas apareceram
+        dias_do_mes = {}
+        for dia, quantidade in self.agendamentos_por_dia.items():
+            dia_do_mes = data_do_dia(dia)[8:10]
+            dias_do_mes[dia_do_mes] = dias_do_mes.get(dia_do_mes, 0) + quantidade
+
+        return {
+            'servicos_mais_vendidos': maiores(self.servicos),
+            'clientes_frequentes': maiores(self.clientes),
+            'dias_mais_lotados': maiores(dias_do_mes),
+            'faturamento_diario': {data_do_dia(dia): valor for dia, valor in self.faturamento_por_dia.items()}
+        }
@@ -0,0 +1,204 @@
+"""Gravação adiada (write-behind, opcional): as alterações valem na memória na hora e o disco vem depois.
+
+Fica desligada a menos que a variável de ambiente ``AGENDA_GRAVACAO_ADIADA``
+seja ``1``; desligada, ``substituir`` e ``acrescentar`` gravam na hora,
+como sempre.
+
+Ligada, as gravações vão para uma única thread do processo. O que chega
+enquanto ela grava (ou dentro de ``JANELA`` segundos) é juntado por
+arquivo: acréscimos seguidos viram um só, e uma reescrita do arquivo
+inteiro descarta o que estava pendente para ele. Cada arquivo é gravado
+uma vez por rodada, com fsync (e arquivo temporário + rename quando é
+reescrito); os arquivos seguem a ordem em que foram alterados pela última
+vez, então o snapshot vai para o disco antes do log esvaziado e as
+partições antes do manifesto.
+
+``sincronizar`` é a barreira: espera o que já foi pedido chegar ao disco
+(é chamada antes de reler arquivos, ao encerrar o processo e nos testes).
+"""
+import atexit
+import os
+import threading
+import time
+
+ADIADA = os.environ.get('AGENDA_GRAVACAO_ADIADA') == '1'
+
+# Quanto a thread espera, depois de acordar, para juntar uma rajada de alterações
+JANELA = 0.05
+
+
+class GravadorAdiado:
+    """Thread única que grava os arquivos pendentes, juntando as alterações de cada um.
+
+    Por arquivo fica pendente um par ``(escrever, acrescimos)``: ``escrever``
+    (ou None) recebe o arquivo aberto e escreve o conteúdo que substitui o
+    inteiro, já na thread; ``acrescimos`` são os textos a acrescentar ao final.
+    """
+
+    def __init__(self, janela=JANELA):
+        self.janela = janela
+        self.condicao = threading.Condition()
+        self.pendentes = {}
+        self.gravando = {}
+        self.produzidos = {}
+        self.thread = None
+        self.erro = None
+        self.rodadas = 0
+        self.pedidos = 0
+
+    def substituir(self, caminho, escrever):
+        """Agenda a reescrita atômica do arquivo (descarta o que estava pendente para ele)"""
+        with self.condicao:
+            self.pendentes.pop(caminho, None)
+            self.pendentes[caminho] = (escrever, [])
+            self._acordar()
+
+    def acrescentar(self, caminho, texto):
+        """Agenda um acréscimo ao final do arquivo"""
+        with self.condicao:
+            pendente = self.pendentes.get(caminho)
+            if pendente is None:
+                pendente = self.pendentes[caminho] = (None, [])
+            pendente[1].append(texto)
+            self._acordar()
+
+    def _acordar(self):
+        self.pedidos += 1
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._rodar, name='agenda-gravacao', daemon=True)
+            self.thread.start()
+        self.condicao.notify_all()
+
+    def sincronizar(self, tempo_limite=None):
+        """Espera os pedidos feitos até agora chegarem ao disco; levanta o erro de gravação, se houve"""
+        with self.condicao:
+            terminou = self.condicao.wait_for(
+                lambda: self.erro is not None or not (self.pendentes or self.gravando), tempo_limite
+            )
+            erro, self.erro = self.erro, None
+        if erro is not None:
+            raise erro
+        return terminou
+
+    def assinatura(self, caminho, estado):
+        """Estado do arquivo para comparação: fixo enquanto as mudanças nele forem só as deste gravador"""
+        with self.condicao:
+            if caminho in self.pendentes or caminho in self.gravando:
+                return ('gravacao_adiada', caminho)
+            if caminho in self.produzidos and self.produzidos[caminho] == estado:
+                return ('gravacao_adiada', caminho)
+        return estado
+
+    def _rodar(self):
+        while True:
+            with self.condicao:
+                self.condicao.wait_for(lambda: self.pendentes)
+            time.sleep(self.janela)
+            with self.condicao:
+                self.gravando, self.pendentes = self.pendentes, {}
+            for caminho, (escrever, acrescimos) in list(self.gravando.items()):
+                try:
+                    _gravar(caminho, escrever, acrescimos)
+                except Exception as e:
+                    with self.condicao:
+                        # Fica pendente de novo (antes do que chegou depois) para a próxima rodada
+                        self.erro = e
+                        pendente = _juntar(self.gravando.pop(caminho), self.pendentes.pop(caminho, None))
+                        self.pendentes = {caminho: pendente, **self.pendentes}
+                        self.condicao.notify_all()
+                    continue
+                with self.condicao:
+                    self.produzidos[caminho] = _estado(caminho)
+                    del self.gravando[caminho]
+            with self.condicao:
+                self.rodadas += 1
+                self.condicao.notify_all()
+            if self.erro is not None:
+                time.sleep(1)
+
+
+def _juntar(anterior, posterior):
+    """Pendência única equivalente a ``anterior`` seguida de ``posterior``"""
+    if posterior is None:
+        return anterior
+    if posterior[0] is not None:
+        return posterior
+    return anterior[0], anterior[1] + posterior[1]
+
+
+def _gravar(caminho, escrever, acrescimos):
+    """Grava no disco, com fsync, a reescrita e/ou os acréscimos de um arquivo"""
+    if escrever is not None:
+        temporario = caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            escrever(f)
+            f.write(''.join(acrescimos))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+    elif acrescimos:
+        with open(caminho, 'a', encoding='utf-8') as f:
+            f.write(''.join(acrescimos))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _estado(caminho):
+    """(mtime_ns, tamanho) do arquivo, ou None se ele não existir"""
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return (estado.st_mtime_ns, estado.st_size)
+
+
+# Gravador do processo (só existe com a gravação adiada ligada)
+gravador = None
+if ADIADA:
+    gravador = GravadorAdiado()
+    atexit.register(gravador.sincronizar)
+
+
+def adiada():
+    """Indica se a gravação adiada foi ligada (``AGENDA_GRAVACAO_ADIADA=1``)"""
+    return gravador is not None
+
+
+def substituir(caminho, escrever):
+    """Reescreve o arquivo de forma atômica com o que ``escrever(f)`` escrever (na hora ou adiado)"""
+    if gravador is not None:
+        gravador.substituir(caminho, escrever)
+        return
+    _gravar(caminho, escrever, [])
+
+
+def acrescentar(caminho, texto):
+    """Acrescenta o texto ao final do arquivo (na hora ou adiado)"""
+    if gravador is not None:
+        gravador.acrescentar(caminho, texto)
+        return
+    with open(caminho, 'a', encoding='utf-8') as f:
+        f.write(texto)
+
+
+def esvaziar(caminho):
+    """Deixa o arquivo vazio (na hora ou adiado)"""
+    if gravador is not None:
+        gravador.substituir(caminho, lambda f: None)
+        return
+    with open(caminho, 'w', encoding='utf-8'):
+        pass
+
+
+def sincronizar(tempo_limite=None):
+    """Barreira: espera as gravações adiadas pedidas até agora (sem gravação adiada, volta na hora)"""
+    if gravador is None:
+        return True
+    return gravador.sincronizar(tempo_limite)
+
+
+def assinatura(caminho, estado):
+    """Estado do arquivo como os repositórios devem compará-lo (ver ``GravadorAdiado.assinatura``)"""
+    if gravador is None:
+        return estado
+    return gravador.assinatura(caminho, estado)
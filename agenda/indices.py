@@ -0,0 +1,75 @@
+"""Índices em memória mantidos junto com o repositório JSON"""
+from bisect import bisect_left, bisect_right, insort
+
+from agenda.registros import MINUTOS_POR_DIA
+
+
+class IndiceDia:
+    """Agendamentos particionados por dia, ordenados por início dentro do dia.
+
+    ``ordem`` guarda os dias com agendamento em ordem crescente, então o
+    índice inteiro pode ser percorrido já ordenado por data e hora.
+    """
+
+    def __init__(self, agendamentos=()):
+        self.dias = {}
+        self.posicoes = {}
+        self.ordem = []
+        for agendamento in agendamentos:
+            self.adicionar(agendamento)
+
+    def adicionar(self, agendamento):
+        """Inclui o agendamento na lista do seu dia"""
+        self.remover(agendamento.id)
+        dia, inicio = agendamento.dia, agendamento.inicio
+        if dia not in self.dias:
+            insort(self.ordem, dia)
+        insort(self.dias.setdefault(dia, []), (inicio, agendamento.id))
+        self.posicoes[agendamento.id] = (dia, inicio)
+
+    def remover(self, id_agendamento):
+        """Retira o agendamento da lista do dia em que foi indexado"""
+        posicao_indexada = self.posicoes.pop(id_agendamento, None)
+        if posicao_indexada is None:
+            return
+        dia, inicio = posicao_indexada
+        agendados = self.dias[dia]
+        del agendados[bisect_left(agendados, (inicio, id_agendamento))]
+        if not agendados:
+            del self.dias[dia]
+            del self.ordem[bisect_left(self.ordem, dia)]
+
+    def ids(self, dia):
+        """Ids dos agendamentos do dia, em ordem de horário"""
+        return [id_agendamento for _, id_agendamento in self.dias.get(dia, ())]
+
+    def inicios(self, dia):
+        """Inícios (minutos desde 1970-01-01) já ocupados no dia, em ordem"""
+        return [inicio for inicio, _ in self.dias.get(dia, ())]
+
+    def percorrer(self, primeiro_dia=None, ultimo_dia=None, cursor=None, crescente=True):
+        """Pares (inicio, id) em ordem de data/hora dentro do intervalo de dias.
+
+        ``cursor`` é o par (inicio, id) do último item já visto; a
+        iteração continua logo depois (ou antes, em ordem decrescente) dele.
+        """
+        baixo = bisect_left(self.ordem, primeiro_dia) if primeiro_dia is not None else 0
+        alto = bisect_right(self.ordem, ultimo_dia) if ultimo_dia is not None else len(self.ordem)
+        dia_cursor = cursor[0] // MINUTOS_POR_DIA if cursor is not None else None
+
+        if crescente:
+            if cursor is not None:
+                baixo = max(baixo, bisect_left(self.ordem, dia_cursor))
+            for posicao in range(baixo, alto):
+                dia = self.ordem[posicao]
+                agendados = self.dias[dia]
+                comeco = bisect_right(agendados, tuple(cursor)) if dia == dia_cursor else 0
+                yield from agendados[comeco:]
+        else:
+            if cursor is not None:
+                alto = min(alto, bisect_right(self.ordem, dia_cursor))
+            for posicao in range(alto - 1, baixo - 1, -1):
+                dia = self.ordem[posicao]
+                agendados = self.dias[dia]
+                fim = bisect_left(agendados, tuple(cursor)) if dia == dia_cursor else len(agendados)
+                yield from reversed(agendados[:fim])
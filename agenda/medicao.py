@@ -0,0 +1,47 @@
+"""Medição do tempo de execução dos reruns, páginas e fragmentos"""
+import time
+from collections import deque
+from functools import wraps
+
+from agenda import metricas
+
+# Quantas medições recentes cada nome guarda
+LIMITE_MEDICOES = 200
+
+
+def registrar_tempo(registro, nome, segundos):
+    """Acrescenta uma medição (em segundos) ao registro"""
+    medicoes = registro.get(nome)
+    if medicoes is None:
+        medicoes = registro[nome] = deque(maxlen=LIMITE_MEDICOES)
+    medicoes.append(segundos)
+
+
+def cronometrar(registro, nome):
+    """Decorador que guarda em ``registro[nome]`` a duração de cada chamada.
+
+    Com as métricas ligadas (``agenda.metricas``) a chamada também vira um
+    trecho do rerun; num rerun de fragmento, é ela que abre e fecha o rerun.
+    """
+    def decorador(funcao):
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                with metricas.trecho(nome):
+                    return funcao(*args, **kwargs)
+            finally:
+                registrar_tempo(registro, nome, time.perf_counter() - inicio)
+        return medida
+    return decorador
+
+
+def mediana(valores):
+    """Mediana de uma sequência de números (None se estiver vazia)"""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    meio = len(ordenados) // 2
+    if len(ordenados) % 2:
+        return ordenados[meio]
+    return (ordenados[meio - 1] + ordenados[meio]) / 2
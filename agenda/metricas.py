@@ -0,0 +1,248 @@
+"""Métricas por rerun (opcionais): tempo, bytes lidos/gravados e registros por trecho.
+
+Ficam desligadas a menos que a variável de ambiente ``AGENDA_METRICAS``
+aponte para um arquivo. Desligadas, cada trecho instrumentado custa só uma
+consulta a uma ``ContextVar``.
+
+Um rerun começa com ``iniciar_rerun`` e termina com ``encerrar_rerun``.
+Reruns de fragmento não passam pelo começo nem pelo fim do script: o
+primeiro trecho medido sem rerun em andamento (a página) abre e encerra
+o seu próprio. Cada rerun encerrado vai para ``recentes`` (painel) e para
+o arquivo:
+
+- ``.prom``: formato texto do Prometheus, com os totais acumulados no
+  processo, reescrito a cada rerun (para o coletor de arquivos do
+  node_exporter);
+- qualquer outra extensão: uma linha JSON por rerun, acrescentada ao final.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+ARQUIVO_METRICAS = os.environ.get('AGENDA_METRICAS')
+
+# Quantos reruns encerrados o painel mostra
+LIMITE_RECENTES = 50
+
+CAMPOS = ('segundos', 'chamadas', 'registros', 'bytes_lidos', 'bytes_gravados')
+
+_coletor = contextvars.ContextVar('coletor_metricas', default=None)
+_trava = threading.Lock()
+
+# Reruns encerrados no processo (mais recente no fim) e totais por (app, trecho)
+recentes = deque(maxlen=LIMITE_RECENTES)
+_totais = {}
+_reruns = {}
+_app_padrao = None
+
+
+class Coletor:
+    """Medidas de um rerun: por trecho, os totais de ``CAMPOS``"""
+
+    def __init__(self, app, tipo):
+        self.app = app
+        self.tipo = tipo
+        self.inicio = time.perf_counter()
+        self.trechos = {}
+        self.abertos = []
+        self.encerrado = False
+
+    def _trecho(self, nome):
+        medida = self.trechos.get(nome)
+        if medida is None:
+            medida = self.trechos[nome] = dict.fromkeys(CAMPOS, 0)
+        return medida
+
+    def contar_io(self, lidos, gravados):
+        """Soma bytes a todos os trechos abertos (os tempos também são inclusivos)"""
+        for nome in self.abertos:
+            medida = self._trecho(nome)
+            medida['bytes_lidos'] += lidos
+            medida['bytes_gravados'] += gravados
+
+    def resumo(self):
+        """Dicionário do rerun, pronto para JSON"""
+        return {
+            'app': self.app,
+            'tipo': self.tipo,
+            'momento': datetime.now().isoformat(timespec='seconds'),
+            'segundos': round(time.perf_counter() - self.inicio, 6),
+            'trechos': {
+                nome: dict(medida, segundos=round(medida['segundos'], 6)) for nome, medida in self.trechos.items()
+            }
+        }
+
+
+def ativas():
+    """Indica se as métricas foram ligadas (``AGENDA_METRICAS``)"""
+    return bool(ARQUIVO_METRICAS)
+
+
+def atual():
+    """Coletor do rerun em andamento neste contexto (ou None)"""
+    coletor = _coletor.get()
+    return None if coletor is None or coletor.encerrado else coletor
+
+
+def iniciar_rerun(app, tipo='script'):
+    """Começa a coletar um rerun do ``app``; devolve o coletor (None se desligadas)"""
+    global _app_padrao
+    if not ativas():
+        return None
+    _app_padrao = app
+    coletor = Coletor(app, tipo)
+    _coletor.set(coletor)
+    return coletor
+
+
+def encerrar_rerun(coletor):
+    """Fecha o rerun: guarda em ``recentes``, soma aos totais e grava no arquivo"""
+    if coletor is None or coletor.encerrado:
+        return None
+    coletor.encerrado = True
+    if _coletor.get() is coletor:
+        _coletor.set(None)
+    resumo = coletor.resumo()
+    with _trava:
+        recentes.append(resumo)
+        _reruns[(coletor.app, coletor.tipo)] = _reruns.get((coletor.app, coletor.tipo), 0) + 1
+        for nome, medida in coletor.trechos.items():
+            total = _totais.setdefault((coletor.app, nome), dict.fromkeys(CAMPOS, 0))
+            for campo in CAMPOS:
+                total[campo] += medida[campo]
+        try:
+            if ARQUIVO_METRICAS.endswith('.prom'):
+                _gravar_prometheus(ARQUIVO_METRICAS)
+            else:
+                with open(ARQUIVO_METRICAS, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(resumo, ensure_ascii=False) + '\n')
+        except OSError:
+            pass  # métrica nunca derruba a aplicação
+    return resumo
+
+
+@contextmanager
+def trecho(nome):
+    """Mede o bloco como o trecho ``nome``; fora de um rerun, abre e fecha um (fragmento).
+
+    Devolve a medida do trecho (ou None), onde o bloco pode somar ``registros``.
+    """
+    coletor = atual()
+    proprio = None
+    if coletor is None:
+        if not ativas() or _app_padrao is None:
+            yield None
+            return
+        coletor = proprio = iniciar_rerun(_app_padrao, 'fragmento')
+    medida = coletor._trecho(nome)
+    coletor.abertos.append(nome)
+    inicio = time.perf_counter()
+    try:
+        yield medida
+    finally:
+        medida['segundos'] += time.perf_counter() - inicio
+        medida['chamadas'] += 1
+        coletor.abertos.remove(nome)
+        if proprio is not None:
+            encerrar_rerun(proprio)
+
+
+def contar_registros(resultado):
+    """Quantos registros um resultado representa: tamanho da lista ou o campo 'quantidade'"""
+    if isinstance(resultado, (list, tuple)):
+        return len(resultado)
+    if isinstance(resultado, dict) and isinstance(resultado.get('quantidade'), int):
+        return resultado['quantidade']
+    return 0
+
+
+def medir(nome, registros=contar_registros):
+    """Decorador: mede cada chamada como o trecho ``nome`` (só com um rerun em andamento).
+
+    ``registros`` recebe o resultado e devolve quantos registros ele envolveu
+    (None quando a própria função conta, com ``somar_registros``).
+    """
+    def decorador(funcao):
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            if atual() is None:
+                return funcao(*args, **kwargs)
+            with trecho(nome) as medida_trecho:
+                resultado = funcao(*args, **kwargs)
+                if registros is not None:
+                    medida_trecho['registros'] += registros(resultado)
+                return resultado
+        return medida
+    return decorador
+
+
+def somar_registros(quantidade):
+    """Soma registros ao trecho aberto mais interno do rerun em andamento"""
+    coletor = atual()
+    if coletor is not None and coletor.abertos:
+        coletor._trecho(coletor.abertos[-1])['registros'] += quantidade
+
+
+def contar_io(lidos=0, gravados=0):
+    """Soma bytes lidos/gravados aos trechos abertos do rerun em andamento"""
+    coletor = atual()
+    if coletor is not None:
+        coletor.contar_io(lidos, gravados)
+
+
+def tamanho_arquivo(caminho):
+    """Tamanho do arquivo em bytes (0 se não existir)"""
+    try:
+        return os.path.getsize(caminho)
+    except OSError:
+        return 0
+
+
+def linhas_do_painel(resumo):
+    """Linhas (uma por trecho, mais lentos primeiro) para mostrar um rerun em tabela"""
+    linhas = []
+    for nome, medida in sorted(resumo['trechos'].items(), key=lambda item: -item[1]['segundos']):
+        linhas.append({
+            'Trecho': nome,
+            'ms': round(medida['segundos'] * 1000, 2),
+            'Chamadas': medida['chamadas'],
+            'Registros': medida['registros'],
+            'KB lidos': round(medida['bytes_lidos'] / 1024, 1),
+            'KB gravados': round(medida['bytes_gravados'] / 1024, 1)
+        })
+    return linhas
+
+
+def _gravar_prometheus(caminho):
+    """Reescreve (de forma atômica) o arquivo com os totais no formato texto do Prometheus"""
+    def rotulos(**valores):
+        return ','.join(f'{chave}="{_escapar(valor)}"' for chave, valor in valores.items())
+
+    linhas = [
+        '# HELP agenda_reruns_total Reruns encerrados por app e tipo (script ou fragmento).',
+        '# TYPE agenda_reruns_total counter'
+    ]
+    for (app, tipo), quantidade in sorted(_reruns.items()):
+        linhas.append(f'agenda_reruns_total{{{rotulos(app=app, tipo=tipo)}}} {quantidade}')
+    for campo in CAMPOS:
+        metrica = f'agenda_trecho_{campo}_total'
+        linhas.append(f'# HELP {metrica} Soma de {campo} por trecho medido.')
+        linhas.append(f'# TYPE {metrica} counter')
+        for (app, nome), total in sorted(_totais.items()):
+            linhas.append(f'{metrica}{{{rotulos(app=app, trecho=nome)}}} {round(total[campo], 6)}')
+
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(linhas) + '\n')
+    os.replace(temporario, caminho)
+
+
+def _escapar(valor):
+    """Escapa o valor de um rótulo do Prometheus"""
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,40 @@
+"""Ocupação por intervalos: cada dia é um bitset com um bit por minuto"""
+
+
+def hora_em_minutos(hora):
+    """Converte 'HH:MM' em minutos desde a meia-noite"""
+    horas, minutos = hora.split(':')
+    return int(horas) * 60 + int(minutos)
+
+
+class OcupacaoDia:
+    """Minutos ocupados de um dia, guardados em um inteiro usado como bitset"""
+
+    def __init__(self):
+        self.bits = 0
+
+    def ocupar(self, inicio, duracao):
+        """Marca o intervalo [inicio, inicio + duracao) como ocupado"""
+        self.bits |= ((1 << duracao) - 1) << inicio
+
+    def livre(self, inicio, duracao):
+        """Indica se o intervalo [inicio, inicio + duracao) está todo livre"""
+        return not (self.bits >> inicio) & ((1 << duracao) - 1)
+
+    def inicios_livres(self, horarios, duracao):
+        """Filtra, em uma passada, os horários ('HH:MM') onde a duração cabe"""
+        mascara = (1 << duracao) - 1
+        return [hora for hora in horarios if not (self.bits >> hora_em_minutos(hora)) & mascara]
+
+
+def montar_ocupacao(agendamentos, duracao_de, ignorar_id=None):
+    """Monta a ocupação de um dia a partir dos agendamentos dele.
+
+    ``duracao_de`` recebe um agendamento e devolve a duração em minutos;
+    ``ignorar_id`` deixa de fora o agendamento que está sendo editado.
+    """
+    ocupacao = OcupacaoDia()
+    for agendamento in agendamentos:
+        if agendamento.id != ignorar_id:
+            ocupacao.ocupar(agendamento.minuto, duracao_de(agendamento))
+    return ocupacao
@@ -0,0 +1,531 @@
+"""Armazenamento JSON particionado por mês (AAAA-MM), com um manifesto pequeno.
+
+Os agendamentos ficam em uma pasta com o nome do arquivo de dados (sem
+``.json``): um par snapshot + log por mês (``2025-01.json`` e
+``2025-01.log.jsonl``) e o ``manifesto.json``, que guarda quais meses
+existem, quais estão arquivados, o último id e quantos agendamentos cada
+mês tem.
+
+Cada partição é um ``RepositorioJSON`` completo (índice do dia, agregados)
+carregado só quando alguma consulta chega ao mês dela; gravar um
+agendamento acrescenta uma linha só ao log da partição do mês. O manifesto
+é regravado apenas quando um mês aparece, some, é arquivado ou reativado;
+a quantidade e o maior id dos meses não arquivados (o atual e os futuros)
+são conferidos nas próprias partições quando elas são carregadas. Um mês
+novo entra no manifesto depois da primeira gravação na partição; se o
+processo cair entre as duas, a partição fora do manifesto é achada na pasta
+ao abrir.
+
+Meses encerrados vão para o arquivo morto (``2025-01.npz``, ver
+``agenda.arquivo_morto``): o JSON "quente" fica só com o mês atual e os
+futuros. Gravar em um mês arquivado o traz de volta para JSON antes.
+"""
+import json
+import os
+import re
+import threading
+from datetime import date
+
+from agenda import arquivo_morto, gravacao
+from agenda.agregados import GERAL, resumir, somar_grupos, totais_por_dia
+from agenda.busca import IndiceBusca
+from agenda.diario import Diario, _estado_arquivo
+from agenda.registros import MINUTOS_POR_DIA, colunas, data_do_dia
+from agenda.repositorio import RepositorioJSON, _versoes
+
+ARQUIVO_MANIFESTO = 'manifesto.json'
+FORMATO_MANIFESTO = 1
+
+# Snapshot ou log da partição de um mês ('2025-01.json', '2025-01.log.jsonl')
+ARQUIVO_PARTICAO = re.compile(r'(\d{4}-\d{2})\.(?:json|log\.jsonl)$')
+
+
+def pasta_das_particoes(arquivo_json):
+    """Pasta das partições de um arquivo de dados ('dados.json' -> 'dados')"""
+    return os.path.splitext(arquivo_json)[0]
+
+
+def mes_de(data):
+    """Partição ('AAAA-MM') de uma data (date ou 'YYYY-MM-DD')"""
+    return str(data)[:7]
+
+
+def migrar_arquivo_unico(arquivo_json, pasta, tipo_registro):
+    """Divide o arquivo único antigo (snapshot + log) em partições mensais.
+
+    O manifesto é gravado por último, então uma migração interrompida é
+    simplesmente refeita. Os arquivos antigos ficam intocados, como cópia.
+    """
+    antigo = Diario(arquivo_json, tipo_registro=tipo_registro)
+    antigo.carregar()
+    por_mes = {}
+    for agendamento in antigo.agendamentos.values():
+        por_mes.setdefault(agendamento.data[:7], {})[agendamento.id] = agendamento
+
+    os.makedirs(pasta, exist_ok=True)
+    for mes, agendamentos in por_mes.items():
+        particao = Diario(os.path.join(pasta, mes + '.json'), tipo_registro=tipo_registro)
+        particao.agendamentos = agendamentos
+        particao.maior_id = max(agendamentos)
+        particao.compactar()
+
+    _gravar_manifesto(pasta, antigo.maior_id, {mes: len(agendamentos) for mes, agendamentos in por_mes.items()})
+
+
+def _meses_em_disco(pasta):
+    """Meses que têm snapshot ou log de partição na pasta"""
+    meses = set()
+    for nome in os.listdir(pasta):
+        encontrado = ARQUIVO_PARTICAO.match(nome)
+        if encontrado:
+            meses.add(encontrado.group(1))
+    return meses
+
+
+def _gravar_manifesto(pasta, ultimo_id, particoes, arquivados=()):
+    """Grava o manifesto de forma atômica (o conteúdo é o de agora, mesmo com gravação adiada)"""
+    conteudo = {
+        'formato': FORMATO_MANIFESTO,
+        'ultimo_id': ultimo_id,
+        'particoes': dict(sorted(particoes.items())),
+        'arquivados': sorted(arquivados)
+    }
+    gravacao.substituir(os.path.join(pasta, ARQUIVO_MANIFESTO), lambda f: json.dump(conteudo, f))
+
+
+class RepositorioParticionado:
+    """Mesma interface do ``RepositorioJSON``, com os dados divididos por mês.
+
+    Visões de um mês ("Saldo do Mês", "Agenda do Dia", horários livres)
+    carregam só a partição do mês. "Listar Todos" percorre as partições em
+    ordem, carregando cada uma só quando a página chega nela; pesquisa,
+    distintos e o resumo geral precisam de todas e as carregam na primeira
+    vez que são pedidos.
+
+    Ao abrir, os meses anteriores ao atual vão para o arquivo morto. Dos
+    meses arquivados, os resumos leem só os agregados guardados e
+    ``colunas_mes`` só as colunas pedidas, sem montar os registros.
+    """
+
+    def __init__(self, arquivo_json, tipo_registro, campos_indexados=(), criar_agregados=None):
+        self.tipo_registro = tipo_registro
+        self.campos = tuple(campos_indexados)
+        self.criar_agregados = criar_agregados
+        self.pasta = pasta_das_particoes(arquivo_json)
+        self.arquivo_manifesto = os.path.join(self.pasta, ARQUIVO_MANIFESTO)
+        self.trava = threading.RLock()
+        self.versao = next(_versoes)
+        # Os arquivos conferidos abaixo podem ter gravações adiadas pendentes
+        gravacao.sincronizar()
+        if not os.path.exists(self.arquivo_manifesto):
+            if os.path.exists(arquivo_json):
+                migrar_arquivo_unico(arquivo_json, self.pasta, tipo_registro)
+            else:
+                os.makedirs(self.pasta, exist_ok=True)
+                _gravar_manifesto(self.pasta, 0, {})
+        self.recarregar()
+        self.arquivar()
+
+    def recarregar(self):
+        """Relê o manifesto; as partições voltam a ser carregadas sob demanda"""
+        with self.trava:
+            gravacao.sincronizar()
+            with open(self.arquivo_manifesto, 'r', encoding='utf-8') as f:
+                manifesto = json.load(f)
+            self.maior_id = manifesto['ultimo_id']
+            self.quantidades = manifesto['particoes']
+            self.arquivados = set(manifesto.get('arquivados', ()))
+            # Partições que não chegaram ao manifesto (queda entre a gravação e o manifesto)
+            for mes in _meses_em_disco(self.pasta) - self.arquivados - set(self.quantidades):
+                self.quantidades[mes] = 0
+            self.grupos_arquivados = {}
+            self.carregadas = {}
+            self.indice_busca = None
+            self.registros_busca = {}
+            self.distintos = {}
+            # O manifesto não acompanha cada gravação: quantidade e maior id dos meses
+            # não arquivados são conferidos na própria partição quando ela é carregada
+            self.a_conferir = {mes for mes in self.quantidades if mes not in self.arquivados}
+            self.assinatura = _estado_arquivo(self.arquivo_manifesto)
+            self.versao = next(_versoes)
+
+    def em_dia(self):
+        """Confere o manifesto e as partições já carregadas"""
+        with self.trava:
+            carregadas = list(self.carregadas.values())
+        return (
+            _estado_arquivo(self.arquivo_manifesto) == self.assinatura
+            and all(particao.em_dia() for particao in carregadas)
+        )
+
+    def _particao(self, mes, compactar=True):
+        """Partição do mês, carregada do disco na primeira vez que é usada"""
+        particao = self.carregadas.get(mes)
+        if particao is None:
+            diario = None
+            if mes in self.arquivados:
+                diario = arquivo_morto.DiarioArquivado(self._arquivo_morto(mes), tipo_registro=self.tipo_registro)
+            particao = self.carregadas[mes] = RepositorioJSON(
+                os.path.join(self.pasta, mes + '.json'),
+                self.tipo_registro,
+                agregados=self.criar_agregados() if self.criar_agregados else None,
+                diario=diario,
+                compactar=compactar
+            )
+            if mes in self.a_conferir:
+                self.a_conferir.discard(mes)
+                self.maior_id = max(self.maior_id, particao.diario.maior_id)
+                self._contar(mes, particao.contar() - self.quantidades[mes])
+        return particao
+
+    def _conferir(self):
+        """Carrega os meses ainda não conferidos (antes de usar o total ou o maior id)"""
+        for mes in sorted(self.a_conferir):
+            self._particao(mes)
+
+    def _particao_gravavel(self, mes, compactar=True):
+        """Partição do mês pronta para gravação (reativando-a se estiver arquivada)"""
+        if mes in self.arquivados:
+            self._reativar(mes)
+        return self._particao(mes, compactar)
+
+    def _arquivo_morto(self, mes):
+        """Caminho do arquivo morto do mês"""
+        return os.path.join(self.pasta, mes + arquivo_morto.EXTENSAO)
+
+    def _arquivos_json(self, mes):
+        """Snapshot e log da partição JSON do mês"""
+        base = os.path.join(self.pasta, mes)
+        return base + '.json', base + '.log.jsonl'
+
+    def arquivar(self, antes_de=None):
+        """Move para o arquivo morto os meses anteriores a ``antes_de`` (padrão: o mês atual).
+
+        Grava o .npz, depois o manifesto e só então apaga o JSON do mês;
+        se o processo cair no meio, o JSON ou o .npz que sobrar é ignorado
+        ou sobrescrito. Devolve os meses arquivados.
+        """
+        antes_de = antes_de or mes_de(date.today())
+        with self.trava:
+            meses = []
+            for mes in self._meses(ultimo=antes_de):
+                if mes >= antes_de or mes in self.arquivados:
+                    continue
+                # O JSON do mês vai ser apagado: não vale compactar o log antes
+                particao = self._particao(mes, compactar=False)
+                if mes not in self.quantidades:
+                    # Partição achada fora do manifesto, mas vazia
+                    continue
+                meses.append(mes)
+                extras = {'agregados': particao.agregados.exportar()} if particao.agregados is not None else {}
+                arquivo_morto.gravar_mes(self._arquivo_morto(mes), particao.todos(), self.tipo_registro, extras)
+                self.arquivados.add(mes)
+                del self.carregadas[mes]
+            if meses:
+                self._salvar_manifesto()
+                gravacao.sincronizar()
+                for mes in meses:
+                    for caminho in self._arquivos_json(mes):
+                        if os.path.exists(caminho):
+                            os.remove(caminho)
+            return meses
+
+    def _reativar(self, mes):
+        """Traz um mês do arquivo morto de volta para JSON (para poder gravar nele)"""
+        arquivo = self._arquivo_morto(mes)
+        snapshot, _ = self._arquivos_json(mes)
+        diario = Diario(snapshot, tipo_registro=self.tipo_registro)
+        diario.agendamentos = {
+            agendamento.id: agendamento for agendamento in arquivo_morto.ler_agendamentos(arquivo, self.tipo_registro)
+        }
+        diario.maior_id = max(diario.agendamentos, default=0)
+        diario.compactar(arquivo_morto.ler_extras(arquivo))
+        self.arquivados.discard(mes)
+        self.grupos_arquivados.pop(mes, None)
+        self.carregadas.pop(mes, None)
+        self._salvar_manifesto()
+        gravacao.sincronizar()
+        os.remove(arquivo)
+
+    def _meses(self, primeiro=None, ultimo=None, crescente=True):
+        """Meses com agendamentos dentro do intervalo, na ordem pedida"""
+        meses = sorted(
+            mes for mes in self.quantidades
+            if (primeiro is None or mes >= primeiro) and (ultimo is None or mes <= ultimo)
+        )
+        return meses if crescente else meses[::-1]
+
+    def _percorrer(self):
+        """Todos os agendamentos, um mês por vez; dos meses arquivados não carregados lê só os registros"""
+        for mes in self._meses():
+            if mes in self.arquivados and mes not in self.carregadas:
+                yield from arquivo_morto.ler_agendamentos(self._arquivo_morto(mes), self.tipo_registro)
+            else:
+                yield from self._particao(mes).todos()
+
+    def _salvar_manifesto(self):
+        """Grava o manifesto e guarda a nova assinatura"""
+        self._conferir()
+        _gravar_manifesto(self.pasta, self.maior_id, self.quantidades, self.arquivados)
+        self.assinatura = _estado_arquivo(self.arquivo_manifesto)
+
+    def _contar(self, mes, diferenca):
+        """Ajusta a quantidade de agendamentos do mês; indica se o mês apareceu ou sumiu (manifesto a gravar)"""
+        existia = mes in self.quantidades
+        quantidade = self.quantidades.get(mes, 0) + diferenca
+        if quantidade:
+            self.quantidades[mes] = quantidade
+        else:
+            self.quantidades.pop(mes, None)
+        return existia != bool(quantidade)
+
+    def _gravou(self, anterior, novo):
+        """Atualiza índices e versão depois de uma gravação"""
+        if self.indice_busca is not None:
+            if novo is None:
+                self.indice_busca.remover(anterior.id)
+                del self.registros_busca[anterior.id]
+            else:
+                self.indice_busca.adicionar(novo)
+                self.registros_busca[novo.id] = novo
+        self.distintos = {}
+        self.versao = next(_versoes)
+
+    def todos(self):
+        """Retorna todos os agendamentos na ordem de cadastro"""
+        with self.trava:
+            todos = [self._particao(mes).todos() for mes in self._meses()]
+            todos = [agendamento for agendamentos in todos for agendamento in agendamentos]
+        return sorted(todos, key=lambda agendamento: agendamento.id)
+
+    def contar(self):
+        """Retorna o número total de agendamentos (do manifesto e dos meses não arquivados)"""
+        with self.trava:
+            self._conferir()
+            return sum(self.quantidades.values())
+
+    def obter(self, id_agendamento):
+        """Retorna o agendamento com o id informado (ou None)"""
+        with self.trava:
+            for particao in list(self.carregadas.values()):
+                agendamento = particao.obter(id_agendamento)
+                if agendamento is not None:
+                    return agendamento
+            for mes in self._meses(crescente=False):
+                if mes not in self.carregadas:
+                    agendamento = self._particao(mes).obter(id_agendamento)
+                    if agendamento is not None:
+                        return agendamento
+            return None
+
+    def inserir(self, agendamento):
+        """Cadastra um agendamento, atribuindo um id novo"""
+        with self.trava:
+            self._conferir()
+            agendamento.id = self.maior_id + 1
+            mes = agendamento.data[:7]
+            self._particao_gravavel(mes)._registrar('insert', agendamento.id, agendamento)
+            self.maior_id = agendamento.id
+            if self._contar(mes, 1):
+                self._salvar_manifesto()
+            self._gravou(None, agendamento)
+        return agendamento
+
+    def inserir_lote(self, agendamentos):
+        """Cadastra vários agendamentos: uma gravação por mês envolvido (e o manifesto, se surgir mês novo)"""
+        with self.trava:
+            self._conferir()
+            por_mes = {}
+            for agendamento in agendamentos:
+                self.maior_id += 1
+                agendamento.id = self.maior_id
+                por_mes.setdefault(agendamento.data[:7], []).append(('insert', agendamento.id, agendamento))
+            meses_novos = False
+            for mes, operacoes in por_mes.items():
+                # O próprio lote decide se compacta (ver RepositorioJSON._registrar_lote)
+                self._particao_gravavel(mes, compactar=False)._registrar_lote(operacoes)
+                meses_novos |= self._contar(mes, len(operacoes))
+            if meses_novos:
+                self._salvar_manifesto()
+            if self.indice_busca is not None:
+                for agendamento in agendamentos:
+                    self.indice_busca.adicionar(agendamento)
+                    self.registros_busca[agendamento.id] = agendamento
+            self.distintos = {}
+            self.versao = next(_versoes)
+        return agendamentos
+
+    def descarregar(self, manter=()):
+        """Tira da memória as partições carregadas (menos as de ``manter``); voltam sob demanda"""
+        with self.trava:
+            for mes in list(self.carregadas):
+                if mes not in manter:
+                    del self.carregadas[mes]
+
+    def atualizar(self, agendamento):
+        """Substitui o agendamento de mesmo id, mudando de partição se o mês mudou"""
+        with self.trava:
+            self._conferir()
+            anterior = self.obter(agendamento.id)
+            mes = agendamento.data[:7]
+            if anterior is not None and anterior.data[:7] == mes:
+                self._particao_gravavel(mes).atualizar(agendamento)
+            else:
+                mudou = False
+                if anterior is not None:
+                    self._particao_gravavel(anterior.data[:7]).excluir(agendamento.id)
+                    mudou = self._contar(anterior.data[:7], -1)
+                self._particao_gravavel(mes)._registrar('insert', agendamento.id, agendamento)
+                mudou |= self._contar(mes, 1)
+                self.maior_id = max(self.maior_id, agendamento.id)
+                if mudou:
+                    self._salvar_manifesto()
+            self._gravou(anterior, agendamento)
+        return agendamento
+
+    def excluir(self, id_agendamento):
+        """Remove o agendamento com o id informado"""
+        with self.trava:
+            anterior = self.obter(id_agendamento)
+            if anterior is None:
+                return
+            self._particao_gravavel(anterior.data[:7]).excluir(id_agendamento)
+            if self._contar(anterior.data[:7], -1):
+                self._salvar_manifesto()
+            self._gravou(anterior, None)
+
+    def do_dia(self, data):
+        """Agendamentos de uma data (YYYY-MM-DD), ordenados por hora"""
+        mes = mes_de(data)
+        with self.trava:
+            return self._particao(mes).do_dia(data) if mes in self.quantidades else []
+
+    def do_mes(self, ano, mes):
+        """Agendamentos de um mês, na ordem de cadastro"""
+        mes = f'{ano:04d}-{mes:02d}'
+        with self.trava:
+            if mes not in self.quantidades:
+                return []
+            return sorted(self._particao(mes).todos(), key=lambda agendamento: agendamento.id)
+
+    def horas_ocupadas(self, data):
+        """Horas já agendadas em uma data"""
+        mes = mes_de(data)
+        with self.trava:
+            return self._particao(mes).horas_ocupadas(data) if mes in self.quantidades else []
+
+    def resumo_dia(self, data):
+        """Totais de uma data (YYYY-MM-DD)"""
+        mes = mes_de(data)
+        with self.trava:
+            return resumir(self._grupo(mes, data))
+
+    def resumo_mes(self, ano, mes):
+        """Totais de um mês"""
+        mes = f'{ano:04d}-{mes:02d}'
+        with self.trava:
+            return resumir(self._grupo(mes, mes))
+
+    def resumo_geral(self):
+        """Totais de todo o histórico (soma do geral de cada partição)"""
+        with self.trava:
+            return resumir(somar_grupos(self._grupo(mes, GERAL) for mes in self._meses()))
+
+    def totais_por_dia(self):
+        """(dia, quantidade, total, taxas) de cada dia com agendamentos, em centavos e em ordem de data"""
+        with self.trava:
+            dias = []
+            for mes in self._meses():
+                dias += totais_por_dia(self._grupos(mes) or {})
+            return dias
+
+    def _grupo(self, mes, chave):
+        """Grupo dos agregados do mês (None se não houver)"""
+        grupos = self._grupos(mes)
+        return grupos.get(chave) if grupos is not None else None
+
+    def _grupos(self, mes):
+        """Grupos dos agregados do mês (None se o mês não tiver agendamentos).
+
+        De um mês arquivado ainda não carregado lê só os agregados
+        guardados no .npz, se ainda valerem para a tabela de preços.
+        """
+        if mes not in self.quantidades:
+            return None
+        if mes in self.arquivados and mes not in self.carregadas:
+            if mes not in self.grupos_arquivados:
+                agregados = self.criar_agregados()
+                importados = agregados.importar(arquivo_morto.ler_extras(self._arquivo_morto(mes)).get('agregados'))
+                self.grupos_arquivados[mes] = agregados.grupos if importados else None
+            if self.grupos_arquivados[mes] is not None:
+                return self.grupos_arquivados[mes]
+        return self._particao(mes).agregados.grupos
+
+    def colunas_mes(self, ano, mes, campos):
+        """Campos pedidos dos agendamentos do mês, coluna a coluna (campo -> lista).
+
+        Os campos são os do registro (``inicio``, ``valor_centavos``...);
+        de um mês arquivado só as colunas pedidas são lidas do .npz.
+        """
+        chave = f'{ano:04d}-{mes:02d}'
+        with self.trava:
+            if chave not in self.quantidades:
+                return {campo: [] for campo in campos}
+            if chave in self.arquivados and chave not in self.carregadas:
+                return arquivo_morto.ler_colunas(self._arquivo_morto(chave), campos)
+            return colunas(self.do_mes(ano, mes), campos)
+
+    def pesquisar(self, termo, campos=None, limite=None):
+        """Agendamentos com o termo nos campos indexados (ou nos pedidos), por relevância.
+
+        O índice é montado na primeira pesquisa, lendo um mês por vez (dos
+        meses arquivados, só os registros, sem carregar a partição); ele
+        guarda os registros para devolver os resultados.
+        """
+        with self.trava:
+            if self.indice_busca is None:
+                self.registros_busca = {agendamento.id: agendamento for agendamento in self._percorrer()}
+                self.indice_busca = IndiceBusca(self.campos, self.registros_busca.values())
+            ids = self.indice_busca.buscar(termo, campos, limite)
+            return [self.registros_busca[id_agendamento] for id_agendamento in ids]
+
+    def pagina(self, tamanho, cursor=None, data_inicio=None, data_fim=None, filtros=None, crescente=False):
+        """Uma página em ordem de data/hora: devolve (agendamentos, cursor da próxima).
+
+        Percorre as partições na ordem pedida, a partir do mês do cursor,
+        e só carrega a próxima partição se a página ainda não encheu.
+        """
+        if tamanho < 1:
+            raise ValueError(f'Tamanho de página inválido: {tamanho}')
+        primeiro = mes_de(data_inicio) if data_inicio else None
+        ultimo = mes_de(data_fim) if data_fim else None
+        if cursor is not None:
+            mes_cursor = data_do_dia(cursor[0] // MINUTOS_POR_DIA)[:7]
+            if crescente:
+                primeiro = max(primeiro or mes_cursor, mes_cursor)
+            else:
+                ultimo = min(ultimo or mes_cursor, mes_cursor)
+
+        with self.trava:
+            encontrados = []
+            for mes in self._meses(primeiro, ultimo, crescente):
+                falta = tamanho - len(encontrados)
+                pagina, proximo = self._particao(mes).pagina(
+                    max(falta, 1), cursor, data_inicio, data_fim, filtros, crescente
+                )
+                if falta == 0:
+                    # A página já encheu: só falta saber se existe uma próxima
+                    if pagina:
+                        return encontrados, (encontrados[-1].inicio, encontrados[-1].id)
+                    continue
+                encontrados += pagina
+                if proximo is not None:
+                    return encontrados, proximo
+            return encontrados, None
+
+    def contar_distintos(self, campo):
+        """Quantos valores distintos o campo tem (recalculado só depois de gravações)"""
+        with self.trava:
+            if campo not in self.distintos:
+                self.distintos[campo] = len({getattr(agendamento, campo) for agendamento in self._percorrer()})
+            return self.distintos[campo]
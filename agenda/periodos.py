@@ -0,0 +1,92 @@
+"""Faturamento de qualquer intervalo de datas: somas acumuladas por dia e busca binária.
+
+Os agregados já guardam os totais de cada dia; aqui eles viram listas em
+ordem de data com os totais acumulados (quantidade, total e taxas, em
+centavos). A soma de um intervalo ``[inicio, fim]`` é a diferença entre
+duas posições, achadas com ``bisect`` na lista de dias, então semana,
+trimestre, ano ou um intervalo qualquer custam o mesmo. As listas são
+montadas uma vez por ``versao`` do repositório.
+"""
+import calendar
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from itertools import accumulate
+
+# Quantas versões de repositório ficam com as somas montadas
+LIMITE_CACHE = 8
+
+_somas = {}
+
+
+class SomasAcumuladas:
+    """Dias com agendamentos (em ordem) e os totais acumulados até cada um.
+
+    ``quantidade[i]``, ``total[i]`` e ``taxas[i]`` somam os ``i`` primeiros
+    dias de ``dias`` (a posição 0 é zero).
+    """
+
+    def __init__(self, totais_por_dia):
+        self.dias = [dia for dia, _, _, _ in totais_por_dia]
+        self.quantidade = [0, *accumulate(quantidade for _, quantidade, _, _ in totais_por_dia)]
+        self.total = [0, *accumulate(total for _, _, total, _ in totais_por_dia)]
+        self.taxas = [0, *accumulate(taxas for _, _, _, taxas in totais_por_dia)]
+
+    def posicoes(self, inicio, fim):
+        """Fatia de ``dias`` que cai entre ``inicio`` e ``fim`` (datas ou 'YYYY-MM-DD', inclusive)"""
+        return bisect_left(self.dias, str(inicio)), bisect_right(self.dias, str(fim))
+
+    def somar(self, inicio, fim):
+        """Totais (em reais) do intervalo"""
+        a, b = self.posicoes(inicio, fim)
+        return {
+            'quantidade': self.quantidade[b] - self.quantidade[a],
+            'total': (self.total[b] - self.total[a]) / 100,
+            'taxas': (self.taxas[b] - self.taxas[a]) / 100
+        }
+
+    def por_dia(self, inicio, fim):
+        """(dia, quantidade, total em reais) de cada dia do intervalo que tem agendamentos"""
+        a, b = self.posicoes(inicio, fim)
+        return [
+            (self.dias[i], self.quantidade[i + 1] - self.quantidade[i], (self.total[i + 1] - self.total[i]) / 100)
+            for i in range(a, b)
+        ]
+
+
+def somas_do_repositorio(repositorio):
+    """Somas acumuladas do estado atual do repositório (remontadas só depois de gravações)"""
+    with repositorio.trava:
+        somas = _somas.get(repositorio.versao)
+        if somas is None:
+            somas = SomasAcumuladas(repositorio.totais_por_dia())
+            if len(_somas) >= LIMITE_CACHE:
+                _somas.clear()
+            _somas[repositorio.versao] = somas
+        return somas
+
+
+def semana(dia):
+    """Segunda a domingo da semana do dia"""
+    inicio = dia - timedelta(days=dia.weekday())
+    return inicio, inicio + timedelta(days=6)
+
+
+def trimestre(dia):
+    """Primeiro e último dia do trimestre do dia"""
+    primeiro_mes = 3 * ((dia.month - 1) // 3) + 1
+    ultimo_mes = primeiro_mes + 2
+    return date(dia.year, primeiro_mes, 1), date(dia.year, ultimo_mes, calendar.monthrange(dia.year, ultimo_mes)[1])
+
+
+def ano_ate(dia):
+    """1º de janeiro até o dia (acumulado do ano)"""
+    return date(dia.year, 1, 1), dia
+
+
+def ano_anterior(inicio, fim):
+    """O mesmo intervalo um ano antes (29/02 vira 28/02)"""
+    def recuar(dia):
+        if dia.month == 2 and dia.day == 29:
+            return date(dia.year - 1, 2, 28)
+        return dia.replace(year=dia.year - 1)
+    return recuar(inicio), recuar(fim)
@@ -0,0 +1,74 @@
+"""CRUD do sistema PET (webcrudpetPY.py), sem Streamlit nem pandas"""
+from agenda.registros import AgendamentoPet
+from agenda.repositorio import abrir_repositorio
+
+ARQUIVO_DADOS = 'agendamentos.json'
+
+# Campos usados na pesquisa por tutor/pet
+CAMPOS_INDEXADOS = ('tutor', 'pet')
+
+# Tipo dos registros e campos da importação/exportação em lote (agenda.transferencia)
+TIPO_REGISTRO = AgendamentoPet
+CAMPOS_OBRIGATORIOS = ('tutor', 'pet', 'data', 'hora')
+CAMPOS_EXPORTACAO = ('id', 'tutor', 'pet', 'data', 'hora')
+
+
+def abrir(arquivo=ARQUIVO_DADOS, backend='json'):
+    """Abre o repositório de agendamentos"""
+    return abrir_repositorio(arquivo, AgendamentoPet, backend, campos_indexados=CAMPOS_INDEXADOS)
+
+
+def montar_agendamento(tutor, pet, data, hora, id_agendamento=None):
+    """Cria o registro; ``data``/``hora`` podem ser date/time ou 'YYYY-MM-DD'/'HH:MM'"""
+    tutor = (tutor or '').strip()
+    pet = (pet or '').strip()
+    if not tutor or not pet:
+        raise ValueError('Tutor e pet são obrigatórios')
+    if not isinstance(data, str):
+        data = data.strftime('%Y-%m-%d')
+    if not isinstance(hora, str):
+        hora = hora.strftime('%H:%M')
+    return AgendamentoPet.de_dict({'id': id_agendamento, 'tutor': tutor, 'pet': pet, 'data': data, 'hora': hora})
+
+
+def verificador_de_conflitos(agendamentos_do_dia):
+    """Função que diz se um novo agendamento do dia pode entrar (None) ou o motivo da recusa.
+
+    O sistema PET aceita vários atendimentos no mesmo horário; só recusa o
+    mesmo pet do mesmo tutor duas vezes no mesmo horário.
+    """
+    ocupados = {(agendamento.inicio, agendamento.tutor, agendamento.pet) for agendamento in agendamentos_do_dia}
+
+    def verificar(agendamento):
+        chave = (agendamento.inicio, agendamento.tutor, agendamento.pet)
+        if chave in ocupados:
+            return 'agendamento repetido (mesmo tutor, pet e horário)'
+        ocupados.add(chave)
+        return None
+
+    return verificar
+
+
+def criar_agendamento(repositorio, tutor, pet, data, hora):
+    """Inclui um agendamento; devolve o registro já com o id atribuído"""
+    agendamento = montar_agendamento(tutor, pet, data, hora)
+    repositorio.inserir(agendamento)
+    return agendamento
+
+
+def atualizar_agendamento(repositorio, id_agendamento, tutor, pet, data, hora):
+    """Substitui os dados de um agendamento existente"""
+    if repositorio.obter(id_agendamento) is None:
+        raise KeyError(f'Agendamento {id_agendamento} não encontrado')
+    agendamento = montar_agendamento(tutor, pet, data, hora, id_agendamento)
+    repositorio.atualizar(agendamento)
+    return agendamento
+
+
+def excluir_agendamento(repositorio, id_agendamento):
+    """Remove um agendamento; devolve o registro removido"""
+    agendamento = repositorio.obter(id_agendamento)
+    if agendamento is None:
+        raise KeyError(f'Agendamento {id_agendamento} não encontrado')
+    repositorio.excluir(id_agendamento)
+    return agendamento
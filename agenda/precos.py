@@ -0,0 +1,32 @@
+"""Precificação vetorizada de tabelas de agendamentos (pandas)"""
+
+
+def precificar_tabela(df, servicos):
+    """Calcula valor do serviço, taxa e total de todas as linhas de uma vez.
+
+    Mesma regra de ``obter_valor_agendamento``: usa o ``valor`` cadastrado
+    quando ele é maior que zero, senão o preço padrão do serviço em
+    ``servicos``, e soma ``taxa_deslocamento`` quando houver. Devolve três
+    Series alinhadas ao índice de ``df``.
+    """
+    import pandas as pd
+
+    def coluna_numerica(nome):
+        if nome not in df.columns:
+            return pd.Series(0.0, index=df.index)
+        return pd.to_numeric(df[nome], errors='coerce').fillna(0.0)
+
+    valor = coluna_numerica('valor')
+    if 'servico' in df.columns:
+        preco_padrao = df['servico'].map(servicos).fillna(0.0)
+    else:
+        preco_padrao = pd.Series(0.0, index=df.index)
+
+    valor_servico = valor.where(valor > 0, preco_padrao)
+    taxa = coluna_numerica('taxa_deslocamento')
+    return valor_servico, taxa, valor_servico + taxa
+
+
+def formatar_reais(valores):
+    """Formata uma Series numérica como 'R$ 0.00'"""
+    return 'R$ ' + valores.map('{:.2f}'.format)
@@ -0,0 +1,191 @@
+"""Registros compactos de agendamento, com data e hora convertidas uma única vez"""
+import sys
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import ClassVar, Optional
+
+from agenda.agregados import centavos
+from agenda.ocupacao import hora_em_minutos
+
+MINUTOS_POR_DIA = 24 * 60
+_ORDINAL_EPOCA = date(1970, 1, 1).toordinal()
+
+
+def dia_de(data):
+    """Converte 'YYYY-MM-DD' (ou um date) em dias desde 1970-01-01"""
+    if isinstance(data, str):
+        data = date.fromisoformat(data)
+    return data.toordinal() - _ORDINAL_EPOCA
+
+
+def inicio_de(data, hora):
+    """Converte data ('YYYY-MM-DD') e hora ('HH:MM') em minutos desde 1970-01-01"""
+    return dia_de(data) * MINUTOS_POR_DIA + hora_em_minutos(hora)
+
+
+def hora_do_minuto(minuto):
+    """Converte minutos desde a meia-noite em 'HH:MM'"""
+    return f'{minuto // 60:02d}:{minuto % 60:02d}'
+
+
+@lru_cache(maxsize=None)
+def data_do_dia(dia):
+    """Data 'YYYY-MM-DD' de um dia (um valor por dia distinto, reaproveitado)"""
+    return sys.intern(date.fromordinal(dia + _ORDINAL_EPOCA).isoformat())
+
+
+@lru_cache(maxsize=None)
+def data_formatada_do_dia(dia):
+    """Data 'DD/MM/YYYY' de um dia, para exibição"""
+    return date.fromordinal(dia + _ORDINAL_EPOCA).strftime('%d/%m/%Y')
+
+
+def _internar(texto):
+    """Compartilha uma única cópia de textos repetidos (serviços, zonas)"""
+    return sys.intern(texto) if isinstance(texto, str) else texto
+
+
+class _Horario:
+    """Propriedades de data/hora derivadas de ``inicio``"""
+    __slots__ = ()
+
+    @property
+    def dia(self):
+        return self.inicio // MINUTOS_POR_DIA
+
+    @property
+    def minuto(self):
+        return self.inicio % MINUTOS_POR_DIA
+
+    @property
+    def data(self):
+        return data_do_dia(self.dia)
+
+    @property
+    def hora(self):
+        return hora_do_minuto(self.minuto)
+
+    @property
+    def data_formatada(self):
+        return data_formatada_do_dia(self.dia)
+
+    @property
+    def data_objeto(self):
+        return date.fromordinal(self.dia + _ORDINAL_EPOCA)
+
+
+@dataclass(slots=True)
+class Agendamento(_Horario):
+    """Agendamento do studio (isa3.py); valores em centavos"""
+    id: Optional[int]
+    inicio: int
+    cliente: str
+    telefone: str
+    servico: str
+    valor_centavos: int = 0
+    taxa_centavos: int = 0
+    tipo_taxa: Optional[str] = None
+    observacoes: Optional[str] = None
+    data_cadastro: Optional[str] = None
+    data_edicao: Optional[str] = None
+    extras: Optional[dict] = None
+
+    # Preço padrão de cada serviço, cobrado quando ``valor`` é zero (agenda.studio registra os seus)
+    precos_padrao: ClassVar[dict] = {}
+
+    @property
+    def valor(self):
+        return self.valor_centavos / 100
+
+    @property
+    def valor_servico_centavos(self):
+        """Valor cadastrado ou, se for zero, o preço padrão do serviço"""
+        if self.valor_centavos > 0:
+            return self.valor_centavos
+        return centavos(self.precos_padrao.get(self.servico, 0))
+
+    @property
+    def taxa_deslocamento(self):
+        return self.taxa_centavos / 100
+
+    @property
+    def valor_total(self):
+        return (self.valor_servico_centavos + self.taxa_centavos) / 100
+
+    @classmethod
+    def de_dict(cls, dados):
+        """Cria o registro a partir do formato JSON"""
+        dados = dict(dados)
+        dados.pop('valor_total', None)  # recalculado: valor (ou preço padrão) + taxa
+        return cls(
+            id=dados.pop('id', None),
+            inicio=inicio_de(dados.pop('data'), dados.pop('hora')),
+            cliente=dados.pop('cliente', ''),
+            telefone=dados.pop('telefone', ''),
+            servico=_internar(dados.pop('servico', '')),
+            valor_centavos=centavos(dados.pop('valor', 0) or 0),
+            taxa_centavos=centavos(dados.pop('taxa_deslocamento', 0) or 0),
+            tipo_taxa=_internar(dados.pop('tipo_taxa', None)),
+            observacoes=dados.pop('observacoes', None),
+            data_cadastro=dados.pop('data_cadastro', None),
+            data_edicao=dados.pop('data_edicao', None),
+            extras=dados or None
+        )
+
+    def para_dict(self):
+        """Converte o registro de volta para o formato JSON"""
+        dados = {
+            'id': self.id,
+            'cliente': self.cliente,
+            'telefone': self.telefone,
+            'servico': self.servico,
+            'data': self.data,
+            'hora': self.hora,
+            'valor': self.valor,
+            'taxa_deslocamento': self.taxa_deslocamento,
+            'tipo_taxa': self.tipo_taxa,
+            'valor_total': self.valor_total,
+            'observacoes': self.observacoes,
+            'data_cadastro': self.data_cadastro
+        }
+        if self.data_edicao is not None:
+            dados['data_edicao'] = self.data_edicao
+        if self.extras:
+            dados.update(self.extras)
+        return dados
+
+
+@dataclass(slots=True)
+class AgendamentoPet(_Horario):
+    """Agendamento do sistema PET (webcrudpetPY.py)"""
+    id: Optional[int]
+    inicio: int
+    tutor: str
+    pet: str
+    extras: Optional[dict] = None
+
+    @classmethod
+    def de_dict(cls, dados):
+        """Cria o registro a partir do formato JSON"""
+        dados = dict(dados)
+        return cls(
+            id=dados.pop('id', None),
+            inicio=inicio_de(dados.pop('data'), dados.pop('hora')),
+            tutor=dados.pop('tutor', ''),
+            pet=dados.pop('pet', ''),
+            extras=dados or None
+        )
+
+    def para_dict(self):
+        """Converte o registro de volta para o formato JSON"""
+        dados = {'id': self.id, 'tutor': self.tutor, 'pet': self.pet, 'data': self.data, 'hora': self.hora}
+        if self.extras:
+            dados.update(self.extras)
+        return dados
+
+
+def colunas(registros, campos):
+    """Monta um dicionário campo -> lista de valores (para criar DataFrames)"""
+    registros = list(registros)
+    return {campo: [getattr(registro, campo) for registro in registros] for campo in campos}
@@ -0,0 +1,634 @@
+"""Camada de repositório: mesma interface de consulta para JSON e SQLite"""
+import calendar
+import itertools
+import json
+import os
+import sqlite3
+import threading
+
+from agenda import gravacao
+from agenda.agregados import GERAL, Agregados, chaves_do_agendamento, totais_por_dia
+from agenda.busca import IndiceBusca
+from agenda.diario import Diario
+from agenda.indices import IndiceDia
+from agenda.registros import MINUTOS_POR_DIA, colunas, data_do_dia, dia_de, hora_do_minuto
+
+BACKENDS = ('json', 'sqlite')
+
+# Quantos ids vão em cada consulta "WHERE id IN (...)"
+LOTE_IDS = 500
+
+# Formato dos agregados no SQLite (2: contagem por cliente na tabela agregados_clientes)
+FORMATO_AGREGADOS = 2
+
+# Versões únicas no processo inteiro: um mesmo número nunca identifica
+# estados diferentes, nem entre repositórios distintos
+_versoes = itertools.count(1)
+
+
+class CacheRepositorios:
+    """Mantém os repositórios abertos entre as reexecuções do Streamlit.
+
+    Um repositório JSON só é recarregado do disco quando a assinatura dos
+    arquivos (mtime e tamanho) muda por fora; as gravações feitas pelo
+    próprio repositório já atualizam a assinatura guardada.
+
+    Todas as sessões do processo usam o mesmo objeto (nada da agenda fica
+    copiado em ``st.session_state``): a gravação de uma sessão troca a
+    ``versao`` e as outras veem o estado novo no próximo rerun, sem reler
+    os arquivos. ``benchmarks/memoria_sessoes.py`` mede o custo por sessão.
+    """
+
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.repositorios = {}
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, abrir):
+        """Retorna o repositório da chave, abrindo ou recarregando se preciso"""
+        with self.trava:
+            repositorio = self.repositorios.get(chave)
+            if repositorio is not None and repositorio.em_dia():
+                self.acertos += 1
+                return repositorio
+
+            self.falhas += 1
+            if repositorio is None:
+                repositorio = abrir()
+                self.repositorios[chave] = repositorio
+            else:
+                repositorio.recarregar()
+            return repositorio
+
+    def limpar(self):
+        """Descarta todos os repositórios em cache"""
+        with self.trava:
+            self.repositorios.clear()
+
+
+# Cache compartilhado por todas as sessões do processo
+cache_repositorios = CacheRepositorios()
+
+
+def abrir_repositorio(arquivo_json, tipo_registro, backend='json', campos_indexados=(), precificar=None,
+                      assinatura_precos=None):
+    """Abre (ou reaproveita do cache) o repositório do arquivo de dados.
+
+    ``tipo_registro`` é a classe dos agendamentos (``agenda.registros``). Com ``precificar`` (agendamento -> (valor_servico, taxa)) o repositório
+    mantém os agregados de faturamento; ``assinatura_precos`` identifica a
+    tabela de preços usada para calculá-los.
+    """
+    chave = (os.path.abspath(arquivo_json), backend)
+    return cache_repositorios.obter(
+        chave,
+        lambda: _criar_repositorio(arquivo_json, tipo_registro, backend, campos_indexados, precificar, assinatura_precos)
+    )
+
+
+def _criar_repositorio(arquivo_json, tipo_registro, backend, campos_indexados, precificar, assinatura_precos):
+    """Instancia o repositório do backend escolhido"""
+    agregados = Agregados(precificar, assinatura_precos) if precificar else None
+    if backend == 'sqlite':
+        arquivo_db = os.path.splitext(arquivo_json)[0] + '.db'
+        return RepositorioSQLite(
+            arquivo_db, tipo_registro, campos_indexados, arquivo_json=arquivo_json, agregados=agregados
+        )
+    if backend == 'json':
+        from agenda.particoes import RepositorioParticionado
+        return RepositorioParticionado(
+            arquivo_json, tipo_registro, campos_indexados,
+            criar_agregados=(lambda: Agregados(precificar, assinatura_precos)) if precificar else None
+        )
+    raise ValueError(f'Backend desconhecido: {backend} (use um de {BACKENDS})')
+
+
+def intervalo_mes(ano, mes):
+    """Retorna as datas (YYYY-MM-DD) do primeiro e do último dia do mês"""
+    ultimo_dia = calendar.monthrange(ano, mes)[1]
+    return f'{ano:04d}-{mes:02d}-01', f'{ano:04d}-{mes:02d}-{ultimo_dia:02d}'
+
+
+class _ResumosMixin:
+    """Consultas aos agregados de faturamento, comuns aos dois backends"""
+
+    def resumo_dia(self, data):
+        """Totais de uma data (YYYY-MM-DD)"""
+        return self.agregados.resumo(data)
+
+    def resumo_mes(self, ano, mes):
+        """Totais de um mês"""
+        return self.agregados.resumo(f'{ano:04d}-{mes:02d}')
+
+    def resumo_geral(self):
+        """Totais de todo o histórico"""
+        return self.agregados.resumo(GERAL)
+
+    def totais_por_dia(self):
+        """(dia, quantidade, total, taxas) de cada dia com agendamentos, em centavos e em ordem de data"""
+        with self.trava:
+            return totais_por_dia(self.agregados.grupos)
+
+    def colunas_mes(self, ano, mes, campos):
+        """Campos pedidos dos agendamentos do mês, coluna a coluna (campo -> lista)"""
+        return colunas(self.do_mes(ano, mes), campos)
+
+
+class RepositorioJSON(_ResumosMixin):
+    """Repositório em memória persistido no snapshot JSON + log de operações.
+
+    ``diario`` permite trocar o armazenamento (por exemplo, um mês do
+    arquivo morto, somente leitura); por padrão é o ``Diario`` do arquivo.
+    """
+
+    def __init__(self, arquivo_json, tipo_registro, campos_indexados=(), agregados=None, diario=None, compactar=True):
+        self.campos = tuple(campos_indexados)
+        self.trava = threading.RLock()
+        self.diario = diario or Diario(arquivo_json, tipo_registro=tipo_registro)
+        self.agregados = agregados
+        self.versao = next(_versoes)
+        self.recarregar(compactar)
+
+    def recarregar(self, compactar=True):
+        """Relê o snapshot e o log do disco (com ``compactar=False`` o log longo fica para a próxima gravação)"""
+        with self.trava:
+            self.diario.carregar()
+            self.indice_dia = IndiceDia(self.diario.agendamentos.values())
+            self.indice_busca = IndiceBusca(self.campos, self.diario.agendamentos.values())
+            self.distintos = {}
+            if self.agregados is not None:
+                self._carregar_agregados()
+            if compactar and self.diario.precisa_compactar():
+                self._compactar()
+            self.assinatura = self.diario.assinatura()
+            self.versao = next(_versoes)
+
+    def _carregar_agregados(self):
+        """Usa os agregados do snapshot + o final do log, ou recalcula tudo"""
+        if self.agregados.importar(self.diario.extras.get('agregados')):
+            for anterior, novo in self.diario.reaplicadas:
+                if anterior is not None:
+                    self.agregados.remover(anterior)
+                if novo is not None:
+                    self.agregados.adicionar(novo)
+        else:
+            self.agregados.reconstruir(self.diario.agendamentos.values())
+
+    def _compactar(self):
+        """Compacta o diário levando junto os agregados"""
+        extras = {'agregados': self.agregados.exportar()} if self.agregados is not None else {}
+        self.diario.compactar(extras)
+
+    def em_dia(self):
+        """Indica se o estado em memória corresponde aos arquivos em disco"""
+        return self.diario.assinatura() == self.assinatura
+
+    def _registrar(self, operacao, id_agendamento, agendamento=None):
+        """Grava a operação no diário e atualiza a versão em memória"""
+        self._registrar_lote([(operacao, id_agendamento, agendamento)])
+
+    def _registrar_lote(self, operacoes):
+        """Grava várias operações ``(operacao, id, agendamento)`` no diário de uma vez.
+
+        Em lotes grandes a compactação só acontece quando o log passa do
+        tamanho do snapshot, para não reescrever o arquivo a cada lote.
+        """
+        with self.trava:
+            anteriores = []
+            for _, id_agendamento, agendamento in operacoes:
+                anteriores.append(self.diario.agendamentos.get(id_agendamento))
+            self.diario.registrar_lote(operacoes)
+            for (operacao, id_agendamento, agendamento), anterior in zip(operacoes, anteriores):
+                if operacao == 'delete':
+                    self.indice_dia.remover(id_agendamento)
+                    self.indice_busca.remover(id_agendamento)
+                else:
+                    self.indice_dia.adicionar(agendamento)
+                    self.indice_busca.adicionar(agendamento)
+                if self.agregados is not None:
+                    if anterior is not None:
+                        self.agregados.remover(anterior)
+                    if operacao != 'delete':
+                        self.agregados.adicionar(agendamento)
+            self.distintos = {}
+            if self.diario.precisa_compactar() and (
+                len(operacoes) == 1 or self.diario.operacoes_no_log >= len(self.diario.agendamentos)
+            ):
+                self._compactar()
+            self.assinatura = self.diario.assinatura()
+            self.versao = next(_versoes)
+
+    def todos(self):
+        """Retorna todos os agendamentos na ordem de cadastro"""
+        return list(self.diario.agendamentos.values())
+
+    def contar(self):
+        """Retorna o número total de agendamentos"""
+        return len(self.diario.agendamentos)
+
+    def obter(self, id_agendamento):
+        """Retorna o agendamento com o id informado (ou None)"""
+        return self.diario.agendamentos.get(id_agendamento)
+
+    def inserir(self, agendamento):
+        """Cadastra um agendamento, atribuindo um id novo"""
+        with self.trava:
+            agendamento.id = self.diario.proximo_id()
+            self._registrar('insert', agendamento.id, agendamento)
+        return agendamento
+
+    def inserir_lote(self, agendamentos):
+        """Cadastra vários agendamentos com uma única gravação, atribuindo ids novos"""
+        with self.trava:
+            proximo = self.diario.proximo_id()
+            for posicao, agendamento in enumerate(agendamentos):
+                agendamento.id = proximo + posicao
+            self._registrar_lote([('insert', agendamento.id, agendamento) for agendamento in agendamentos])
+        return agendamentos
+
+    def atualizar(self, agendamento):
+        """Substitui o agendamento de mesmo id (passe um registro novo, não o já guardado)"""
+        self._registrar('update', agendamento.id, agendamento)
+        return agendamento
+
+    def excluir(self, id_agendamento):
+        """Remove o agendamento com o id informado"""
+        self._registrar('delete', id_agendamento)
+
+    def do_dia(self, data):
+        """Agendamentos de uma data (YYYY-MM-DD), ordenados por hora"""
+        with self.trava:
+            agendamentos = self.diario.agendamentos
+            return [agendamentos[id_agendamento] for id_agendamento in self.indice_dia.ids(dia_de(data))]
+
+    def do_mes(self, ano, mes):
+        """Agendamentos de um mês, na ordem de cadastro"""
+        primeiro, ultimo = (dia_de(data) for data in intervalo_mes(ano, mes))
+        inicio, fim = primeiro * MINUTOS_POR_DIA, (ultimo + 1) * MINUTOS_POR_DIA
+        with self.trava:
+            return [ag for ag in self.diario.agendamentos.values() if inicio <= ag.inicio < fim]
+
+    def horas_ocupadas(self, data):
+        """Horas já agendadas em uma data"""
+        with self.trava:
+            inicios = self.indice_dia.inicios(dia_de(data))
+        return [hora_do_minuto(inicio % MINUTOS_POR_DIA) for inicio in inicios]
+
+    def pesquisar(self, termo, campos=None, limite=None):
+        """Agendamentos com o termo nos campos indexados (ou nos pedidos), por relevância"""
+        with self.trava:
+            ids = self.indice_busca.buscar(termo, campos, limite)
+            return [self.diario.agendamentos[id_agendamento] for id_agendamento in ids]
+
+    def pagina(self, tamanho, cursor=None, data_inicio=None, data_fim=None, filtros=None, crescente=False):
+        """Uma página em ordem de data/hora: devolve (agendamentos, cursor da próxima).
+
+        Percorre o índice do dia já ordenado e para ao completar a página;
+        ``filtros`` é um dicionário campo -> valor exigido. O cursor da
+        próxima página é None quando não há mais agendamentos.
+        """
+        if tamanho < 1:
+            raise ValueError(f'Tamanho de página inválido: {tamanho}')
+        filtros = filtros or {}
+        with self.trava:
+            agendamentos = self.diario.agendamentos
+            encontrados = []
+            for _, id_agendamento in self.indice_dia.percorrer(
+                dia_de(data_inicio) if data_inicio else None,
+                dia_de(data_fim) if data_fim else None,
+                cursor,
+                crescente
+            ):
+                agendamento = agendamentos[id_agendamento]
+                if all(getattr(agendamento, campo) == valor for campo, valor in filtros.items()):
+                    if len(encontrados) == tamanho:
+                        return encontrados, (encontrados[-1].inicio, encontrados[-1].id)
+                    encontrados.append(agendamento)
+            return encontrados, None
+
+    def contar_distintos(self, campo):
+        """Quantos valores distintos o campo tem (recalculado só depois de gravações)"""
+        with self.trava:
+            if campo not in self.distintos:
+                self.distintos[campo] = len({getattr(ag, campo) for ag in self.diario.agendamentos.values()})
+            return self.distintos[campo]
+
+
+class RepositorioSQLite(_ResumosMixin):
+    """Repositório em SQLite com índices em data, (data, hora) e campos de nome"""
+
+    def __init__(self, arquivo_db, tipo_registro, campos_indexados=(), arquivo_json=None, agregados=None):
+        self.tipo_registro = tipo_registro
+        self.campos = tuple(campos_indexados)
+        self.trava = threading.RLock()
+        self.agregados = agregados
+        self.versao = next(_versoes)
+        self.conexao = sqlite3.connect(arquivo_db, check_same_thread=False)
+        self._criar_tabela()
+        if arquivo_json and self.contar() == 0:
+            self._importar_json(arquivo_json)
+        if self.agregados is not None:
+            self._carregar_agregados()
+        # Montado na primeira pesquisa (importações em lote não pagam por ele)
+        self.indice_busca = None
+
+    def em_dia(self):
+        """As consultas vão direto ao banco, então o repositório está sempre em dia"""
+        return True
+
+    def recarregar(self):
+        """Nada a recarregar: o estado vive no banco"""
+
+    def _criar_tabela(self):
+        """Cria a tabela e os índices, se ainda não existirem"""
+        colunas = ''.join(f'{campo} TEXT, ' for campo in self.campos)
+        with self.trava, self.conexao:
+            self.conexao.execute(
+                'CREATE TABLE IF NOT EXISTS agendamentos ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL, hora TEXT NOT NULL, '
+                f'{colunas}dados TEXT NOT NULL)'
+            )
+            self.conexao.execute('CREATE INDEX IF NOT EXISTS idx_data ON agendamentos (data)')
+            self.conexao.execute('CREATE INDEX IF NOT EXISTS idx_data_hora ON agendamentos (data, hora)')
+            for campo in self.campos:
+                self.conexao.execute(f'CREATE INDEX IF NOT EXISTS idx_{campo} ON agendamentos ({campo})')
+            self.conexao.execute('CREATE TABLE IF NOT EXISTS agregados (chave TEXT PRIMARY KEY, dados TEXT NOT NULL)')
+            # Uma linha por (grupo, cliente): gravar um agendamento não reescreve o mapa de clientes inteiro
+            self.conexao.execute(
+                'CREATE TABLE IF NOT EXISTS agregados_clientes ('
+                'chave TEXT NOT NULL, cliente TEXT NOT NULL, quantidade INTEGER NOT NULL, PRIMARY KEY (chave, cliente))'
+            )
+
+    def _carregar_agregados(self):
+        """Lê os agregados gravados no banco, ou recalcula se não servirem (ou estiverem no formato antigo)"""
+        with self.trava:
+            linhas = self.conexao.execute('SELECT chave, dados FROM agregados').fetchall()
+            clientes = self.conexao.execute('SELECT chave, cliente, quantidade FROM agregados_clientes').fetchall()
+        grupos = {chave: json.loads(dados) for chave, dados in linhas}
+        precos = grupos.pop('__precos__', None)
+        if grupos.pop('__formato__', None) == FORMATO_AGREGADOS:
+            for grupo in grupos.values():
+                grupo['clientes'] = {}
+            for chave, cliente, quantidade in clientes:
+                if chave in grupos:
+                    grupos[chave]['clientes'][json.loads(cliente)] = quantidade
+            if self.agregados.importar({'precos': precos, 'grupos': grupos}) and (grupos or not self.contar()):
+                return
+
+        self.agregados.reconstruir(self.todos())
+        with self.trava, self.conexao:
+            self.conexao.execute('DELETE FROM agregados')
+            self.conexao.execute('DELETE FROM agregados_clientes')
+            self.conexao.executemany(
+                'INSERT INTO agregados (chave, dados) VALUES (?, ?)',
+                [(chave, _grupo_sem_clientes(grupo)) for chave, grupo in self.agregados.grupos.items()]
+            )
+            self.conexao.executemany(
+                'INSERT INTO agregados_clientes (chave, cliente, quantidade) VALUES (?, ?, ?)',
+                [
+                    (chave, json.dumps(cliente, ensure_ascii=False), quantidade)
+                    for chave, grupo in self.agregados.grupos.items()
+                    for cliente, quantidade in grupo['clientes'].items()
+                ]
+            )
+            self.conexao.executemany(
+                'INSERT INTO agregados (chave, dados) VALUES (?, ?)',
+                [('__precos__', json.dumps(self.agregados.assinatura_precos)), ('__formato__', str(FORMATO_AGREGADOS))]
+            )
+
+    def _atualizar_agregados(self, anterior, novo):
+        """Aplica a mudança nos agregados e grava só os grupos e clientes afetados"""
+        if self.agregados is None:
+            return
+        pares = set()
+        if anterior is not None:
+            self.agregados.remover(anterior)
+            pares.update(_pares_do_agendamento(anterior))
+        if novo is not None:
+            self.agregados.adicionar(novo)
+            pares.update(_pares_do_agendamento(novo))
+        self._gravar_grupos(pares)
+
+    def _gravar_grupos(self, pares):
+        """Grava (ou apaga, se esvaziaram) os grupos e as contagens dos pares (grupo, cliente) afetados.
+
+        O mapa de clientes de um grupo (o geral tem todos os clientes) não vai
+        no JSON do grupo: cada cliente tem a sua linha em ``agregados_clientes``.
+        """
+        grupos = self.agregados.grupos
+        for chave in {chave for chave, _ in pares}:
+            grupo = grupos.get(chave)
+            if grupo is None:
+                self.conexao.execute('DELETE FROM agregados WHERE chave = ?', (chave,))
+                self.conexao.execute('DELETE FROM agregados_clientes WHERE chave = ?', (chave,))
+            else:
+                self.conexao.execute(
+                    'REPLACE INTO agregados (chave, dados) VALUES (?, ?)', (chave, _grupo_sem_clientes(grupo))
+                )
+        for chave, cliente in pares:
+            quantidade = grupos[chave]['clientes'].get(cliente) if chave in grupos else None
+            cliente = json.dumps(cliente, ensure_ascii=False)
+            if quantidade:
+                self.conexao.execute(
+                    'REPLACE INTO agregados_clientes (chave, cliente, quantidade) VALUES (?, ?, ?)',
+                    (chave, cliente, quantidade)
+                )
+            else:
+                self.conexao.execute(
+                    'DELETE FROM agregados_clientes WHERE chave = ? AND cliente = ?', (chave, cliente)
+                )
+
+    def _importar_json(self, arquivo_json):
+        """Migra os dados do formato JSON (partições mensais ou arquivo único) para o banco"""
+        from agenda.particoes import ARQUIVO_MANIFESTO, RepositorioParticionado, pasta_das_particoes
+        gravacao.sincronizar()
+        if os.path.exists(os.path.join(pasta_das_particoes(arquivo_json), ARQUIVO_MANIFESTO)):
+            agendamentos = RepositorioParticionado(arquivo_json, self.tipo_registro).todos()
+        else:
+            diario = Diario(arquivo_json, tipo_registro=self.tipo_registro)
+            diario.carregar()
+            agendamentos = diario.agendamentos.values()
+        with self.trava, self.conexao:
+            self.conexao.executemany(self._sql_gravar('INSERT'), [self._linha(ag) for ag in agendamentos])
+
+    def _sql_gravar(self, comando):
+        """Monta o INSERT/REPLACE com todas as colunas"""
+        colunas = ('id', 'data', 'hora') + self.campos + ('dados',)
+        return f"{comando} INTO agendamentos ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})"
+
+    def _linha(self, agendamento):
+        """Converte um agendamento nos valores das colunas"""
+        return (
+            (agendamento.id, agendamento.data, agendamento.hora)
+            + tuple(getattr(agendamento, campo) for campo in self.campos)
+            + (json.dumps(agendamento.para_dict(), ensure_ascii=False),)
+        )
+
+    def _consultar(self, sql, parametros=()):
+        """Executa uma consulta e devolve os agendamentos encontrados"""
+        with self.trava:
+            linhas = self.conexao.execute(sql, parametros).fetchall()
+        return [self.tipo_registro.de_dict(json.loads(dados)) for (dados,) in linhas]
+
+    def _valor(self, sql, parametros=()):
+        """Executa uma consulta que devolve um único valor"""
+        with self.trava:
+            return self.conexao.execute(sql, parametros).fetchone()[0]
+
+    def todos(self):
+        """Retorna todos os agendamentos na ordem de cadastro"""
+        return self._consultar('SELECT dados FROM agendamentos ORDER BY id')
+
+    def contar(self):
+        """Retorna o número total de agendamentos"""
+        return self._valor('SELECT COUNT(*) FROM agendamentos')
+
+    def obter(self, id_agendamento):
+        """Retorna o agendamento com o id informado (ou None)"""
+        encontrados = self._consultar('SELECT dados FROM agendamentos WHERE id = ?', (id_agendamento,))
+        return encontrados[0] if encontrados else None
+
+    def inserir(self, agendamento):
+        """Cadastra um agendamento, atribuindo um id novo"""
+        with self.trava, self.conexao:
+            cursor = self.conexao.execute(
+                "INSERT INTO agendamentos (data, hora, dados) VALUES (?, ?, '{}')",
+                (agendamento.data, agendamento.hora)
+            )
+            agendamento.id = cursor.lastrowid
+            self.conexao.execute(self._sql_gravar('REPLACE'), self._linha(agendamento))
+            self._atualizar_agregados(None, agendamento)
+            if self.indice_busca is not None:
+                self.indice_busca.adicionar(agendamento)
+            self.versao = next(_versoes)
+        return agendamento
+
+    def inserir_lote(self, agendamentos):
+        """Cadastra vários agendamentos em uma única transação, atribuindo ids novos"""
+        with self.trava, self.conexao:
+            # A sequência do AUTOINCREMENT guarda o maior id já usado (mesmo se excluído)
+            linha = self.conexao.execute("SELECT seq FROM sqlite_sequence WHERE name = 'agendamentos'").fetchone()
+            ultimo_id = linha[0] if linha else 0
+            for posicao, agendamento in enumerate(agendamentos, 1):
+                agendamento.id = ultimo_id + posicao
+            self.conexao.executemany(self._sql_gravar('INSERT'), [self._linha(ag) for ag in agendamentos])
+            if self.agregados is not None:
+                pares = set()
+                for agendamento in agendamentos:
+                    self.agregados.adicionar(agendamento)
+                    pares.update(_pares_do_agendamento(agendamento))
+                self._gravar_grupos(pares)
+            if self.indice_busca is not None:
+                for agendamento in agendamentos:
+                    self.indice_busca.adicionar(agendamento)
+            self.versao = next(_versoes)
+        return agendamentos
+
+    def atualizar(self, agendamento):
+        """Substitui o agendamento de mesmo id"""
+        with self.trava, self.conexao:
+            anterior = self.obter(agendamento.id)
+            self.conexao.execute(self._sql_gravar('REPLACE'), self._linha(agendamento))
+            self._atualizar_agregados(anterior, agendamento)
+            if self.indice_busca is not None:
+                self.indice_busca.adicionar(agendamento)
+            self.versao = next(_versoes)
+        return agendamento
+
+    def excluir(self, id_agendamento):
+        """Remove o agendamento com o id informado"""
+        with self.trava, self.conexao:
+            anterior = self.obter(id_agendamento)
+            self.conexao.execute('DELETE FROM agendamentos WHERE id = ?', (id_agendamento,))
+            self._atualizar_agregados(anterior, None)
+            if self.indice_busca is not None:
+                self.indice_busca.remover(id_agendamento)
+            self.versao = next(_versoes)
+
+    def do_dia(self, data):
+        """Agendamentos de uma data (YYYY-MM-DD), ordenados por hora"""
+        return self._consultar('SELECT dados FROM agendamentos WHERE data = ? ORDER BY hora, id', (data,))
+
+    def do_mes(self, ano, mes):
+        """Agendamentos de um mês, na ordem de cadastro"""
+        return self._consultar(
+            'SELECT dados FROM agendamentos WHERE data BETWEEN ? AND ? ORDER BY id',
+            intervalo_mes(ano, mes)
+        )
+
+    def horas_ocupadas(self, data):
+        """Horas já agendadas em uma data"""
+        with self.trava:
+            linhas = self.conexao.execute('SELECT hora FROM agendamentos WHERE data = ? ORDER BY hora', (data,)).fetchall()
+        return [hora for (hora,) in linhas]
+
+    def pesquisar(self, termo, campos=None, limite=None):
+        """Agendamentos com o termo nos campos indexados (ou nos pedidos), por relevância"""
+        with self.trava:
+            if self.indice_busca is None:
+                self.indice_busca = IndiceBusca(self.campos, self.todos())
+            return self._por_ids(self.indice_busca.buscar(termo, campos, limite))
+
+    def pagina(self, tamanho, cursor=None, data_inicio=None, data_fim=None, filtros=None, crescente=False):
+        """Uma página em ordem de data/hora: devolve (agendamentos, cursor da próxima).
+
+        Paginação por chave sobre o índice (data, hora): cada página é uma
+        consulta com LIMIT a partir do cursor, sem OFFSET.
+        """
+        if tamanho < 1:
+            raise ValueError(f'Tamanho de página inválido: {tamanho}')
+        condicoes, parametros = [], []
+        if data_inicio:
+            condicoes.append('data >= ?')
+            parametros.append(str(data_inicio))
+        if data_fim:
+            condicoes.append('data <= ?')
+            parametros.append(str(data_fim))
+        for campo, valor in (filtros or {}).items():
+            condicoes.append(f'{self._coluna(campo)} = ?')
+            parametros.append(valor)
+        if cursor is not None:
+            inicio, id_agendamento = cursor
+            condicoes.append(f"(data, hora, id) {'>' if crescente else '<'} (?, ?, ?)")
+            parametros += [data_do_dia(inicio // MINUTOS_POR_DIA), hora_do_minuto(inicio % MINUTOS_POR_DIA), id_agendamento]
+
+        ordem = 'ASC' if crescente else 'DESC'
+        sql = 'SELECT dados FROM agendamentos'
+        if condicoes:
+            sql += ' WHERE ' + ' AND '.join(condicoes)
+        sql += f' ORDER BY data {ordem}, hora {ordem}, id {ordem} LIMIT ?'
+        encontrados = self._consultar(sql, parametros + [tamanho + 1])
+        if len(encontrados) > tamanho:
+            encontrados = encontrados[:tamanho]
+            return encontrados, (encontrados[-1].inicio, encontrados[-1].id)
+        return encontrados, None
+
+    def contar_distintos(self, campo):
+        """Quantos valores distintos o campo tem"""
+        return self._valor(f'SELECT COUNT(DISTINCT {self._coluna(campo)}) FROM agendamentos')
+
+    def _coluna(self, campo):
+        """Expressão SQL do campo: a coluna própria ou o valor dentro do JSON"""
+        return campo if campo in self.campos else f"json_extract(dados, '$.{campo}')"
+
+    def _por_ids(self, ids):
+        """Busca os agendamentos dos ids, mantendo a ordem recebida"""
+        encontrados = {}
+        for inicio in range(0, len(ids), LOTE_IDS):
+            lote = ids[inicio:inicio + LOTE_IDS]
+            for agendamento in self._consultar(
+                f"SELECT dados FROM agendamentos WHERE id IN ({', '.join('?' * len(lote))})", lote
+            ):
+                encontrados[agendamento.id] = agendamento
+        return [encontrados[id_agendamento] for id_agendamento in ids if id_agendamento in encontrados]
+
+
+def _pares_do_agendamento(agendamento):
+    """Pares (grupo, cliente) em que o agendamento conta"""
+    cliente = getattr(agendamento, 'cliente', None)
+    return [(chave, cliente) for chave in chaves_do_agendamento(agendamento)]
+
+
+def _grupo_sem_clientes(grupo):
+    """JSON do grupo sem o mapa de clientes (gravado à parte, em ``agregados_clientes``)"""
+    return json.dumps({campo: valor for campo, valor in grupo.items() if campo != 'clientes'}, ensure_ascii=False)
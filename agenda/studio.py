@@ -0,0 +1,206 @@
+"""Regras do studio de sobrancelhas (isa3.py), sem Streamlit nem pandas.
+
+Tudo aqui recebe o repositório como parâmetro, então serve tanto para a
+interface quanto para scripts e rotinas em lote.
+"""
+import calendar
+from datetime import datetime
+
+from agenda import metricas, periodos
+from agenda.estatisticas import Estatisticas
+from agenda.ocupacao import hora_em_minutos, montar_ocupacao
+from agenda.registros import Agendamento
+from agenda.repositorio import abrir_repositorio
+
+ARQUIVO_DADOS = 'agendamentos_sobracelhas.json'
+
+# Horários disponíveis (9h às 18h, de hora em hora)
+HORARIOS_DISPONIVEIS = [f"{h:02d}:00" for h in range(9, 18)]
+
+# Serviços oferecidos com preços padrão
+SERVICOS = {
+    "Cílios comun": 25.00,
+    "Design com Henna": 40.00,
+    "Combo": 110.00,
+    #"Aplicação de Cílios": 150.00,
+    "Buço": 15.00,
+    "Cílios Italiano": 70.00,
+    "Maquiagem": 100.00,
+    "Retoque Henna": 20.00
+}
+Agendamento.precos_padrao = SERVICOS
+
+# Taxas de deslocamento
+TAXAS_DESLOCAMENTO = {
+    "ZN - Zona Norte": 5.00,
+    "ZL - Zona Leste": 10.00,
+    "ZS - Zona Sul": 15.00,
+    "Sem taxas": 0.00
+}
+
+# Campos usados na pesquisa por nome/telefone
+CAMPOS_INDEXADOS = ('cliente', 'telefone')
+
+# Tipo dos registros e campos da importação/exportação em lote (agenda.transferencia)
+TIPO_REGISTRO = Agendamento
+CAMPOS_OBRIGATORIOS = ('cliente', 'telefone', 'servico', 'data', 'hora')
+CAMPOS_EXPORTACAO = (
+    'id', 'cliente', 'telefone', 'servico', 'data', 'hora', 'valor', 'taxa_deslocamento',
+    'tipo_taxa', 'valor_total', 'observacoes', 'data_cadastro', 'data_edicao'
+)
+
+# Colunas lidas pelos relatórios mensais (meses arquivados só descompactam estas)
+COLUNAS_RELATORIO = ('inicio', 'cliente', 'servico', 'valor_centavos', 'taxa_centavos')
+
+
+def abrir(arquivo=ARQUIVO_DADOS, backend='json'):
+    """Abre o repositório de agendamentos (com os agregados de faturamento)"""
+    return abrir_repositorio(
+        arquivo,
+        Agendamento,
+        backend,
+        campos_indexados=CAMPOS_INDEXADOS,
+        precificar=separar_valores_agendamento,
+        assinatura_precos=repr(sorted(SERVICOS.items()))
+    )
+
+
+def formatar_data(data_str):
+    """Formata data para exibição"""
+    try:
+        data_obj = datetime.strptime(data_str, '%Y-%m-%d')
+        return data_obj.strftime('%d/%m/%Y')
+    except:
+        return data_str
+
+
+def calcular_duracao_servico(servico):
+    """Calcula a duração estimada do serviço em minutos"""
+    duracao_map = {
+        "Design de Sobrancelhas": 30,
+        "Design com Henna": 45,
+        "Design + Henna + Tintura": 60,
+        "Aplicação de Cílios": 90,
+        "Remoção de Cílios": 30,
+        "Limpeza de Pele": 60,
+        "Maquiagem": 60,
+        "Pacote Completo": 180
+    }
+    return duracao_map.get(servico, 60)
+
+
+def ocupacao_do_dia(repositorio, data, ignorar_id=None):
+    """Monta a ocupação (minuto a minuto) da data a partir do índice do dia"""
+    return montar_ocupacao(
+        repositorio.do_dia(data),
+        lambda agendamento: calcular_duracao_servico(agendamento.servico),
+        ignorar_id
+    )
+
+
+def verificar_horario_disponivel(repositorio, data, hora, servico=None, ignorar_id=None):
+    """Verifica se o serviço cabe no horário sem sobrepor outro atendimento"""
+    return ocupacao_do_dia(repositorio, data, ignorar_id).livre(hora_em_minutos(hora), calcular_duracao_servico(servico))
+
+
+def listar_horarios_disponiveis(repositorio, data, servico=None, ignorar_id=None):
+    """Lista, em uma passada, os horários onde o serviço cabe inteiro"""
+    return ocupacao_do_dia(repositorio, data, ignorar_id).inicios_livres(
+        HORARIOS_DISPONIVEIS, calcular_duracao_servico(servico)
+    )
+
+
+def verificador_de_conflitos(agendamentos_do_dia):
+    """Função que diz se um novo agendamento do dia cabe (None) ou o motivo da recusa.
+
+    Parte da ocupação dos agendamentos já gravados no dia e vai ocupando
+    os aceitos, então serve para conferir um lote inteiro de uma vez.
+    """
+    ocupacao = montar_ocupacao(agendamentos_do_dia, lambda agendamento: calcular_duracao_servico(agendamento.servico))
+
+    def verificar(agendamento):
+        duracao = calcular_duracao_servico(agendamento.servico)
+        if not ocupacao.livre(agendamento.minuto, duracao):
+            return 'conflito de horário com outro atendimento'
+        ocupacao.ocupar(agendamento.minuto, duracao)
+        return None
+
+    return verificar
+
+
+def separar_valores_agendamento(agendamento):
+    """Separa o valor do serviço (cadastrado ou padrão) e a taxa de deslocamento"""
+    return agendamento.valor_servico_centavos / 100, agendamento.taxa_deslocamento
+
+
+def obter_valor_agendamento(agendamento):
+    """Obtém o valor do agendamento (usando valor cadastrado ou padrão)"""
+    valor_servico, taxa = separar_valores_agendamento(agendamento)
+
+    # Adicionar taxa de deslocamento se existir
+    return valor_servico + taxa
+
+
+@metricas.medir('calcular_saldo_dia')
+def calcular_saldo_dia(repositorio, data_str=None):
+    """Calcula o faturamento total de um dia específico"""
+    if data_str is None:
+        data_str = datetime.now().strftime('%Y-%m-%d')
+
+    resumo = repositorio.resumo_dia(data_str)
+
+    return {
+        'saldo_total': resumo['total'],
+        'quantidade': resumo['quantidade'],
+        'agendamentos': repositorio.do_dia(data_str),
+        'data': data_str
+    }
+
+
+@metricas.medir('calcular_saldo_mes')
+def calcular_saldo_mes(repositorio, ano=None, mes=None):
+    """Calcula o faturamento total de um mês específico (os agendamentos ficam em ``colunas_mes``)"""
+    if ano is None or mes is None:
+        hoje = datetime.now()
+        ano = hoje.year
+        mes = hoje.month
+
+    resumo = repositorio.resumo_mes(ano, mes)
+
+    return {
+        'saldo_total': resumo['total'],
+        'quantidade': resumo['quantidade'],
+        'mes': mes,
+        'ano': ano,
+        'nome_mes': calendar.month_name[mes]
+    }
+
+
+@metricas.medir('calcular_saldo_periodo')
+def calcular_saldo_periodo(repositorio, inicio, fim):
+    """Calcula o faturamento de um intervalo de datas (inclusive), com o detalhe por dia"""
+    somas = periodos.somas_do_repositorio(repositorio)
+    resumo = somas.somar(inicio, fim)
+
+    return {
+        'saldo_total': resumo['total'],
+        'quantidade': resumo['quantidade'],
+        'taxas': resumo['taxas'],
+        'inicio': str(inicio),
+        'fim': str(fim),
+        'por_dia': somas.por_dia(inicio, fim)
+    }
+
+
+@metricas.medir('calcular_estatisticas_mes', registros=None)
+def calcular_estatisticas_mes(repositorio, ano=None, mes=None):
+    """Calcula estatísticas detalhadas do mês (uma passada pelas colunas do mês)"""
+    if ano is None or mes is None:
+        hoje = datetime.now()
+        ano = hoje.year
+        mes = hoje.month
+
+    colunas = repositorio.colunas_mes(ano, mes, COLUNAS_RELATORIO)
+    metricas.somar_registros(len(colunas['inicio']))
+
+    return Estatisticas(SERVICOS).adicionar_colunas(colunas).resultado()
@@ -0,0 +1,208 @@
+"""Importação e exportação em lote (CSV ou JSONL) para os dois sistemas.
+
+As linhas são lidas e gravadas em fluxo: a memória usada depende do
+tamanho do lote, não do arquivo. Cada lote é validado, conferido contra
+os agendamentos já gravados em cada dia (e contra as linhas aceitas antes
+dele) e gravado com uma única escrita no repositório.
+
+Uso:
+    python -m agenda.transferencia importar studio entrada.csv [--rejeitados rejeitados.jsonl]
+    python -m agenda.transferencia exportar pet saida.jsonl [--de 2025-01-01] [--ate 2025-12-31]
+
+Use ``-`` como arquivo para ler da entrada ou escrever na saída padrão.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from agenda import pet, studio
+from agenda.repositorio import BACKENDS
+
+# Esquema de cada sistema: módulo com abrir, TIPO_REGISTRO, CAMPOS_OBRIGATORIOS,
+# CAMPOS_EXPORTACAO e verificador_de_conflitos
+ESQUEMAS = {'studio': studio, 'pet': pet}
+
+TAMANHO_LOTE = 5000
+
+
+def formato_do_arquivo(caminho, formato=None):
+    """'csv' ou 'jsonl', pelo parâmetro ou pela extensão do arquivo"""
+    if formato:
+        return formato
+    return 'csv' if caminho.lower().endswith('.csv') else 'jsonl'
+
+
+def ler_linhas(arquivo, formato):
+    """Gera pares (número da linha, dicionário) do CSV ou JSONL, sem carregar o arquivo"""
+    if formato == 'csv':
+        for numero, linha in enumerate(csv.DictReader(arquivo), 2):
+            # No CSV, campo vazio equivale a ausente
+            yield numero, {campo: valor for campo, valor in linha.items() if valor not in ('', None)}
+    else:
+        for numero, linha in enumerate(arquivo, 1):
+            if linha.strip():
+                try:
+                    yield numero, json.loads(linha)
+                except ValueError as e:
+                    yield numero, {'__erro__': f'JSON inválido: {e}'}
+
+
+def validar(esquema, dados):
+    """Converte a linha em registro; devolve (agendamento, None) ou (None, motivo)"""
+    if not isinstance(dados, dict):
+        return None, f'a linha deve ser um objeto JSON, não {type(dados).__name__}'
+    if '__erro__' in dados:
+        return None, dados['__erro__']
+    for campo in esquema.CAMPOS_OBRIGATORIOS:
+        valor = dados.get(campo)
+        if valor is None or not str(valor).strip():
+            return None, f'campo obrigatório vazio: {campo}'
+    try:
+        date.fromisoformat(dados['data'])
+        horas, minutos = (int(parte) for parte in dados['hora'].split(':'))
+        if not (0 <= horas < 24 and 0 <= minutos < 60):
+            raise ValueError(f"hora fora do intervalo: {dados['hora']}")
+        dados = dict(dados, id=None)  # o repositório atribui ids novos
+        return esquema.TIPO_REGISTRO.de_dict(dados), None
+    except (ValueError, TypeError, AttributeError, OverflowError) as e:
+        return None, f'valor inválido: {e}'
+
+
+def conferir_lote(repositorio, esquema, lote, rejeitar):
+    """Confere os itens ``(número, dados, agendamento)`` dia a dia; devolve os agendamentos aceitos.
+
+    Cada item é conferido contra o que já está gravado no dia e contra os
+    aceitos antes dele no mesmo lote; os recusados vão para ``rejeitar``.
+    """
+    por_dia = {}
+    for item in lote:
+        por_dia.setdefault(item[2].data, []).append(item)
+
+    aceitos = []
+    for data, itens in por_dia.items():
+        verificar = esquema.verificador_de_conflitos(repositorio.do_dia(data))
+        for numero, dados, agendamento in itens:
+            motivo = verificar(agendamento)
+            if motivo:
+                rejeitar(numero, dados, motivo)
+            else:
+                aceitos.append(agendamento)
+    return aceitos
+
+
+def gravar_lote(repositorio, esquema, lote, rejeitar):
+    """Confere conflitos dia a dia e grava os aceitos de uma vez; devolve quantos entraram"""
+    aceitos = conferir_lote(repositorio, esquema, lote, rejeitar)
+    if aceitos:
+        repositorio.inserir_lote(aceitos)
+    # Partições de outros meses saem da memória (voltam sob demanda)
+    if hasattr(repositorio, 'descarregar'):
+        repositorio.descarregar(manter={agendamento.data[:7] for _, _, agendamento in lote})
+    return len(aceitos)
+
+
+def importar(repositorio, esquema, linhas, rejeitar, tamanho_lote=TAMANHO_LOTE):
+    """Importa as linhas ((número, dicionário)) em lotes; devolve (importados, rejeitados)"""
+    importados = rejeitados = 0
+    lote = []
+
+    def contar_rejeicao(numero, dados, motivo):
+        nonlocal rejeitados
+        rejeitados += 1
+        rejeitar(numero, dados, motivo)
+
+    for numero, dados in linhas:
+        agendamento, motivo = validar(esquema, dados)
+        if motivo:
+            contar_rejeicao(numero, dados, motivo)
+            continue
+        lote.append((numero, dados, agendamento))
+        if len(lote) >= tamanho_lote:
+            importados += gravar_lote(repositorio, esquema, lote, contar_rejeicao)
+            lote = []
+    if lote:
+        importados += gravar_lote(repositorio, esquema, lote, contar_rejeicao)
+
+    # Meses encerrados que a importação reativou voltam para o arquivo morto
+    if hasattr(repositorio, 'arquivar'):
+        repositorio.arquivar()
+    return importados, rejeitados
+
+
+def exportar(repositorio, esquema, arquivo, formato, data_inicio=None, data_fim=None, tamanho_lote=TAMANHO_LOTE):
+    """Escreve os agendamentos em ordem de data/hora, página a página; devolve quantos"""
+    escritor = None
+    if formato == 'csv':
+        escritor = csv.DictWriter(arquivo, esquema.CAMPOS_EXPORTACAO, extrasaction='ignore')
+        escritor.writeheader()
+
+    quantidade = 0
+    cursor = None
+    while True:
+        pagina, cursor = repositorio.pagina(tamanho_lote, cursor, data_inicio, data_fim, crescente=True)
+        for agendamento in pagina:
+            if escritor:
+                escritor.writerow(agendamento.para_dict())
+            else:
+                arquivo.write(json.dumps(agendamento.para_dict(), ensure_ascii=False) + '\n')
+        quantidade += len(pagina)
+        if cursor is None:
+            return quantidade
+        if hasattr(repositorio, 'descarregar'):
+            repositorio.descarregar(manter={pagina[-1].data[:7]})
+
+
+@contextmanager
+def abrir_arquivo(caminho, modo):
+    """Abre o arquivo (ou a entrada/saída padrão para '-') em UTF-8"""
+    if caminho == '-':
+        yield sys.stdin if modo == 'r' else sys.stdout
+    else:
+        with open(caminho, modo, encoding='utf-8', newline='') as arquivo:
+            yield arquivo
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('acao', choices=('importar', 'exportar'))
+    parser.add_argument('sistema', choices=sorted(ESQUEMAS))
+    parser.add_argument('arquivo', help="CSV ou JSONL ('-' para entrada/saída padrão)")
+    parser.add_argument('--formato', choices=('csv', 'jsonl'), help='padrão: pela extensão do arquivo')
+    parser.add_argument('--dados', help='arquivo de dados do sistema (padrão: o do próprio sistema)')
+    parser.add_argument('--backend', choices=BACKENDS, default=os.environ.get('AGENDA_BACKEND', 'json'))
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='linhas por gravação')
+    parser.add_argument('--rejeitados', help='JSONL com as linhas recusadas e o motivo (importação)')
+    parser.add_argument('--de', help='primeira data exportada (YYYY-MM-DD)')
+    parser.add_argument('--ate', help='última data exportada (YYYY-MM-DD)')
+    args = parser.parse_args(argumentos)
+
+    esquema = ESQUEMAS[args.sistema]
+    repositorio = esquema.abrir(args.dados or esquema.ARQUIVO_DADOS, args.backend)
+    formato = formato_do_arquivo(args.arquivo, args.formato)
+    inicio = time.perf_counter()
+
+    if args.acao == 'exportar':
+        with abrir_arquivo(args.arquivo, 'w') as saida:
+            quantidade = exportar(repositorio, esquema, saida, formato, args.de, args.ate, args.lote)
+        print(f'{quantidade} agendamentos exportados em {time.perf_counter() - inicio:.1f}s', file=sys.stderr)
+        return
+
+    with abrir_arquivo(args.arquivo, 'r') as entrada, \
+            abrir_arquivo(args.rejeitados or os.devnull, 'w') as saida_rejeitados:
+        def rejeitar(numero, dados, motivo):
+            saida_rejeitados.write(json.dumps({'linha': numero, 'motivo': motivo, 'dados': dados}, ensure_ascii=False) + '\n')
+
+        importados, rejeitados = importar(repositorio, esquema, ler_linhas(entrada, formato), rejeitar, args.lote)
+    print(
+        f'{importados} agendamentos importados, {rejeitados} rejeitados em {time.perf_counter() - inicio:.1f}s',
+        file=sys.stderr
+    )
+
+
+if __name__ == '__main__':
+    main()
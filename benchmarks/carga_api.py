@@ -0,0 +1,232 @@
+"""Teste de carga da API HTTP (``agenda.api``): requisições por segundo e latência p99.
+
+Sobe a API num processo separado (uvicorn), sobre um repositório
+temporário populado pelo gerador, e abre ``--conexoes`` conexões
+keep-alive que disparam requisições sem pausa durante ``--duracao``
+segundos. A mistura imita o widget de reservas: consultas de
+disponibilidade, listagem, pesquisa, saldo do dia e uma fração
+(``--escritas``) de novos agendamentos.
+
+O cliente é HTTP/1.1 mínimo sobre ``asyncio`` (sem dependências além do
+uvicorn, que o servidor usa). Com ``--url`` mede uma API já rodando.
+
+Uso: python benchmarks/carga_api.py [--sistema studio] [--agendamentos 100000]
+     [--conexoes 50] [--duracao 10] [--escritas 0.1] [--backend json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from urllib.parse import quote, urlsplit
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from agenda import pet, studio
+from agenda.repositorio import cache_repositorios
+from benchmarks.medir_escala import TERMOS_PESQUISA, popular
+
+ESQUEMAS = {'studio': studio, 'pet': pet}
+
+
+def percentil(ordenados, fracao):
+    """Percentil (0 a 1) de uma lista já ordenada"""
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+def porta_livre():
+    """Uma porta TCP livre em 127.0.0.1"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Conexao:
+    """Conexão HTTP/1.1 keep-alive (só o necessário para respostas com content-length)"""
+
+    def __init__(self, host, porta):
+        self.host = host
+        self.porta = porta
+        self.leitor = self.escritor = None
+
+    async def pedir(self, metodo, caminho, corpo=None):
+        """Envia a requisição; devolve (status, corpo)"""
+        if self.escritor is None:
+            self.leitor, self.escritor = await asyncio.open_connection(self.host, self.porta)
+        conteudo = json.dumps(corpo).encode('utf-8') if corpo is not None else b''
+        self.escritor.write(
+            f'{metodo} {caminho} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(conteudo)}\r\n'
+            f'Content-Type: application/json\r\n\r\n'.encode('latin-1') + conteudo
+        )
+        await self.escritor.drain()
+        status = int((await self.leitor.readline()).split()[1])
+        tamanho = 0
+        while True:
+            linha = await self.leitor.readline()
+            if linha in (b'\r\n', b''):
+                break
+            nome, _, valor = linha.decode('latin-1').partition(':')
+            if nome.lower() == 'content-length':
+                tamanho = int(valor)
+        return status, await self.leitor.readexactly(tamanho)
+
+    def fechar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+
+
+def montar_pedidos(sistema, hoje, fracao_escritas, aleatorio):
+    """Função que sorteia o próximo pedido: (rota, método, caminho, corpo)"""
+    dias = [(hoje + timedelta(days=i)).isoformat() for i in range(-30, 30)]
+    servicos = list(studio.SERVICOS)
+    consultas = [
+        ('disponibilidade', lambda: f'/disponibilidade?data={aleatorio.choice(dias)}'
+                                    f'&servico={quote(aleatorio.choice(servicos))}'),
+        ('listar', lambda: f'/agendamentos?de={aleatorio.choice(dias)}&tamanho=20'),
+        ('pesquisa', lambda: f'/pesquisa?termo={quote(aleatorio.choice(TERMOS_PESQUISA))}&limite=20'),
+    ]
+    if sistema == 'studio':
+        consultas.append(('saldo_dia', lambda: f'/saldo/dia?data={aleatorio.choice(dias)}'))
+
+    def novo():
+        # Datas bem à frente: a maioria cabe, o resto volta 409 (conflito)
+        dados = {
+            'data': (hoje + timedelta(days=aleatorio.randint(60, 3000))).isoformat(),
+            'hora': aleatorio.choice(studio.HORARIOS_DISPONIVEIS)
+        }
+        if sistema == 'studio':
+            dados.update(cliente='Carga', telefone='11 900000000', servico=aleatorio.choice(servicos),
+                         tipo_taxa=aleatorio.choice(list(studio.TAXAS_DESLOCAMENTO)))
+        else:
+            dados.update(tutor='Carga', pet=f'Pet {aleatorio.randint(1, 10 ** 6)}')
+        return dados
+
+    def sortear():
+        if aleatorio.random() < fracao_escritas:
+            return 'criar', 'POST', '/agendamentos', novo()
+        rota, caminho = aleatorio.choice(consultas)
+        return rota, 'GET', caminho(), None
+    return sortear
+
+
+async def carregar(host, porta, sistema, conexoes, duracao, fracao_escritas, semente, hoje):
+    """Roda a carga; devolve as latências por rota e a contagem de status"""
+    latencias = {}
+    status_contagem = {}
+    fim = None
+
+    async def cliente(numero):
+        aleatorio = random.Random(semente + numero)
+        sortear = montar_pedidos(sistema, hoje, fracao_escritas, aleatorio)
+        conexao = Conexao(host, porta)
+        try:
+            while time.perf_counter() < fim:
+                rota, metodo, caminho, corpo = sortear()
+                inicio = time.perf_counter()
+                status, _ = await conexao.pedir(metodo, caminho, corpo)
+                latencias.setdefault(rota, []).append(time.perf_counter() - inicio)
+                status_contagem[status] = status_contagem.get(status, 0) + 1
+        finally:
+            conexao.fechar()
+
+    # A primeira pesquisa monta o índice de busca (custo único, medido em medir_escala.py)
+    aquecimento = Conexao(host, porta)
+    await aquecimento.pedir('GET', '/pesquisa?termo=aquecimento&limite=1')
+    aquecimento.fechar()
+
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+    await asyncio.gather(*(cliente(numero) for numero in range(conexoes)))
+    return latencias, status_contagem, time.perf_counter() - inicio
+
+
+def resumir(latencias, segundos):
+    """Requisições/s e percentis (ms) de uma lista de latências"""
+    ordenadas = sorted(latencias)
+    return {
+        'requisicoes': len(ordenadas),
+        'req_por_s': round(len(ordenadas) / segundos, 1),
+        'p50_ms': round(percentil(ordenadas, 0.50) * 1000, 2) if ordenadas else None,
+        'p99_ms': round(percentil(ordenadas, 0.99) * 1000, 2) if ordenadas else None,
+        'max_ms': round(ordenadas[-1] * 1000, 2) if ordenadas else None
+    }
+
+
+def esperar_api(host, porta, processo, limite=60):
+    """Espera a API responder em /saude (ou o processo morrer)"""
+    prazo = time.perf_counter() + limite
+    while time.perf_counter() < prazo:
+        if processo.poll() is not None:
+            raise RuntimeError('a API encerrou antes de responder')
+        try:
+            with socket.create_connection((host, porta), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('a API não respondeu a tempo')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sistema', choices=sorted(ESQUEMAS), default='studio')
+    parser.add_argument('--agendamentos', type=int, default=100000)
+    parser.add_argument('--backend', choices=('json', 'sqlite'), default='json')
+    parser.add_argument('--conexoes', type=int, default=50)
+    parser.add_argument('--duracao', type=float, default=10)
+    parser.add_argument('--escritas', type=float, default=0.1, help='fração de POST /agendamentos')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--url', help='API já rodando (não sobe servidor nem gera dados)')
+    args = parser.parse_args()
+
+    hoje = date.today()
+    processo = None
+    with tempfile.TemporaryDirectory() as pasta:
+        if args.url:
+            partes = urlsplit(args.url)
+            host, porta = partes.hostname, partes.port or 80
+        else:
+            esquema = ESQUEMAS[args.sistema]
+            arquivo = os.path.join(pasta, os.path.basename(esquema.ARQUIVO_DADOS))
+            popular(esquema.abrir(arquivo, args.backend), args.sistema, args.agendamentos, args.semente, hoje)
+            cache_repositorios.limpar()
+            host, porta = '127.0.0.1', porta_livre()
+            processo = subprocess.Popen(
+                [sys.executable, '-m', 'agenda.api', args.sistema, '--dados', arquivo,
+                 '--backend', args.backend, '--porta', str(porta)],
+                cwd=RAIZ
+            )
+        try:
+            if processo is not None:
+                esperar_api(host, porta, processo)
+            latencias, status_contagem, segundos = asyncio.run(carregar(
+                host, porta, args.sistema, args.conexoes, args.duracao, args.escritas, args.semente, hoje
+            ))
+        finally:
+            if processo is not None:
+                processo.terminate()
+                processo.wait()
+
+    todas = [latencia for lista in latencias.values() for latencia in lista]
+    print(json.dumps({
+        'sistema': args.sistema,
+        'backend': args.backend,
+        'agendamentos': None if args.url else args.agendamentos,
+        'conexoes': args.conexoes,
+        'duracao_s': round(segundos, 1),
+        'total': resumir(todas, segundos),
+        'por_rota': {rota: resumir(lista, segundos) for rota, lista in sorted(latencias.items())},
+        'status': {str(status): quantidade for status, quantidade in sorted(status_contagem.items())}
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
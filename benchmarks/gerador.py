@@ -0,0 +1,107 @@
+"""Gerador de agendamentos sintéticos (com semente) para os dois sistemas.
+
+Usa os serviços, zonas de deslocamento e horários do próprio studio, então
+os dados passam pelas mesmas regras de preço e de agenda da interface.
+As datas ficam espalhadas pelos ``dias`` anteriores a ``hoje`` (e um mês
+depois dele); a mesma semente e a mesma data geram sempre os mesmos dados.
+
+Uso: python benchmarks/gerador.py studio|pet QUANTIDADE saida.csv|saida.jsonl [--semente 42]
+(o arquivo gerado pode ser carregado com ``python -m agenda.transferencia importar``)
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from agenda.studio import HORARIOS_DISPONIVEIS, SERVICOS, TAXAS_DESLOCAMENTO
+
+NOMES = ["Ana", "Beatriz", "Carla", "Daniela", "Fernanda", "José", "Juliana", "Luíza", "Mariana", "Tânia"]
+SOBRENOMES = ["Silva", "Souza", "Araújo", "Lima", "Gonçalves", "Pereira", "Ribeiro"]
+PETS = ["Rex", "Mel", "Thor", "Luna", "Bob", "Nina", "Fred", "Amora", "Pipoca", "Zeus"]
+
+DIAS_PADRAO = 730
+
+
+def _dia(aleatorio, hoje, dias):
+    """Data entre ``dias`` atrás e 30 dias à frente"""
+    return hoje - timedelta(days=aleatorio.randint(-30, dias))
+
+
+def _pessoa(aleatorio):
+    """Nome e sobrenome sorteados"""
+    return f"{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)}"
+
+
+def gerar_studio(quantidade, semente=42, hoje=None, dias=DIAS_PADRAO):
+    """Gera (sem guardar em lista) agendamentos do studio no formato do JSON"""
+    aleatorio = random.Random(semente)
+    hoje = hoje or date.today()
+    servicos = list(SERVICOS)
+    zonas = list(TAXAS_DESLOCAMENTO.items())
+    for _ in range(quantidade):
+        dia = _dia(aleatorio, hoje, dias)
+        servico = aleatorio.choice(servicos)
+        tipo_taxa, taxa = aleatorio.choice(zonas)
+        # A maioria usa o preço da tabela (valor 0); alguns têm preço combinado
+        valor = 0 if aleatorio.random() < 0.8 else round(SERVICOS[servico] * aleatorio.uniform(0.8, 1.2), 2)
+        yield {
+            'cliente': _pessoa(aleatorio),
+            'telefone': f"11 9{aleatorio.randint(0, 99999999):08d}",
+            'servico': servico,
+            'data': dia.isoformat(),
+            'hora': aleatorio.choice(HORARIOS_DISPONIVEIS),
+            'valor': valor,
+            'taxa_deslocamento': taxa,
+            'tipo_taxa': tipo_taxa,
+            'observacoes': None,
+            'data_cadastro': (dia - timedelta(days=aleatorio.randint(0, 30))).isoformat() + ' 08:00:00'
+        }
+
+
+def gerar_pet(quantidade, semente=42, hoje=None, dias=DIAS_PADRAO):
+    """Gera (sem guardar em lista) agendamentos do sistema PET no formato do JSON"""
+    aleatorio = random.Random(semente)
+    hoje = hoje or date.today()
+    for _ in range(quantidade):
+        yield {
+            'tutor': _pessoa(aleatorio),
+            'pet': aleatorio.choice(PETS),
+            'data': _dia(aleatorio, hoje, dias).isoformat(),
+            'hora': aleatorio.choice(HORARIOS_DISPONIVEIS)
+        }
+
+
+GERADORES = {'studio': gerar_studio, 'pet': gerar_pet}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('sistema', choices=sorted(GERADORES))
+    parser.add_argument('quantidade', type=int)
+    parser.add_argument('saida', help='.csv ou .jsonl')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--dias', type=int, default=DIAS_PADRAO, help='período coberto, para trás a partir de hoje')
+    args = parser.parse_args()
+
+    linhas = GERADORES[args.sistema](args.quantidade, args.semente, dias=args.dias)
+    with open(args.saida, 'w', encoding='utf-8', newline='') as f:
+        if args.saida.lower().endswith('.csv'):
+            primeira = next(linhas, None)
+            if primeira is not None:
+                escritor = csv.DictWriter(f, list(primeira))
+                escritor.writeheader()
+                escritor.writerow(primeira)
+                escritor.writerows(linhas)
+        else:
+            for linha in linhas:
+                f.write(json.dumps(linha, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+"""Mede as operações da agenda com 1 mil a 1 milhão de agendamentos.
+
+Para cada sistema, backend e tamanho, popula um repositório novo com o
+gerador (``benchmarks/gerador.py``, com semente) e cronometra as mesmas
+operações que as páginas usam: abrir o repositório, gravar, conferir
+horário, saldos, estatísticas e pesquisa. O resultado é um JSON com o
+commit atual, para comparar execuções de commits diferentes:
+
+    python benchmarks/medir_escala.py --saida antes.json
+    (muda o código)
+    python benchmarks/medir_escala.py --saida depois.json --comparar antes.json
+
+Uso: python benchmarks/medir_escala.py [--tamanhos 1000,10000,100000,1000000]
+     [--sistemas studio,pet] [--backends json,sqlite] [--repeticoes 20]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from agenda import pet, studio
+from agenda.estatisticas import Estatisticas
+from agenda.medicao import mediana
+from agenda.repositorio import cache_repositorios
+from benchmarks.gerador import GERADORES
+
+ESQUEMAS = {'studio': studio, 'pet': pet}
+
+TAMANHO_LOTE = 10000
+
+# Termos pesquisados (nome inteiro, começo de palavra com acento, trecho curto)
+TERMOS_PESQUISA = ('Silva', 'Gonç', 'an')
+
+# Diferenças menores que isto (ms) são ruído, mesmo com razão alta
+FOLGA_MS = 0.5
+
+
+def popular(repositorio, sistema, quantidade, semente, hoje):
+    """Grava ``quantidade`` agendamentos sintéticos em lotes; devolve os segundos gastos"""
+    tipo_registro = ESQUEMAS[sistema].TIPO_REGISTRO
+    inicio = time.perf_counter()
+    lote = []
+    for dados in GERADORES[sistema](quantidade, semente, hoje):
+        lote.append(tipo_registro.de_dict(dados))
+        if len(lote) >= TAMANHO_LOTE:
+            repositorio.inserir_lote(lote)
+            # Datas sorteadas caem em todos os meses: descarrega só os que o lote não usou
+            if hasattr(repositorio, 'descarregar'):
+                repositorio.descarregar(manter={agendamento.data[:7] for agendamento in lote})
+            lote = []
+    if lote:
+        repositorio.inserir_lote(lote)
+    if hasattr(repositorio, 'arquivar'):
+        repositorio.arquivar(hoje.strftime('%Y-%m'))
+    return time.perf_counter() - inicio
+
+
+def cronometrar(funcao, repeticoes):
+    """Executa ``funcao(i)`` para i em range(repeticoes); devolve as durações em segundos"""
+    tempos = []
+    for repeticao in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(repeticao)
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def operacoes(sistema, esquema, arquivo, backend, hoje):
+    """Pares (nome, função(repetição)) a cronometrar, na ordem em que rodam.
+
+    Os nomes seguem as funções equivalentes das interfaces (isa3.py e
+    webcrudpetPY.py). ``carregar_agendamentos`` é o que cada rerun paga
+    (repositório já em cache); "a frio" é a abertura na partida do app.
+    A primeira pesquisa monta o índice de busca, então aparece separada
+    das seguintes.
+    """
+    repositorio = esquema.abrir(arquivo, backend)
+    dias = [(hoje - timedelta(days=i)).isoformat() for i in range(30)]
+    mes_atual = (hoje.year, hoje.month)
+    mes_antigo = (hoje.year - 1, hoje.month)  # arquivado no backend JSON
+    inseridos = []
+
+    def salvar(i):
+        dados = next(GERADORES[sistema](1, semente=1000 + i, hoje=hoje, dias=0))
+        inseridos.append(repositorio.inserir(esquema.TIPO_REGISTRO.de_dict(dados)).id)
+
+    def abrir_a_frio(i):
+        cache_repositorios.limpar()
+        esquema.abrir(arquivo, backend)
+
+    def limpar():
+        for id_agendamento in inseridos:
+            repositorio.excluir(id_agendamento)
+
+    lista = [
+        ('carregar_agendamentos (a frio)', abrir_a_frio),
+        ('carregar_agendamentos', lambda i: esquema.abrir(arquivo, backend)),
+        ('salvar_agendamentos', salvar),
+    ]
+    if sistema == 'studio':
+        servicos = list(studio.SERVICOS)
+        lista += [
+            ('verificar_horario_disponivel', lambda i: studio.verificar_horario_disponivel(
+                repositorio, dias[i % 30], studio.HORARIOS_DISPONIVEIS[i % 9], servicos[i % len(servicos)]
+            )),
+            ('calcular_saldo_dia', lambda i: studio.calcular_saldo_dia(repositorio, dias[i % 30])),
+            ('calcular_saldo_mes', lambda i: studio.calcular_saldo_mes(repositorio, *mes_atual)),
+            ('calcular_saldo_periodo (12 meses)', lambda i: studio.calcular_saldo_periodo(
+                repositorio, hoje - timedelta(days=365 + i), hoje - timedelta(days=i)
+            )),
+            ('calcular_estatisticas_mes', lambda i: studio.calcular_estatisticas_mes(repositorio, *mes_atual)),
+            ('calcular_estatisticas_mes (ano anterior)',
+             lambda i: studio.calcular_estatisticas_mes(repositorio, *mes_antigo)),
+        ]
+    else:
+        lista.append(('agendamentos_do_dia', lambda i: repositorio.do_dia(dias[i % 30])))
+    lista += [
+        ('pesquisar (primeira)', lambda i: repositorio.pesquisar(TERMOS_PESQUISA[0], limite=50)),
+        ('pesquisar', lambda i: repositorio.pesquisar(TERMOS_PESQUISA[i % len(TERMOS_PESQUISA)], limite=50)),
+    ]
+    return lista, limpar
+
+
+def medir(sistema, backend, quantidade, repeticoes, semente, hoje):
+    """Popula um repositório temporário e mede as operações; devolve a lista de resultados"""
+    esquema = ESQUEMAS[sistema]
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo = os.path.join(pasta, os.path.basename(esquema.ARQUIVO_DADOS))
+        cache_repositorios.limpar()
+        segundos = popular(esquema.abrir(arquivo, backend), sistema, quantidade, semente, hoje)
+        cache_repositorios.limpar()
+        base = {'sistema': sistema, 'backend': backend, 'agendamentos': quantidade}
+        resultados.append(dict(base, operacao='popular', mediana_ms=round(segundos * 1000, 1), repeticoes=1))
+
+        lista, limpar = operacoes(sistema, esquema, arquivo, backend, hoje)
+        for nome, funcao in lista:
+            vezes = 1 if nome.endswith('(primeira)') else repeticoes
+            tempos = cronometrar(funcao, vezes)
+            resultados.append(dict(
+                base,
+                operacao=nome,
+                mediana_ms=round(mediana(tempos) * 1000, 3),
+                minimo_ms=round(min(tempos) * 1000, 3),
+                repeticoes=vezes
+            ))
+            print(f"{sistema}/{backend}/{quantidade}: {nome} {resultados[-1]['mediana_ms']} ms", file=sys.stderr)
+        if sistema == 'studio':
+            conferencia = conferir_estatisticas(esquema.abrir(arquivo, backend), hoje)
+            for resultado in resultados:
+                if resultado['operacao'] in conferencia:
+                    resultado.update(conferencia[resultado['operacao']])
+        limpar()
+        cache_repositorios.limpar()
+    return resultados
+
+
+class ColunaContada:
+    """Coluna que avisa o ``RepositorioContado`` quando começa a ser percorrida e quando entrega valores"""
+
+    def __init__(self, valores, contador):
+        self.valores = valores
+        self.contador = contador
+
+    def __iter__(self):
+        self.contador.comecar()
+        return self._percorrer()
+
+    def _percorrer(self):
+        for valor in self.valores:
+            self.contador.lendo = True
+            yield valor
+
+    def __len__(self):
+        return len(self.valores)
+
+    def __getitem__(self, posicao):
+        return self.valores[posicao]
+
+
+class RepositorioContado:
+    """Repositório cujo ``colunas_mes`` entrega colunas contadas (o resto vai para o repositório).
+
+    Uma passada começa quando uma coluna começa a ser percorrida depois de
+    algum valor já ter sido lido; colunas percorridas juntas (``zip``)
+    contam uma passada só.
+    """
+
+    def __init__(self, repositorio):
+        self.repositorio = repositorio
+        self.passadas = 0
+        self.lendo = False
+
+    def comecar(self):
+        if self.lendo or not self.passadas:
+            self.passadas += 1
+            self.lendo = False
+
+    def colunas_mes(self, ano, mes, campos):
+        return {
+            campo: ColunaContada(valores, self)
+            for campo, valores in self.repositorio.colunas_mes(ano, mes, campos).items()
+        }
+
+    def __getattr__(self, nome):
+        return getattr(self.repositorio, nome)
+
+
+def conferir_estatisticas(repositorio, hoje):
+    """Por chamada de ``calcular_estatisticas_mes``: passadas pelas colunas do mês e se ``juntar`` confere.
+
+    ``passadas`` conta os laços pelas colunas do mês (ver ``RepositorioContado``).
+    ``juntar_confere`` diz se juntar os acumuladores do mês e do mesmo mês
+    do ano anterior (duas partições) dá o mesmo que uma passada pelas
+    colunas dos dois meses emendadas.
+    """
+    meses = {
+        'calcular_estatisticas_mes': (hoje.year, hoje.month),
+        'calcular_estatisticas_mes (ano anterior)': (hoje.year - 1, hoje.month)
+    }
+    por_mes = {}
+    conferencia = {}
+    for nome, (ano, mes) in meses.items():
+        contado = RepositorioContado(repositorio)
+        studio.calcular_estatisticas_mes(contado, ano, mes)
+        conferencia[nome] = {'passadas': contado.passadas}
+        por_mes[nome] = repositorio.colunas_mes(ano, mes, studio.COLUNAS_RELATORIO)
+
+    atual, anterior = por_mes.values()
+    juntas = Estatisticas(studio.SERVICOS).adicionar_colunas(atual).juntar(
+        Estatisticas(studio.SERVICOS).adicionar_colunas(anterior)
+    )
+    emendadas = {campo: list(atual[campo]) + list(anterior[campo]) for campo in studio.COLUNAS_RELATORIO}
+    confere = juntas.resultado() == Estatisticas(studio.SERVICOS).adicionar_colunas(emendadas).resultado()
+    for medida in conferencia.values():
+        medida['juntar_confere'] = confere
+    return conferencia
+
+
+def commit_atual():
+    """Hash do commit em que o código medido está (None fora de um repositório git)"""
+    try:
+        saida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True)
+    except OSError:
+        return None
+    return saida.stdout.strip() or None
+
+
+def comparar(resultados, anteriores, tolerancia):
+    """Razão entre a mediana atual e a anterior de cada operação medida nas duas execuções"""
+    def chave(resultado):
+        return (resultado['sistema'], resultado['backend'], resultado['agendamentos'], resultado['operacao'])
+
+    antigos = {chave(resultado): resultado for resultado in anteriores}
+    comparacao = []
+    for resultado in resultados:
+        antigo = antigos.get(chave(resultado))
+        if not antigo or not antigo['mediana_ms']:
+            continue
+        razao = resultado['mediana_ms'] / antigo['mediana_ms']
+        comparacao.append(dict(
+            zip(('sistema', 'backend', 'agendamentos', 'operacao'), chave(resultado)),
+            antes_ms=antigo['mediana_ms'],
+            depois_ms=resultado['mediana_ms'],
+            razao=round(razao, 2),
+            regressao=razao > tolerancia and resultado['mediana_ms'] - antigo['mediana_ms'] > FOLGA_MS
+        ))
+    return comparacao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanhos', default='1000,10000,100000,1000000')
+    parser.add_argument('--sistemas', default='studio,pet')
+    parser.add_argument('--backends', default='json,sqlite')
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--hoje', type=date.fromisoformat, default=date.today(),
+                        help='data de referência dos dados gerados (YYYY-MM-DD)')
+    parser.add_argument('--saida', help='arquivo JSON do resultado (padrão: saída padrão)')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--tolerancia', type=float, default=1.25,
+                        help='razão depois/antes acima da qual a operação conta como regressão')
+    args = parser.parse_args()
+
+    resultados = []
+    for quantidade in (int(tamanho) for tamanho in args.tamanhos.split(',')):
+        for sistema in args.sistemas.split(','):
+            for backend in args.backends.split(','):
+                resultados += medir(sistema, backend, quantidade, args.repeticoes, args.semente, args.hoje)
+
+    relatorio = {
+        'commit': commit_atual(),
+        'executado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'semente': args.semente,
+        'hoje': args.hoje.isoformat(),
+        'resultados': resultados
+    }
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        relatorio['comparado_com'] = anterior.get('commit')
+        relatorio['comparacao'] = comparar(resultados, anterior['resultados'], args.tolerancia)
+        for item in relatorio['comparacao']:
+            if item['regressao']:
+                print(
+                    f"REGRESSÃO {item['sistema']}/{item['backend']}/{item['agendamentos']} {item['operacao']}: "
+                    f"{item['antes_ms']} -> {item['depois_ms']} ms ({item['razao']}x)",
+                    file=sys.stderr
+                )
+
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Mede o tempo de importação do núcleo ``agenda`` comparado ao das interfaces.
+
+Cada importação roda em um processo Python novo (partida a frio do
+interpretador), várias vezes, e o resultado é a mediana. O tempo do
+interpretador vazio (``-c pass``) é descontado. Também confere que
+importar o núcleo não carrega ``streamlit`` nem ``pandas``.
+
+Uso: python benchmarks/medir_importacao.py [--repeticoes 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from agenda.medicao import mediana
+
+# Nome -> comando importado em um processo novo
+IMPORTACOES = {
+    'agenda.studio': 'import agenda.studio',
+    'agenda.pet': 'import agenda.pet',
+    'streamlit': 'import streamlit',
+    'pandas': 'import pandas',
+    'streamlit + pandas (interface)': 'import streamlit, pandas, agenda.studio'
+}
+
+MODULOS_PESADOS = ('streamlit', 'pandas', 'numpy')
+
+
+def tempo_processo(codigo):
+    """Duração (s) de um ``python -c codigo`` rodando na raiz do projeto"""
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, check=True)
+    return time.perf_counter() - inicio
+
+
+def modulos_carregados(modulo):
+    """Quais módulos pesados ficam em ``sys.modules`` depois de importar ``modulo``"""
+    codigo = f'import sys, {modulo}; print(",".join(m for m in {MODULOS_PESADOS!r} if m in sys.modules))'
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, check=True, capture_output=True, text=True)
+    return [m for m in saida.stdout.strip().split(',') if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=10)
+    args = parser.parse_args()
+
+    base = mediana([tempo_processo('pass') for _ in range(args.repeticoes)])
+    resultados = []
+    for nome, codigo in IMPORTACOES.items():
+        try:
+            tempos = [tempo_processo(codigo) for _ in range(args.repeticoes)]
+        except subprocess.CalledProcessError:
+            resultados.append({'importacao': nome, 'erro': 'não instalado'})
+            continue
+        resultados.append({'importacao': nome, 'ms': round((mediana(tempos) - base) * 1000, 1)})
+
+    print(json.dumps({
+        'interpretador_ms': round(base * 1000, 1),
+        'resultados': resultados,
+        'nucleo_carrega': {modulo: modulos_carregados(modulo) for modulo in ('agenda.studio', 'agenda.pet')}
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
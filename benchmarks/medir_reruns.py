@@ -0,0 +1,90 @@
+"""Mede o custo de um rerun antes e depois das páginas virarem fragmentos.
+
+Antes, qualquer interação reexecutava o script inteiro; agora só o
+fragmento da página escolhida. O AppTest do Streamlit roda o script
+inteiro a cada interação, então as duas medidas saem da mesma execução:
+
+- ``antes``: tempo do script inteiro ('script'), o que cada interação custava;
+- ``depois``: tempo só da página (o fragmento), o que ela custa agora.
+
+Uso: python benchmarks/medir_reruns.py [--agendamentos 20000] [--repeticoes 15]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from agenda.medicao import mediana
+from benchmarks.gerador import gerar_pet, gerar_studio
+
+
+def clicar(at, rotulo):
+    """Clica no botão com o rótulo informado"""
+    next(botao for botao in at.button if botao.label == rotulo).click()
+
+
+def medir(app, pagina, funcao_pagina, interagir, repeticoes):
+    """Abre a página, repete a interação e devolve as medianas (ms)"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(RAIZ, app), default_timeout=120)
+    at.run()
+    at.sidebar.radio[0].set_value(pagina).run()
+    at.session_state.tempos = {}
+    for repeticao in range(repeticoes):
+        interagir(at, repeticao)
+        at.run()
+
+    tempos = at.session_state.tempos
+    antes = mediana(tempos.get('script', ())) * 1000
+    depois = mediana(tempos.get(funcao_pagina, ())) * 1000
+    return {
+        'app': app,
+        'pagina': pagina,
+        'antes_ms': round(antes, 2),
+        'depois_ms': round(depois, 2),
+        'reducao': f"{antes / depois:.1f}x" if depois else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--agendamentos', type=int, default=20000)
+    parser.add_argument('--repeticoes', type=int, default=15)
+    args = parser.parse_args()
+
+    hoje = date.today()
+    cenarios = [
+        ('isa3.py', "➕ Novo Agendamento", 'pagina_novo_agendamento',
+         lambda at, i: at.date_input[0].set_value(hoje + timedelta(days=i % 7))),
+        ('isa3.py', "💰 Saldo do Dia", 'pagina_saldo_do_dia',
+         lambda at, i: at.date_input[0].set_value(hoje - timedelta(days=i))),
+        ('isa3.py', "📋 Listar Todos", 'pagina_listar_todos',
+         lambda at, i: clicar(at, "Próxima ➡️")),
+        ('webcrudpetPY.py', "📋 Listar Todos", 'pagina_listar_todos',
+         lambda at, i: clicar(at, "Próxima ➡️")),
+    ]
+
+    arquivos = {
+        'agendamentos_sobracelhas.json': gerar_studio(args.agendamentos),
+        'agendamentos.json': gerar_pet(args.agendamentos)
+    }
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        for arquivo, conteudo in arquivos.items():
+            with open(os.path.join(pasta, arquivo), 'w', encoding='utf-8') as f:
+                json.dump([dict(dados, id=id_agendamento) for id_agendamento, dados in enumerate(conteudo, 1)], f, ensure_ascii=False)
+        os.chdir(pasta)
+        for app, pagina, funcao_pagina, interagir in cenarios:
+            resultados.append(medir(app, pagina, funcao_pagina, interagir, args.repeticoes))
+
+    print(json.dumps({'agendamentos': args.agendamentos, 'resultados': resultados}, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
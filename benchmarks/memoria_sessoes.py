@@ -0,0 +1,120 @@
+"""Memória do processo com várias sessões abertas ao mesmo tempo (antes e depois de um commit).
+
+Para cada commit pedido, extrai a árvore dele (``git archive``) numa pasta
+temporária, grava os mesmos dados sintéticos (``benchmarks/gerador.py``) no
+arquivo de dados da interface e, num processo novo, abre ``--sessoes``
+sessões com o ``AppTest`` do Streamlit, mantendo todas vivas, como num
+servidor com vários navegadores conectados. Mede o RSS do processo depois
+da primeira sessão e depois da última; a diferença dividida pelo número de
+sessões extras é o custo de cada sessão a mais.
+
+Uso: python benchmarks/memoria_sessoes.py [--app isa3|pet] [--sessoes 50]
+     [--agendamentos 10000] [--commits 534b10c,HEAD]
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.gerador import GERADORES
+
+# Script da interface, arquivo de dados e gerador de cada app
+APPS = {
+    'isa3': ('isa3.py', 'agendamentos_sobracelhas.json', 'studio'),
+    'pet': ('webcrudpetPY.py', 'agendamentos.json', 'pet'),
+}
+
+# Roda dentro da pasta extraída: abre as sessões e mede o RSS
+MEDIDOR = r'''
+import gc, json, os, sys
+from streamlit.testing.v1 import AppTest
+
+def rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+script, quantidade = sys.argv[1], int(sys.argv[2])
+sessoes = []
+medidas = []
+for numero in range(quantidade):
+    sessao = AppTest.from_file(script, default_timeout=600)
+    sessao.run()
+    if sessao.exception:
+        raise SystemExit(f'sessão {numero} falhou: {sessao.exception[0].message}')
+    sessoes.append(sessao)
+    if numero in (0, quantidade - 1):
+        gc.collect()
+        medidas.append(rss())
+print(json.dumps({'rss_uma_sessao': medidas[0], 'rss_todas': medidas[-1]}))
+'''
+
+
+def extrair(commit, pasta):
+    """Extrai a árvore do commit na pasta"""
+    arquivo = subprocess.run(['git', 'archive', commit], cwd=RAIZ, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(arquivo)) as tar:
+        tar.extractall(pasta, filter='data')
+
+
+def gravar_dados(caminho, sistema, quantidade, semente):
+    """Grava os agendamentos sintéticos no formato JSON original (lista com ids)"""
+    agendamentos = []
+    for numero, dados in enumerate(GERADORES[sistema](quantidade, semente, date.today()), start=1):
+        agendamentos.append(dict(dados, id=numero))
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(agendamentos, f, ensure_ascii=False, indent=4)
+
+
+def medir(commit, app, sessoes, quantidade, semente):
+    """Extrai o commit, grava os dados e mede as sessões num processo novo"""
+    script, arquivo_dados, sistema = APPS[app]
+    with tempfile.TemporaryDirectory() as pasta:
+        extrair(commit, pasta)
+        gravar_dados(os.path.join(pasta, arquivo_dados), sistema, quantidade, semente)
+        ambiente = dict(os.environ, AGENDA_BACKEND='json')
+        ambiente.pop('AGENDA_METRICAS', None)
+        saida = subprocess.run(
+            [sys.executable, '-c', MEDIDOR, script, str(sessoes)],
+            cwd=pasta, env=ambiente, capture_output=True, text=True
+        )
+        if saida.returncode != 0:
+            raise RuntimeError(f'{commit}: {saida.stderr.strip().splitlines()[-1] if saida.stderr else saida.stdout}')
+    medida = json.loads(saida.stdout.strip().splitlines()[-1])
+    por_sessao = (medida['rss_todas'] - medida['rss_uma_sessao']) / max(sessoes - 1, 1)
+    return {
+        'commit': commit,
+        'app': app,
+        'agendamentos': quantidade,
+        'sessoes': sessoes,
+        'rss_uma_sessao_mb': round(medida['rss_uma_sessao'] / 2 ** 20, 1),
+        'rss_todas_mb': round(medida['rss_todas'] / 2 ** 20, 1),
+        'por_sessao_extra_mb': round(por_sessao / 2 ** 20, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', choices=sorted(APPS), default='isa3')
+    parser.add_argument('--sessoes', type=int, default=50)
+    parser.add_argument('--agendamentos', type=int, default=10000)
+    parser.add_argument('--commits', default='HEAD', help='commits separados por vírgula (ex.: 534b10c,HEAD)')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    resultados = []
+    for commit in args.commits.split(','):
+        resultados.append(medir(commit, args.app, args.sessoes, args.agendamentos, args.semente))
+        print(f"{commit}: {resultados[-1]['rss_todas_mb']} MB com {args.sessoes} sessões", file=sys.stderr)
+    print(json.dumps(resultados, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
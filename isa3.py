@@ -1,270 +1,216 @@
 import streamlit as st
-import json
-import os
 from datetime import datetime
-import pandas as pd
 import calendar
+import os
+import time
+from agenda import metricas, periodos
+from agenda.medicao import cronometrar, registrar_tempo
+from agenda.precos import formatar_reais, precificar_tabela
+from agenda.registros import MINUTOS_POR_DIA, Agendamento, colunas, data_formatada_do_dia, hora_do_minuto
+from agenda.studio import (
+    ARQUIVO_DADOS,
+    COLUNAS_RELATORIO,
+    SERVICOS,
+    TAXAS_DESLOCAMENTO,
+    abrir,
+    calcular_duracao_servico,
+    calcular_estatisticas_mes,
+    calcular_saldo_dia,
+    calcular_saldo_mes,
+    calcular_saldo_periodo,
+    formatar_data,
+    listar_horarios_disponiveis,
+    obter_valor_agendamento,
+    separar_valores_agendamento,
+    verificar_horario_disponivel
+)
+
+# Início desta execução do script (para medir o tempo de cada rerun)
+inicio_execucao = time.perf_counter()
+
+# Métricas opcionais do rerun (AGENDA_METRICAS=metricas.prom ou metricas.jsonl)
+coletor_metricas = metricas.iniciar_rerun('isa3')
 
 st.set_page_config(page_title="Studio de Sobrancelhas - Agendamentos", layout="wide")
 
 st.title('💅 Studio de Design de Sobrancelhas')
 
 # Inicializar variáveis de sessão
-if 'agendamentos' not in st.session_state:
-    st.session_state.agendamentos = []
 if 'editar_index' not in st.session_state:
     st.session_state.editar_index = None
 if 'modo_edicao' not in st.session_state:
     st.session_state.modo_edicao = False
+if 'tempos' not in st.session_state:
+    st.session_state.tempos = {}
+if 'listar_cursores' not in st.session_state:
+    st.session_state.listar_cursores = [None]
+    st.session_state.listar_filtros = None
 
-# Horários disponíveis (9h às 18h, de hora em hora)
-HORARIOS_DISPONIVEIS = [f"{h:02d}:00" for h in range(9, 18)]
+# Armazenamento: 'json' (snapshot + log de operações) ou 'sqlite'
+# (com AGENDA_GRAVACAO_ADIADA=1 o JSON vai para o disco numa thread, sem segurar o rerun)
+BACKEND = os.environ.get('AGENDA_BACKEND', 'json')
 
-# Serviços oferecidos com preços padrão
-SERVICOS = {
-    "Cílios comun": 25.00,
-    "Design com Henna": 40.00,
-    "Combo": 110.00,
-    #"Aplicação de Cílios": 150.00,
-    "Buço": 15.00,
-    "Cílios Italiano": 70.00,
-    "Maquiagem": 100.00,
-    "Retoque Henna": 20.00
-}
+# Máximo de resultados exibidos na pesquisa (os mais relevantes)
+LIMITE_RESULTADOS = 100
 
-# Taxas de deslocamento
-TAXAS_DESLOCAMENTO = {
-    "ZN - Zona Norte": 5.00,
-    "ZL - Zona Leste": 10.00,
-    "ZS - Zona Sul": 15.00,
-    "Sem taxas": 0.00
-}
+# Opções de agendamentos por página em "Listar Todos"
+TAMANHOS_PAGINA = [25, 50, 100]
 
 # Funções auxiliares
+@metricas.medir('carregar_agendamentos', registros=None)
 def carregar_agendamentos():
-    """Carrega os agendamentos do arquivo JSON"""
-    arquivo_json = 'agendamentos_sobracelhas.json'
-    if os.path.exists(arquivo_json):
-        try:
-            with open(arquivo_json, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return []
-    return []
+    """Abre o repositório de agendamentos (com os agregados de faturamento)"""
+    return abrir(ARQUIVO_DADOS, BACKEND)
 
-def salvar_agendamentos(agendamentos):
-    """Salva os agendamentos no arquivo JSON"""
-    arquivo_json = 'agendamentos_sobracelhas.json'
+@metricas.medir('salvar_agendamento', registros=None)
+def salvar_agendamento(operacao, agendamento):
+    """Registra uma inclusão, edição ou exclusão no repositório"""
     try:
-        with open(arquivo_json, 'w', encoding='utf-8') as f:
-            json.dump(agendamentos, f, ensure_ascii=False, indent=4)
+        if operacao == 'insert':
+            repositorio.inserir(agendamento)
+        elif operacao == 'update':
+            repositorio.atualizar(agendamento)
+        else:
+            repositorio.excluir(agendamento.id)
+        metricas.somar_registros(1)
         return True
     except Exception as e:
         st.error(f'Erro ao salvar: {e}')
         return False
 
-def formatar_data(data_str):
-    """Formata data para exibição"""
-    try:
-        data_obj = datetime.strptime(data_str, '%Y-%m-%d')
-        return data_obj.strftime('%d/%m/%Y')
-    except:
-        return data_str
-
-def verificar_horario_disponivel(data, hora):
-    """Verifica se o horário já está agendado"""
-    for agendamento in st.session_state.agendamentos:
-        if agendamento['data'] == data and agendamento['hora'] == hora:
-            return False
-    return True
-
-def calcular_duracao_servico(servico):
-    """Calcula a duração estimada do serviço em minutos"""
-    duracao_map = {
-        "Design de Sobrancelhas": 30,
-        "Design com Henna": 45,
-        "Design + Henna + Tintura": 60,
-        "Aplicação de Cílios": 90,
-        "Remoção de Cílios": 30,
-        "Limpeza de Pele": 60,
-        "Maquiagem": 60,
-        "Pacote Completo": 180
-    }
-    return duracao_map.get(servico, 60)
-
-def obter_valor_agendamento(agendamento):
-    """Obtém o valor do agendamento (usando valor cadastrado ou padrão)"""
-    valor_servico = 0
-    if agendamento.get('valor') and float(agendamento['valor']) > 0:
-        valor_servico = float(agendamento['valor'])
-    else:
-        valor_servico = SERVICOS.get(agendamento['servico'], 0)
-    
-    # Adicionar taxa de deslocamento se existir
-    if agendamento.get('taxa_deslocamento'):
-        valor_servico += float(agendamento['taxa_deslocamento'])
-    
-    return valor_servico
-
-def calcular_saldo_dia(data_str=None):
-    """Calcula o faturamento total de um dia específico"""
-    if data_str is None:
-        data_str = datetime.now().strftime('%Y-%m-%d')
-    
-    saldo_total = 0
-    agendamentos_dia = []
-    
-    for agendamento in st.session_state.agendamentos:
-        if agendamento['data'] == data_str:
-            agendamentos_dia.append(agendamento)
-            saldo_total += obter_valor_agendamento(agendamento)
-    
+@st.cache_data(max_entries=16, show_spinner=False)
+def estatisticas_rapidas(_repositorio, versao, hoje):
+    """Métricas gerais, calculadas uma vez por versão dos dados e por dia (cache compartilhado entre sessões)"""
+    resumo_geral = _repositorio.resumo_geral()
     return {
-        'saldo_total': saldo_total,
-        'quantidade': len(agendamentos_dia),
-        'agendamentos': agendamentos_dia,
-        'data': data_str
+        'total': resumo_geral['quantidade'],
+        'clientes': len(resumo_geral['clientes']),
+        'taxas': resumo_geral['taxas'],
+        'saldo_hoje': _repositorio.resumo_dia(hoje.strftime('%Y-%m-%d'))['total'],
+        'saldo_mes': _repositorio.resumo_mes(hoje.year, hoje.month)['total']
     }
 
-def calcular_saldo_mes(ano=None, mes=None):
-    """Calcula o faturamento total de um mês específico"""
-    if ano is None or mes is None:
-        hoje = datetime.now()
-        ano = hoje.year
-        mes = hoje.month
-    
-    saldo_total = 0
-    agendamentos_mes = []
-    
-    for agendamento in st.session_state.agendamentos:
-        try:
-            data_agendamento = datetime.strptime(agendamento['data'], '%Y-%m-%d')
-            if data_agendamento.year == ano and data_agendamento.month == mes:
-                agendamentos_mes.append(agendamento)
-                saldo_total += obter_valor_agendamento(agendamento)
-        except:
-            continue
-    
-    return {
-        'saldo_total': saldo_total,
-        'quantidade': len(agendamentos_mes),
-        'agendamentos': agendamentos_mes,
-        'mes': mes,
-        'ano': ano,
-        'nome_mes': calendar.month_name[mes]
-    }
+def mostrar_painel_metricas(resumo):
+    """Painel de administração: tempo, bytes e registros de cada trecho do rerun"""
+    with st.sidebar.expander("⏱️ Desempenho (admin)"):
+        st.caption(f"Este rerun: {resumo['segundos'] * 1000:.1f} ms (gravando em {metricas.ARQUIVO_METRICAS})")
+        st.dataframe(metricas.linhas_do_painel(resumo), use_container_width=True, hide_index=True)
+        anteriores = [rerun for rerun in metricas.recentes if rerun['app'] == resumo['app']][-10:]
+        st.caption("Reruns recentes (fragmentos incluídos):")
+        st.dataframe(
+            [{'Momento': rerun['momento'][11:], 'Tipo': rerun['tipo'], 'ms': round(rerun['segundos'] * 1000, 1)}
+             for rerun in reversed(anteriores)],
+            use_container_width=True,
+            hide_index=True
+        )
 
-def calcular_estatisticas_mes(ano=None, mes=None):
-    """Calcula estatísticas detalhadas do mês"""
-    if ano is None or mes is None:
-        hoje = datetime.now()
-        ano = hoje.year
-        mes = hoje.month
-    
-    dados = calcular_saldo_mes(ano, mes)
-    agendamentos = dados['agendamentos']
-    
-    if not agendamentos:
-        return {
-            'servicos_mais_vendidos': [],
-            'clientes_frequentes': [],
-            'dias_mais_lotados': [],
-            'faturamento_diario': {}
-        }
-    
-    # Serviços mais vendidos
-    servicos_count = {}
-    for ag in agendamentos:
-        servico = ag['servico']
-        servicos_count[servico] = servicos_count.get(servico, 0) + 1
-    
-    servicos_mais_vendidos = sorted(servicos_count.items(), key=lambda x: x[1], reverse=True)[:5]
-    
-    # Clientes mais frequentes
-    clientes_count = {}
-    for ag in agendamentos:
-        cliente = ag['cliente']
-        clientes_count[cliente] = clientes_count.get(cliente, 0) + 1
-    
-    clientes_frequentes = sorted(clientes_count.items(), key=lambda x: x[1], reverse=True)[:5]
-    
-    # Dias mais lotados
-    dias_count = {}
-    for ag in agendamentos:
-        dia = ag['data'][8:10]  # Extrai o dia
-        dias_count[dia] = dias_count.get(dia, 0) + 1
-    
-    dias_mais_lotados = sorted(dias_count.items(), key=lambda x: x[1], reverse=True)[:5]
+def escolher_agendamento(acao):
+    """Seleção em duas etapas: filtra por período ou pesquisa e só então lista os candidatos"""
+    modo = st.radio("Encontrar por:", ["Período", "Cliente ou Telefone"], horizontal=True, key=f"{acao}_modo")
+    if modo == "Período":
+        hoje = datetime.now().date()
+        periodo = st.date_input("Período:", value=(hoje, hoje), format="DD/MM/YYYY", key=f"{acao}_periodo")
+        if len(periodo) < 2:
+            periodo = (periodo[0], periodo[0]) if periodo else (hoje, hoje)
+        candidatos, mais = repositorio.pagina(LIMITE_RESULTADOS, None, periodo[0], periodo[1], crescente=True)
+    else:
+        termo = st.text_input("Digite o cliente ou telefone:", key=f"{acao}_termo")
+        candidatos = repositorio.pesquisar(termo, limite=LIMITE_RESULTADOS) if termo else []
+        mais = len(candidatos) == LIMITE_RESULTADOS
     
-    # Faturamento por dia
-    faturamento_diario = {}
-    for ag in agendamentos:
-        dia = ag['data']
-        valor = obter_valor_agendamento(ag)
-        faturamento_diario[dia] = faturamento_diario.get(dia, 0) + valor
+    if mais:
+        st.caption(f"Mostrando os primeiros {LIMITE_RESULTADOS} agendamentos; refine o filtro para ver outros.")
     
-    return {
-        'servicos_mais_vendidos': servicos_mais_vendidos,
-        'clientes_frequentes': clientes_frequentes,
-        'dias_mais_lotados': dias_mais_lotados,
-        'faturamento_diario': faturamento_diario
-    }
+    # O valor escolhido é o id; os rótulos são montados só para os candidatos
+    rotulos = {ag.id: f"{ag.cliente} - {ag.data_formatada} {ag.hora} ({ag.servico})" for ag in candidatos}
+    id_selecionado = st.selectbox(
+        f"Selecione o agendamento para {acao}:",
+        list(rotulos),
+        format_func=rotulos.get,
+        index=None,
+        placeholder="Escolha um agendamento..." if rotulos else "Nenhum agendamento encontrado",
+        key=f"{acao}_selecionado"
+    )
+    return repositorio.obter(id_selecionado) if id_selecionado is not None else None
 
-# Carregar agendamentos do arquivo
-st.session_state.agendamentos = carregar_agendamentos()
+# Abrir o repositório de agendamentos
+try:
+    repositorio = carregar_agendamentos()
+except Exception as e:
+    st.error(f'Erro ao carregar agendamentos: {e}')
+    st.stop()
 
 # Sidebar para navegação
 st.sidebar.title("💅 Studio Isa Beauty")
 opcao = st.sidebar.radio(
     "Selecione uma opção:",
-    ["📋 Listar Todos", "📅 Agenda do Dia", "💰 Saldo do Dia", "📊 Saldo do Mês", "🔍 Pesquisar", 
-     "➕ Novo Agendamento", "✏️ Editar", "🗑️ Excluir", "🏷️ Preços"]
+    ["📋 Listar Todos", "📅 Agenda do Dia", "💰 Saldo do Dia", "📊 Saldo do Mês", "📆 Relatórios por Período", 
+     "🔍 Pesquisar", "➕ Novo Agendamento", "✏️ Editar", "🗑️ Excluir", "🏷️ Preços"]
 )
 
 # FUNÇÃO: LISTAR TODOS OS AGENDAMENTOS
-if opcao == "📋 Listar Todos":
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_listar_todos")
+def pagina_listar_todos():
+    # pandas só é carregado quando a página monta uma tabela
+    import pandas as pd
+    
     st.header("📋 Todos os Agendamentos")
     
-    if st.session_state.agendamentos:
-        # Converter para DataFrame para melhor visualização
-        df = pd.DataFrame(st.session_state.agendamentos)
-        
-        # Formatar data para exibição
-        if 'data' in df.columns:
-            df['data_formatada'] = df['data'].apply(formatar_data)
+    estatisticas = estatisticas_rapidas(repositorio, repositorio.versao, datetime.now().date())
+    if estatisticas['total']:
+        # Mostrar estatísticas (memorizadas por versão dos dados)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Total de Agendamentos", estatisticas['total'])
+        with col2:
+            st.metric("Clientes Únicos", estatisticas['clientes'])
+        with col3:
+            st.metric("Saldo Hoje", f"R$ {estatisticas['saldo_hoje']:.2f}")
+        with col4:
+            st.metric("Saldo Mês", f"R$ {estatisticas['saldo_mes']:.2f}")
         
-        # Mostrar estatísticas
+        # Filtros e tamanho da página
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total de Agendamentos", len(st.session_state.agendamentos))
+            periodo = st.date_input("Período:", value=(), format="DD/MM/YYYY")
         with col2:
-            st.metric("Clientes Únicos", df['cliente'].nunique() if 'cliente' in df.columns else 0)
+            servico_filtro = st.selectbox("Serviço:", ["Todos"] + list(SERVICOS.keys()))
         with col3:
-            hoje = datetime.now().strftime('%Y-%m-%d')
-            saldo_hoje = calcular_saldo_dia(hoje)
-            st.metric("Saldo Hoje", f"R$ {saldo_hoje['saldo_total']:.2f}")
+            ordem = st.selectbox("Ordem:", ["Mais recentes", "Mais antigos"])
         with col4:
-            hoje_obj = datetime.now()
-            saldo_mes = calcular_saldo_mes(hoje_obj.year, hoje_obj.month)
-            st.metric("Saldo Mês", f"R$ {saldo_mes['saldo_total']:.2f}")
+            tamanho_pagina = st.selectbox("Por página:", TAMANHOS_PAGINA, index=1)
         
-        # Ordenar por data e hora
-        if 'data' in df.columns and 'hora' in df.columns:
-            df['data_hora'] = pd.to_datetime(df['data'] + ' ' + df['hora'])
-            df = df.sort_values('data_hora', ascending=False)
+        data_inicio = periodo[0] if len(periodo) > 0 else None
+        data_fim = periodo[1] if len(periodo) > 1 else None
+        filtros = {'servico': servico_filtro} if servico_filtro != "Todos" else {}
         
-        # Mostrar tabela
-        colunas_mostrar = ['cliente', 'telefone', 'servico', 'data_formatada', 'hora', 'valor']
-        if all(col in df.columns for col in ['cliente', 'telefone', 'servico', 'data_formatada', 'hora']):
-            # Adicionar coluna de valor formatada
-            df['valor_formatado'] = df.apply(
-                lambda row: f"R$ {obter_valor_agendamento(row):.2f}" if row.get('valor') or row.get('servico') else "-",
-                axis=1
-            )
+        # Mudou algum filtro: volta para a primeira página
+        chave_filtros = (data_inicio, data_fim, servico_filtro, ordem, tamanho_pagina)
+        if st.session_state.listar_filtros != chave_filtros:
+            st.session_state.listar_filtros = chave_filtros
+            st.session_state.listar_cursores = [None]
+        cursores = st.session_state.listar_cursores
+        
+        # Só a página visível é lida do repositório (já ordenada por data e hora)
+        pagina, proximo_cursor = repositorio.pagina(
+            tamanho_pagina, cursores[-1], data_inicio, data_fim, filtros, crescente=(ordem == "Mais antigos")
+        )
+        
+        if pagina:
+            df = pd.DataFrame(colunas(pagina, (
+                'cliente', 'telefone', 'servico', 'data_formatada', 'hora', 'valor', 'taxa_deslocamento'
+            )))
+            
+            # Adicionar coluna de valor formatada (só para as linhas da página)
+            _, _, valor_total = precificar_tabela(df, SERVICOS)
+            tem_valor = df['servico'].fillna('').astype(bool) | df['valor'].fillna(0).astype(bool)
+            df['valor_formatado'] = formatar_reais(valor_total).where(tem_valor, "-")
             
             st.dataframe(
                 df[['cliente', 'telefone', 'servico', 'data_formatada', 'hora', 'valor_formatado']],
                 use_container_width=True,
+                hide_index=True,
                 column_config={
                     "cliente": "Cliente",
                     "telefone": "Telefone",
@@ -274,15 +220,27 @@ if opcao == "📋 Listar Todos":
                     "valor_formatado": "Valor Total"
                 }
             )
+        else:
+            st.info("📭 Nenhum agendamento para os filtros escolhidos.")
+        
+        # Navegação entre páginas (o clique ajusta o cursor e reexecuta só este fragmento)
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            st.button("⬅️ Anterior", disabled=len(cursores) == 1, on_click=cursores.pop)
+        with col2:
+            st.caption(f"Página {len(cursores)}")
+        with col3:
+            st.button("Próxima ➡️", disabled=proximo_cursor is None, on_click=cursores.append, args=(proximo_cursor,))
     else:
         st.info("📭 Nenhum agendamento cadastrado ainda.")
 
 # FUNÇÃO: AGENDA DO DIA
-elif opcao == "📅 Agenda do Dia":
+@cronometrar(st.session_state.tempos, "pagina_agenda_do_dia")
+def pagina_agenda_do_dia():
     st.header("📅 Agenda do Dia")
     
     hoje = datetime.now().strftime('%Y-%m-%d')
-    saldo_hoje = calcular_saldo_dia(hoje)
+    saldo_hoje = calcular_saldo_dia(repositorio, hoje)
     agendamentos_hoje = saldo_hoje['agendamentos']
     
     if agendamentos_hoje:
@@ -293,28 +251,27 @@ elif opcao == "📅 Agenda do Dia":
             st.info(f"💰 **Saldo do dia: R$ {saldo_hoje['saldo_total']:.2f}**")
         
         # Ordenar por hora
-        agendamentos_hoje.sort(key=lambda x: x['hora'])
+        agendamentos_hoje.sort(key=lambda x: x.inicio)
         
         for i, agendamento in enumerate(agendamentos_hoje, 1):
-            duracao = calcular_duracao_servico(agendamento['servico'])
-            valor_total = obter_valor_agendamento(agendamento)
-            valor_servico = float(agendamento.get('valor', 0)) if agendamento.get('valor') else SERVICOS.get(agendamento['servico'], 0)
-            taxa_deslocamento = float(agendamento.get('taxa_deslocamento', 0)) if agendamento.get('taxa_deslocamento') else 0
+            duracao = calcular_duracao_servico(agendamento.servico)
+            valor_servico, taxa_deslocamento = separar_valores_agendamento(agendamento)
+            valor_total = valor_servico + taxa_deslocamento
             
             with st.container(border=True):
                 col1, col2, col3 = st.columns([1, 2, 1])
                 with col1:
-                    st.markdown(f"**{agendamento['hora']}**")
+                    st.markdown(f"**{agendamento.hora}**")
                     st.caption(f"{duracao} min")
                 with col2:
-                    st.markdown(f"**{agendamento['cliente']}**")
-                    st.caption(f"{agendamento['servico']}")
-                    if agendamento.get('observacoes'):
-                        st.caption(f"📝 {agendamento['observacoes']}")
-                    if agendamento.get('taxa_deslocamento') and float(agendamento['taxa_deslocamento']) > 0:
+                    st.markdown(f"**{agendamento.cliente}**")
+                    st.caption(f"{agendamento.servico}")
+                    if agendamento.observacoes:
+                        st.caption(f"📝 {agendamento.observacoes}")
+                    if agendamento.taxa_centavos > 0:
                         st.caption(f"📍 Taxa deslocamento: R$ {taxa_deslocamento:.2f}")
                 with col3:
-                    st.caption(f"📞 {agendamento['telefone']}")
+                    st.caption(f"📞 {agendamento.telefone}")
                     st.markdown(f"**R$ {valor_total:.2f}**")
                     if taxa_deslocamento > 0:
                         st.caption(f"(serviço: R$ {valor_servico:.2f})")
@@ -322,7 +279,11 @@ elif opcao == "📅 Agenda do Dia":
         st.info("🎉 Nenhum agendamento para hoje!")
 
 # FUNÇÃO: SALDO DO DIA
-elif opcao == "💰 Saldo do Dia":
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_saldo_do_dia")
+def pagina_saldo_do_dia():
+    import pandas as pd
+    
     st.header("💰 Saldo do Dia")
     
     # Seletor de data
@@ -336,7 +297,7 @@ elif opcao == "💰 Saldo do Dia":
     
     # Calcular saldo do dia selecionado
     data_str = data_selecionada.strftime('%Y-%m-%d')
-    saldo_dia = calcular_saldo_dia(data_str)
+    saldo_dia = calcular_saldo_dia(repositorio, data_str)
     
     # Exibir métricas
     col1, col2, col3 = st.columns(3)
@@ -363,24 +324,21 @@ elif opcao == "💰 Saldo do Dia":
     if saldo_dia['agendamentos']:
         st.subheader(f"📋 Detalhes dos Agendamentos - {formatar_data(data_str)}")
         
-        # Criar DataFrame para exibição
-        detalhes_data = []
-        for ag in saldo_dia['agendamentos']:
-            valor_total = obter_valor_agendamento(ag)
-            valor_servico = float(ag.get('valor', 0)) if ag.get('valor') else SERVICOS.get(ag['servico'], 0)
-            taxa = float(ag.get('taxa_deslocamento', 0)) if ag.get('taxa_deslocamento') else 0
-            
-            detalhes_data.append({
-                'Cliente': ag['cliente'],
-                'Serviço': ag['servico'],
-                'Hora': ag['hora'],
-                'Telefone': ag['telefone'],
-                'Serviço (R$)': f"R$ {valor_servico:.2f}",
-                'Taxa (R$)': f"R$ {taxa:.2f}" if taxa > 0 else "-",
-                'Total (R$)': f"R$ {valor_total:.2f}"
-            })
+        # Criar DataFrame para exibição (valores calculados por coluna)
+        df_dia = pd.DataFrame(colunas(saldo_dia['agendamentos'], (
+            'cliente', 'servico', 'hora', 'telefone', 'valor', 'taxa_deslocamento'
+        )))
+        valor_servico, taxa, valor_total = precificar_tabela(df_dia, SERVICOS)
         
-        df_detalhes = pd.DataFrame(detalhes_data)
+        df_detalhes = pd.DataFrame({
+            'Cliente': df_dia['cliente'],
+            'Serviço': df_dia['servico'],
+            'Hora': df_dia['hora'],
+            'Telefone': df_dia['telefone'],
+            'Serviço (R$)': formatar_reais(valor_servico),
+            'Taxa (R$)': formatar_reais(taxa).where(taxa > 0, "-"),
+            'Total (R$)': formatar_reais(valor_total)
+        })
         st.dataframe(df_detalhes, use_container_width=True, hide_index=True)
         
         # Gráfico de serviços do dia (se houver dados)
@@ -390,7 +348,7 @@ elif opcao == "💰 Saldo do Dia":
             # Contar serviços
             servicos_count = {}
             for ag in saldo_dia['agendamentos']:
-                servico = ag['servico']
+                servico = ag.servico
                 servicos_count[servico] = servicos_count.get(servico, 0) + 1
             
             # Criar DataFrame para gráfico
@@ -405,7 +363,11 @@ elif opcao == "💰 Saldo do Dia":
         st.info(f"📭 Nenhum agendamento para {formatar_data(data_str)}")
 
 # FUNÇÃO: SALDO DO MÊS
-elif opcao == "📊 Saldo do Mês":
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_saldo_do_mes")
+def pagina_saldo_do_mes():
+    import pandas as pd
+    
     st.header("📊 Saldo do Mês")
     
     # Seletor de mês e ano
@@ -428,7 +390,7 @@ elif opcao == "📊 Saldo do Mês":
         )
     
     # Calcular saldo do mês selecionado
-    saldo_mes = calcular_saldo_mes(ano_selecionado, mes_selecionado)
+    saldo_mes = calcular_saldo_mes(repositorio, ano_selecionado, mes_selecionado)
     
     # Exibir métricas principais
     col1, col2, col3, col4 = st.columns(4)
@@ -458,7 +420,7 @@ elif opcao == "📊 Saldo do Mês":
         )
     
     # Calcular estatísticas detalhadas
-    estatisticas = calcular_estatisticas_mes(ano_selecionado, mes_selecionado)
+    estatisticas = calcular_estatisticas_mes(repositorio, ano_selecionado, mes_selecionado)
     
     if saldo_mes['quantidade'] > 0:
         # Layout com tabs para diferentes visualizações
@@ -561,27 +523,27 @@ elif opcao == "📊 Saldo do Mês":
         with tab4:
             st.subheader(f"📋 Todos os Agendamentos - {calendar.month_name[mes_selecionado]}/{ano_selecionado}")
             
-            # Criar DataFrame com todos os agendamentos do mês
-            detalhes_mes = []
-            for ag in saldo_mes['agendamentos']:
-                valor_total = obter_valor_agendamento(ag)
-                valor_servico = float(ag.get('valor', 0)) if ag.get('valor') else SERVICOS.get(ag['servico'], 0)
-                taxa = float(ag.get('taxa_deslocamento', 0)) if ag.get('taxa_deslocamento') else 0
+            # Criar DataFrame com todos os agendamentos do mês (só as colunas usadas;
+            # de um mês arquivado nenhum registro é montado)
+            df_mes = pd.DataFrame(repositorio.colunas_mes(ano_selecionado, mes_selecionado, COLUNAS_RELATORIO))
+            if len(df_mes):
+                df_mes['data_formatada'] = (df_mes['inicio'] // MINUTOS_POR_DIA).map(data_formatada_do_dia)
+                df_mes['hora'] = (df_mes['inicio'] % MINUTOS_POR_DIA).map(hora_do_minuto)
+                df_mes['valor'] = df_mes['valor_centavos'] / 100
+                df_mes['taxa_deslocamento'] = df_mes['taxa_centavos'] / 100
+                valor_servico, taxa, valor_total = precificar_tabela(df_mes, SERVICOS)
                 
-                detalhes_mes.append({
-                    'Data': formatar_data(ag['data']),
-                    'Dia': ag['data'],
-                    'Cliente': ag['cliente'],
-                    'Serviço': ag['servico'],
-                    'Hora': ag['hora'],
+                df_detalhes_mes = pd.DataFrame({
+                    'Data': df_mes['data_formatada'],
+                    'Inicio': df_mes['inicio'],
+                    'Cliente': df_mes['cliente'],
+                    'Serviço': df_mes['servico'],
+                    'Hora': df_mes['hora'],
                     'Serviço (R$)': valor_servico,
                     'Taxa (R$)': taxa,
                     'Total (R$)': valor_total
                 })
-            
-            if detalhes_mes:
-                df_detalhes_mes = pd.DataFrame(detalhes_mes)
-                df_detalhes_mes = df_detalhes_mes.sort_values('Dia')
+                df_detalhes_mes = df_detalhes_mes.sort_values('Inicio')
                 
                 st.dataframe(
                     df_detalhes_mes[['Data', 'Cliente', 'Serviço', 'Hora', 'Serviço (R$)', 'Taxa (R$)', 'Total (R$)']],
@@ -610,15 +572,155 @@ elif opcao == "📊 Saldo do Mês":
         nome_mes = calendar.month_name[mes_selecionado]
         st.info(f"📭 Nenhum agendamento para {nome_mes}/{ano_selecionado}")
 
+# FUNÇÃO: RELATÓRIOS POR PERÍODO
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_relatorios_periodo")
+def pagina_relatorios_periodo():
+    import pandas as pd
+    
+    st.header("📆 Relatórios por Período")
+    
+    # Seletor do período
+    hoje = datetime.now().date()
+    col1, col2 = st.columns(2)
+    with col1:
+        tipo_periodo = st.selectbox(
+            "Período:",
+            ["Semana", "Trimestre", "Ano até hoje", "Personalizado"],
+            key="periodo_tipo"
+        )
+    with col2:
+        if tipo_periodo == "Personalizado":
+            intervalo = st.date_input(
+                "Intervalo:",
+                value=(hoje.replace(day=1), hoje),
+                format="DD/MM/YYYY",
+                key="periodo_intervalo"
+            )
+            # Enquanto só a primeira data foi escolhida, o intervalo é de um dia
+            inicio, fim = (intervalo[0], intervalo[-1]) if intervalo else (hoje, hoje)
+        else:
+            data_referencia = st.date_input(
+                "Data de referência:",
+                value=hoje,
+                format="DD/MM/YYYY",
+                key="periodo_referencia"
+            )
+            if tipo_periodo == "Semana":
+                inicio, fim = periodos.semana(data_referencia)
+            elif tipo_periodo == "Trimestre":
+                inicio, fim = periodos.trimestre(data_referencia)
+            else:
+                inicio, fim = periodos.ano_ate(data_referencia)
+    
+    # Calcular o período e o mesmo período do ano anterior
+    saldo = calcular_saldo_periodo(repositorio, inicio, fim)
+    inicio_anterior, fim_anterior = periodos.ano_anterior(inicio, fim)
+    saldo_anterior = calcular_saldo_periodo(repositorio, inicio_anterior, fim_anterior)
+    
+    st.caption(
+        f"De {inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')} "
+        f"(comparado com {inicio_anterior.strftime('%d/%m/%Y')} a {fim_anterior.strftime('%d/%m/%Y')})"
+    )
+    
+    def variacao(atual, anterior):
+        """Variação percentual para o delta das métricas (None sem base de comparação)"""
+        return f"{(atual - anterior) / anterior * 100:+.1f}%" if anterior else None
+    
+    ticket = saldo['saldo_total'] / saldo['quantidade'] if saldo['quantidade'] > 0 else 0
+    ticket_anterior = saldo_anterior['saldo_total'] / saldo_anterior['quantidade'] if saldo_anterior['quantidade'] > 0 else 0
+    
+    # Exibir métricas principais (delta: contra o ano anterior)
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric(
+            "Total Agendamentos",
+            saldo['quantidade'],
+            delta=variacao(saldo['quantidade'], saldo_anterior['quantidade'])
+        )
+    with col2:
+        st.metric(
+            "Faturamento Total",
+            f"R$ {saldo['saldo_total']:.2f}",
+            delta=variacao(saldo['saldo_total'], saldo_anterior['saldo_total'])
+        )
+    with col3:
+        st.metric(
+            "Taxas de Deslocamento",
+            f"R$ {saldo['taxas']:.2f}",
+            delta=variacao(saldo['taxas'], saldo_anterior['taxas'])
+        )
+    with col4:
+        st.metric(
+            "Ticket Médio",
+            f"R$ {ticket:.2f}",
+            delta=variacao(ticket, ticket_anterior)
+        )
+    
+    if saldo['quantidade'] > 0:
+        tab1, tab2 = st.tabs(["📈 Faturamento no Período", "📅 Comparação com o Ano Anterior"])
+        
+        with tab1:
+            df_periodo = pd.DataFrame(saldo['por_dia'], columns=['Data', 'Agendamentos', 'Faturamento'])
+            df_periodo['Data'] = pd.to_datetime(df_periodo['Data'])
+            
+            # Intervalos longos: um ponto por semana ou por mês
+            dias_no_periodo = (fim - inicio).days + 1
+            if dias_no_periodo > 120:
+                df_periodo['Data'] = df_periodo['Data'].dt.to_period('M').dt.to_timestamp()
+            elif dias_no_periodo > 31:
+                df_periodo['Data'] = df_periodo['Data'] - pd.to_timedelta(df_periodo['Data'].dt.weekday, unit='D')
+            df_periodo = df_periodo.groupby('Data', as_index=False).sum()
+            
+            st.bar_chart(df_periodo.set_index('Data')['Faturamento'])
+            st.dataframe(
+                df_periodo,
+                column_config={
+                    "Data": st.column_config.DateColumn("Data", format="DD/MM/YYYY"),
+                    "Faturamento": st.column_config.NumberColumn(
+                        "Faturamento (R$)",
+                        format="R$ %.2f"
+                    )
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+        
+        with tab2:
+            df_comparacao = pd.DataFrame({
+                'Indicador': ['Agendamentos', 'Faturamento (R$)', 'Taxas (R$)', 'Ticket Médio (R$)'],
+                'Período': [saldo['quantidade'], saldo['saldo_total'], saldo['taxas'], ticket],
+                'Ano Anterior': [
+                    saldo_anterior['quantidade'], saldo_anterior['saldo_total'], saldo_anterior['taxas'], ticket_anterior
+                ]
+            })
+            df_comparacao['Variação'] = [
+                variacao(atual, anterior) or '-'
+                for atual, anterior in zip(df_comparacao['Período'], df_comparacao['Ano Anterior'])
+            ]
+            st.dataframe(
+                df_comparacao,
+                column_config={
+                    "Período": st.column_config.NumberColumn("Período", format="%.2f"),
+                    "Ano Anterior": st.column_config.NumberColumn("Ano Anterior", format="%.2f")
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+    else:
+        st.info("📭 Nenhum agendamento no período")
+
 # FUNÇÃO: PESQUISAR
-elif opcao == "🔍 Pesquisar":
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_pesquisar")
+def pagina_pesquisar():
     st.header("🔍 Pesquisar Agendamentos")
     
     col1, col2 = st.columns(2)
     with col1:
         tipo_pesquisa = st.radio(
             "Pesquisar por:",
-            ["Cliente", "Telefone", "Data"]
+            ["Cliente", "Telefone", "Cliente ou Telefone", "Data"]
         )
     
     with col2:
@@ -629,49 +731,58 @@ elif opcao == "🔍 Pesquisar":
             termo_pesquisa = st.text_input(f"Digite o {tipo_pesquisa.lower()}:")
     
     if termo_pesquisa:
-        resultados = []
-        for agendamento in st.session_state.agendamentos:
-            if tipo_pesquisa == "Cliente":
-                if termo_pesquisa.lower() in agendamento['cliente'].lower():
-                    resultados.append(agendamento)
-            elif tipo_pesquisa == "Telefone":
-                if termo_pesquisa in agendamento['telefone']:
-                    resultados.append(agendamento)
-            elif tipo_pesquisa == "Data":
-                if termo_pesquisa == agendamento['data']:
-                    resultados.append(agendamento)
+        # Busca no índice (sem diferenciar maiúsculas e acentos), mais relevantes primeiro
+        if tipo_pesquisa == "Cliente":
+            resultados = repositorio.pesquisar(termo_pesquisa, 'cliente', LIMITE_RESULTADOS)
+        elif tipo_pesquisa == "Telefone":
+            resultados = repositorio.pesquisar(termo_pesquisa, 'telefone', LIMITE_RESULTADOS)
+        elif tipo_pesquisa == "Cliente ou Telefone":
+            resultados = repositorio.pesquisar(termo_pesquisa, limite=LIMITE_RESULTADOS)
+        else:
+            resultados = repositorio.do_dia(termo_pesquisa)
         
         if resultados:
             st.success(f"✅ Encontrados {len(resultados)} resultado(s)")
+            if len(resultados) == LIMITE_RESULTADOS:
+                st.caption(f"Mostrando os {LIMITE_RESULTADOS} resultados mais relevantes; refine a pesquisa para ver outros.")
             
             for i, agendamento in enumerate(resultados, 1):
-                with st.expander(f"{agendamento['cliente']} - {formatar_data(agendamento['data'])} {agendamento['hora']}"):
+                with st.expander(f"{agendamento.cliente} - {agendamento.data_formatada} {agendamento.hora}"):
                     col1, col2 = st.columns(2)
                     with col1:
-                        st.write(f"**Cliente:** {agendamento['cliente']}")
-                        st.write(f"**Telefone:** {agendamento['telefone']}")
-                        st.write(f"**Data:** {formatar_data(agendamento['data'])}")
-                        st.write(f"**Serviço:** {agendamento['servico']}")
+                        st.write(f"**Cliente:** {agendamento.cliente}")
+                        st.write(f"**Telefone:** {agendamento.telefone}")
+                        st.write(f"**Data:** {agendamento.data_formatada}")
+                        st.write(f"**Serviço:** {agendamento.servico}")
                     with col2:
-                        st.write(f"**Hora:** {agendamento['hora']}")
-                        valor_total = obter_valor_agendamento(agendamento)
-                        valor_servico = float(agendamento.get('valor', 0)) if agendamento.get('valor') else SERVICOS.get(agendamento['servico'], 0)
-                        taxa = float(agendamento.get('taxa_deslocamento', 0)) if agendamento.get('taxa_deslocamento') else 0
+                        st.write(f"**Hora:** {agendamento.hora}")
+                        valor_servico, taxa = separar_valores_agendamento(agendamento)
+                        valor_total = valor_servico + taxa
                         
                         st.write(f"**Valor Serviço:** R$ {valor_servico:.2f}")
                         if taxa > 0:
                             st.write(f"**Taxa Deslocamento:** R$ {taxa:.2f}")
                         st.write(f"**Valor Total:** R$ {valor_total:.2f}")
                         
-                        if agendamento.get('observacoes'):
-                            st.write(f"**Observações:** {agendamento['observacoes']}")
+                        if agendamento.observacoes:
+                            st.write(f"**Observações:** {agendamento.observacoes}")
         else:
             st.warning(f"⚠️ Nenhum agendamento encontrado")
 
 # FUNÇÃO: NOVO AGENDAMENTO - CORRIGIDA (SEM CALLBACKS NO FORM)
-elif opcao == "➕ Novo Agendamento":
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_novo_agendamento")
+def pagina_novo_agendamento():
     st.header("➕ Novo Agendamento")
     
+    # Serviço e data ficam fora do formulário: ao mudar um deles só esta
+    # página (fragmento) é reexecutada e a lista de horários se atualiza
+    col1, col2 = st.columns(2)
+    with col1:
+        servico = st.selectbox("Serviço:*", list(SERVICOS.keys()))
+    with col2:
+        data = st.date_input("Data do Agendamento:*")
+    
     # Usar formulário normal sem callbacks
     with st.form("form_novo_agendamento"):
         col1, col2 = st.columns(2)
@@ -679,16 +790,10 @@ elif opcao == "➕ Novo Agendamento":
         with col1:
             cliente = st.text_input("Nome do Cliente:*")
             telefone = st.text_input("Telefone:*")
-            servico = st.selectbox("Serviço:*", list(SERVICOS.keys()))
         
         with col2:
-            data = st.date_input("Data do Agendamento:*")
-            
             # Mostrar apenas horários disponíveis
-            horarios_disponiveis = []
-            for hora in HORARIOS_DISPONIVEIS:
-                if verificar_horario_disponivel(data.strftime('%Y-%m-%d'), hora):
-                    horarios_disponiveis.append(hora)
+            horarios_disponiveis = listar_horarios_disponiveis(repositorio, data.strftime('%Y-%m-%d'), servico)
             
             if horarios_disponiveis:
                 hora = st.selectbox("Hora do Agendamento:*", horarios_disponiveis)
@@ -763,9 +868,11 @@ elif opcao == "➕ Novo Agendamento":
         if submitted:
             if not cliente or not telefone or not servico or not data or not hora:
                 st.error("⚠️ Por favor, preencha todos os campos obrigatórios!")
+            elif not verificar_horario_disponivel(repositorio, data.strftime('%Y-%m-%d'), hora, servico):
+                st.error("⚠️ Esse horário conflita com outro atendimento! Escolha outro horário.")
             else:
-                novo_agendamento = {
-                    'id': len(st.session_state.agendamentos) + 1,
+                novo_agendamento = Agendamento.de_dict({
+                    'id': None,  # atribuído pelo repositório
                     'cliente': cliente,
                     'telefone': telefone,
                     'servico': servico,
@@ -777,10 +884,9 @@ elif opcao == "➕ Novo Agendamento":
                     'valor_total': valor_total,
                     'observacoes': observacoes if observacoes else None,
                     'data_cadastro': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
+                })
                 
-                st.session_state.agendamentos.append(novo_agendamento)
-                if salvar_agendamentos(st.session_state.agendamentos):
+                if salvar_agendamento('insert', novo_agendamento):
                     st.balloons()
                     st.success(f"✅ Agendamento para {cliente} salvo com sucesso!")
                     
@@ -807,68 +913,58 @@ elif opcao == "➕ Novo Agendamento":
                     st.error("❌ Erro ao salvar agendamento!")
 
 # FUNÇÃO: EDITAR AGENDAMENTO - CORRIGIDA (SEM CALLBACKS NO FORM)
-elif opcao == "✏️ Editar":
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_editar")
+def pagina_editar():
     st.header("✏️ Editar Agendamento")
     
-    if not st.session_state.agendamentos:
+    if not repositorio.contar():
         st.info("📭 Nenhum agendamento para editar.")
     else:
-        # Listar agendamentos para seleção
-        opcoes = [f"{ag['cliente']} - {formatar_data(ag['data'])} {ag['hora']} ({ag['servico']})" 
-                 for ag in st.session_state.agendamentos]
-        
-        selecionado = st.selectbox(
-            "Selecione o agendamento para editar:",
-            opcoes,
-            index=None,
-            placeholder="Escolha um agendamento..."
-        )
+        agendamento_editar = escolher_agendamento("editar")
         
-        if selecionado:
-            index_selecionado = opcoes.index(selecionado)
-            agendamento_editar = st.session_state.agendamentos[index_selecionado]
-            
+        if agendamento_editar is not None:
             with st.form("form_editar_agendamento"):
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     cliente_edit = st.text_input(
                         "Nome do Cliente:", 
-                        value=agendamento_editar['cliente']
+                        value=agendamento_editar.cliente
                     )
                     telefone_edit = st.text_input(
                         "Telefone:", 
-                        value=agendamento_editar['telefone']
+                        value=agendamento_editar.telefone
                     )
                     servico_edit = st.selectbox(
                         "Serviço:", 
                         list(SERVICOS.keys()),
-                        index=list(SERVICOS.keys()).index(agendamento_editar['servico']) if agendamento_editar['servico'] in SERVICOS else 0
+                        index=list(SERVICOS.keys()).index(agendamento_editar.servico) if agendamento_editar.servico in SERVICOS else 0
                     )
                 
                 with col2:
-                    # Converter string para datetime
-                    data_original = datetime.strptime(agendamento_editar['data'], '%Y-%m-%d')
-                    
                     data_edit = st.date_input(
                         "Data do Agendamento:", 
-                        value=data_original
+                        value=agendamento_editar.data_objeto
                     )
                     
                     # Horário atual do agendamento
-                    hora_atual = agendamento_editar['hora']
-                    
-                    # Verificar horários disponíveis (incluindo o atual)
-                    horarios_disponiveis = []
-                    for hora in HORARIOS_DISPONIVEIS:
-                        if hora == hora_atual or verificar_horario_disponivel(data_edit.strftime('%Y-%m-%d'), hora):
-                            horarios_disponiveis.append(hora)
+                    hora_atual = agendamento_editar.hora
                     
-                    hora_edit = st.selectbox(
-                        "Hora do Agendamento:", 
-                        horarios_disponiveis,
-                        index=horarios_disponiveis.index(hora_atual) if hora_atual in horarios_disponiveis else 0
+                    # Verificar horários disponíveis (ignorando o próprio agendamento)
+                    horarios_disponiveis = listar_horarios_disponiveis(
+                        repositorio, data_edit.strftime('%Y-%m-%d'), servico_edit, ignorar_id=agendamento_editar.id
                     )
+                    
+                    if horarios_disponiveis:
+                        hora_edit = st.selectbox(
+                            "Hora do Agendamento:", 
+                            horarios_disponiveis,
+                            index=horarios_disponiveis.index(hora_atual) if hora_atual in horarios_disponiveis else 0
+                        )
+                    else:
+                        st.warning("⚠️ Não há horários disponíveis nesta data!")
+                        hora_edit = None
                 
                 # Segunda linha de campos
                 col1, col2 = st.columns(2)
@@ -877,7 +973,7 @@ elif opcao == "✏️ Editar":
                     st.subheader("📍 Taxa de Deslocamento")
                     
                     # Obter tipo de taxa atual ou usar padrão
-                    tipo_taxa_atual = agendamento_editar.get('tipo_taxa', 'Sem taxa')
+                    tipo_taxa_atual = agendamento_editar.tipo_taxa or 'Sem taxa'
                     if tipo_taxa_atual not in TAXAS_DESLOCAMENTO:
                         tipo_taxa_atual = 'Sem taxa'
                     
@@ -897,7 +993,7 @@ elif opcao == "✏️ Editar":
                 
                 with col2:
                     # Campo de valor do serviço
-                    valor_default = float(agendamento_editar.get('valor', 0)) if agendamento_editar.get('valor') else SERVICOS.get(agendamento_editar['servico'], 0)
+                    valor_default = agendamento_editar.valor if agendamento_editar.valor_centavos else SERVICOS.get(agendamento_editar.servico, 0)
                     
                     valor_edit = st.number_input(
                         "Valor do Serviço (R$):", 
@@ -930,7 +1026,7 @@ elif opcao == "✏️ Editar":
                 # Terceira linha para observações
                 observacoes_edit = st.text_area(
                     "Observações:", 
-                    value=agendamento_editar.get('observacoes', ''),
+                    value=agendamento_editar.observacoes or '',
                     height=100
                 )
                 
@@ -941,12 +1037,16 @@ elif opcao == "✏️ Editar":
                     cancelar = st.form_submit_button("❌ Cancelar")
                 
                 if submitted_edit:
-                    if not cliente_edit or not telefone_edit or not servico_edit:
+                    if not cliente_edit or not telefone_edit or not servico_edit or not hora_edit:
                         st.error("⚠️ Por favor, preencha todos os campos obrigatórios!")
+                    elif not verificar_horario_disponivel(
+                        repositorio, data_edit.strftime('%Y-%m-%d'), hora_edit, servico_edit, ignorar_id=agendamento_editar.id
+                    ):
+                        st.error("⚠️ Esse horário conflita com outro atendimento! Escolha outro horário.")
                     else:
                         # Atualizar agendamento
-                        st.session_state.agendamentos[index_selecionado] = {
-                            'id': agendamento_editar.get('id', index_selecionado + 1),
+                        agendamento_atualizado = Agendamento.de_dict({
+                            'id': agendamento_editar.id,
                             'cliente': cliente_edit,
                             'telefone': telefone_edit,
                             'servico': servico_edit,
@@ -957,11 +1057,11 @@ elif opcao == "✏️ Editar":
                             'tipo_taxa': taxa_deslocamento_edit,
                             'valor_total': valor_total_edit,
                             'observacoes': observacoes_edit if observacoes_edit else None,
-                            'data_cadastro': agendamento_editar.get('data_cadastro', datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+                            'data_cadastro': agendamento_editar.data_cadastro or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                             'data_edicao': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        }
+                        })
                         
-                        if salvar_agendamentos(st.session_state.agendamentos):
+                        if salvar_agendamento('update', agendamento_atualizado):
                             st.success("✅ Agendamento atualizado com sucesso!")
                             
                             # Mostrar resumo detalhado
@@ -983,45 +1083,35 @@ elif opcao == "✏️ Editar":
                             st.error("❌ Erro ao atualizar agendamento!")
 
 # FUNÇÃO: EXCLUIR AGENDAMENTO
-elif opcao == "🗑️ Excluir":
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_excluir")
+def pagina_excluir():
     st.header("🗑️ Excluir Agendamento")
     
-    if not st.session_state.agendamentos:
+    if not repositorio.contar():
         st.info("📭 Nenhum agendamento para excluir.")
     else:
-        # Listar agendamentos para seleção
-        opcoes = [f"{ag['cliente']} - {formatar_data(ag['data'])} {ag['hora']} ({ag['servico']})" 
-                 for ag in st.session_state.agendamentos]
-        
-        selecionado = st.selectbox(
-            "Selecione o agendamento para excluir:",
-            opcoes,
-            index=None,
-            placeholder="Escolha um agendamento..."
-        )
+        agendamento_excluir = escolher_agendamento("excluir")
         
-        if selecionado:
-            index_selecionado = opcoes.index(selecionado)
-            agendamento_excluir = st.session_state.agendamentos[index_selecionado]
-            
+        if agendamento_excluir is not None:
             # Mostrar detalhes do agendamento selecionado
             st.warning("⚠️ Você está prestes a excluir o seguinte agendamento:")
             
             col1, col2 = st.columns(2)
             with col1:
-                st.info(f"*Cliente:* {agendamento_excluir['cliente']}")
-                st.info(f"*Telefone:* {agendamento_excluir['telefone']}")
-                st.info(f"*Data:* {formatar_data(agendamento_excluir['data'])}")
-                st.info(f"*Serviço:* {agendamento_excluir['servico']}")
+                st.info(f"*Cliente:* {agendamento_excluir.cliente}")
+                st.info(f"*Telefone:* {agendamento_excluir.telefone}")
+                st.info(f"*Data:* {agendamento_excluir.data_formatada}")
+                st.info(f"*Serviço:* {agendamento_excluir.servico}")
             with col2:
-                st.info(f"*Hora:* {agendamento_excluir['hora']}")
+                st.info(f"*Hora:* {agendamento_excluir.hora}")
                 
-                valor_servico = float(agendamento_excluir.get('valor', 0)) if agendamento_excluir.get('valor') else SERVICOS.get(agendamento_excluir['servico'], 0)
+                valor_servico, _ = separar_valores_agendamento(agendamento_excluir)
                 st.info(f"*Valor Serviço:* R$ {valor_servico:.2f}")
                 
-                if agendamento_excluir.get('taxa_deslocamento') and float(agendamento_excluir['taxa_deslocamento']) > 0:
-                    taxa_valor = float(agendamento_excluir['taxa_deslocamento'])
-                    tipo_taxa = agendamento_excluir.get('tipo_taxa', 'Taxa de deslocamento')
+                if agendamento_excluir.taxa_centavos > 0:
+                    taxa_valor = agendamento_excluir.taxa_deslocamento
+                    tipo_taxa = agendamento_excluir.tipo_taxa or 'Taxa de deslocamento'
                     st.info(f"*Taxa Deslocamento:* R$ {taxa_valor:.2f} ({tipo_taxa})")
                 
                 valor_total = obter_valor_agendamento(agendamento_excluir)
@@ -1036,10 +1126,10 @@ elif opcao == "🗑️ Excluir":
             
             if confirmar:
                 # Remover agendamento
-                agendamento_removido = st.session_state.agendamentos.pop(index_selecionado)
+                agendamento_removido = agendamento_excluir
                 
-                if salvar_agendamentos(st.session_state.agendamentos):
-                    st.error(f"🗑️ Agendamento de {agendamento_removido['cliente']} excluído com sucesso!")
+                if salvar_agendamento('delete', agendamento_removido):
+                    st.error(f"🗑️ Agendamento de {agendamento_removido.cliente} excluído com sucesso!")
                     st.rerun()
                 else:
                     st.error("❌ Erro ao excluir agendamento!")
@@ -1048,7 +1138,11 @@ elif opcao == "🗑️ Excluir":
                 st.rerun()
 
 # FUNÇÃO: PREÇOS
-elif opcao == "🏷️ Preços":
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_precos")
+def pagina_precos():
+    import pandas as pd
+    
     st.header("🏷️ Tabela de Preços e Taxas")
     
     col1, col2 = st.columns(2)
@@ -1107,6 +1201,28 @@ elif opcao == "🏷️ Preços":
     - Meta diária: **R$ {(faturamento_estimado/dias_trabalhados):.2f}**
     """)
 
+# Mostrar a página escolhida (as páginas com widgets são fragmentos:
+# interagir com elas reexecuta só a própria página)
+PAGINAS = {
+    "📋 Listar Todos": pagina_listar_todos,
+    "📅 Agenda do Dia": pagina_agenda_do_dia,
+    "💰 Saldo do Dia": pagina_saldo_do_dia,
+    "📊 Saldo do Mês": pagina_saldo_do_mes,
+    "📆 Relatórios por Período": pagina_relatorios_periodo,
+    "🔍 Pesquisar": pagina_pesquisar,
+    "➕ Novo Agendamento": pagina_novo_agendamento,
+    "✏️ Editar": pagina_editar,
+    "🗑️ Excluir": pagina_excluir,
+    "🏷️ Preços": pagina_precos
+}
+try:
+    PAGINAS[opcao]()
+except BaseException:
+    # st.rerun() (depois de gravar) e st.stop() interrompem o script aqui:
+    # as métricas do rerun são fechadas (e gravadas) mesmo assim
+    metricas.encerrar_rerun(coletor_metricas)
+    raise
+
 # Rodapé com informações
 st.sidebar.markdown("---")
 st.sidebar.info("""
@@ -1125,41 +1241,31 @@ st.sidebar.info("""
 • Estatísticas de vendas
 • Inclui taxas de deslocamento
 
-Dados salvos em: *agendamentos_sobracelhas.json*
+Dados salvos em: *agendamentos_sobracelhas/* (um arquivo por mês)
 """)
 
 # Mostrar estatísticas na sidebar
 st.sidebar.markdown("### 📊 Estatísticas Rápidas")
 
-if st.session_state.agendamentos:
-    total = len(st.session_state.agendamentos)
-    
-    # Agendamentos de hoje
-    hoje = datetime.now().strftime('%Y-%m-%d')
-    saldo_hoje = calcular_saldo_dia(hoje)
-    
-    # Saldo do mês atual
-    hoje_obj = datetime.now()
-    saldo_mes = calcular_saldo_mes(hoje_obj.year, hoje_obj.month)
-    
-    # Clientes únicos
-    df = pd.DataFrame(st.session_state.agendamentos)
-    clientes_unicos = df['cliente'].nunique() if 'cliente' in df.columns else 0
-    
-    # Calcular total de taxas de deslocamento
-    total_taxas = 0
-    for ag in st.session_state.agendamentos:
-        if ag.get('taxa_deslocamento'):
-            total_taxas += float(ag['taxa_deslocamento'])
-    
+# Mesmo cache de "Listar Todos": só recalcula quando os dados ou o dia mudam
+estatisticas = estatisticas_rapidas(repositorio, repositorio.versao, datetime.now().date())
+if estatisticas['total']:
     col1, col2 = st.sidebar.columns(2)
     with col1:
-        st.metric("Total", total, delta=None)
+        st.metric("Total", estatisticas['total'], delta=None)
     with col2:
-        st.metric("Clientes", clientes_unicos, delta=None)
+        st.metric("Clientes", estatisticas['clientes'], delta=None)
     
-    st.sidebar.metric("Saldo Hoje", f"R$ {saldo_hoje['saldo_total']:.2f}")
-    st.sidebar.metric("Saldo Mês", f"R$ {saldo_mes['saldo_total']:.2f}")
-    st.sidebar.metric("Total Taxas", f"R$ {total_taxas:.2f}")
+    st.sidebar.metric("Saldo Hoje", f"R$ {estatisticas['saldo_hoje']:.2f}")
+    st.sidebar.metric("Saldo Mês", f"R$ {estatisticas['saldo_mes']:.2f}")
+    st.sidebar.metric("Total Taxas", f"R$ {estatisticas['taxas']:.2f}")
 else:
-    st.sidebar.info("Nenhum agendamento cadastrado.")
\ No newline at end of file
+    st.sidebar.info("Nenhum agendamento cadastrado.")
+
+# Tempo do script inteiro (reruns de fragmento não passam por aqui)
+registrar_tempo(st.session_state.tempos, 'script', time.perf_counter() - inicio_execucao)
+
+# Fecha as métricas do rerun (reruns de fragmento fecham as suas na própria página)
+resumo_metricas = metricas.encerrar_rerun(coletor_metricas)
+if resumo_metricas:
+    mostrar_painel_metricas(resumo_metricas)
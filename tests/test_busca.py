@@ -0,0 +1,99 @@
+"""IndiceBusca conferido contra uma varredura simples dos textos"""
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from agenda.busca import IndiceBusca, normalizar
+
+CAMPOS = ('cliente', 'telefone')
+NOMES = ['Ana', 'Beatriz', 'José', 'Luíza', 'Tânia', 'Mariana', 'Juliana']
+SOBRENOMES = ['Silva', 'Souza', 'Araújo', 'Gonçalves', 'da Silva']
+TERMOS = ['a', 'na', 'an', '87', '11 9', 'silva', 'da s', 'a s', 'gon', 'JOSE', 'zz', '9', 's', 'ana silva', 'jr', '  ana ', 'ú']
+
+
+def _registro(aleatorio, id_registro):
+    sufixo = ' Jr' if aleatorio.random() < 0.1 else ''
+    return SimpleNamespace(
+        id=id_registro,
+        cliente=f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)}{sufixo}',
+        telefone=f'11 9{aleatorio.randint(0, 9999):04d}'
+    )
+
+
+def _relevancia(texto, termo):
+    """0: igual, 1: começa, 2: palavra começa, 3: no meio, 4: não contém"""
+    if texto == termo:
+        return 0
+    if texto.startswith(termo):
+        return 1
+    if ' ' + termo in texto:
+        return 2
+    if termo in texto:
+        return 3
+    return 4
+
+
+def _nivel(registro, termo, posicoes):
+    """Melhor (relevância, posição do campo) entre os campos pedidos"""
+    return min(
+        (_relevancia(normalizar(getattr(registro, campo)), termo), posicao)
+        for posicao, campo in enumerate(CAMPOS) if posicao in posicoes
+    )
+
+
+@pytest.fixture(scope='module')
+def indice_e_registros():
+    """Índice montado em carga inicial e depois alterado aos poucos (inclusões e remoções)"""
+    aleatorio = random.Random(3)
+    registros = {id_registro: _registro(aleatorio, id_registro) for id_registro in range(1, 3001)}
+    indice = IndiceBusca(CAMPOS, list(registros.values())[:2000])
+    for id_registro in range(2001, 3001):
+        indice.adicionar(registros[id_registro])
+    for _ in range(1500):
+        id_registro = aleatorio.randint(1, 3000)
+        if aleatorio.random() < 0.5:
+            indice.remover(id_registro)
+            registros.pop(id_registro, None)
+        else:
+            registros[id_registro] = _registro(aleatorio, id_registro)
+            indice.adicionar(registros[id_registro])
+    return indice, registros
+
+
+@pytest.mark.parametrize('campos, posicoes', [(None, {0, 1}), ('cliente', {0}), ('telefone', {1})])
+@pytest.mark.parametrize('termo', TERMOS)
+def test_busca_confere_com_varredura(indice_e_registros, termo, campos, posicoes):
+    indice, registros = indice_e_registros
+    normalizado = normalizar(termo).strip()
+    encontrados = indice.buscar(termo, campos)
+
+    esperados = {id_registro for id_registro, registro in registros.items() if _nivel(registro, normalizado, posicoes)[0] < 4}
+    assert len(encontrados) == len(esperados)
+    assert set(encontrados) == esperados
+
+    niveis = [_nivel(registros[id_registro], normalizado, posicoes) for id_registro in encontrados]
+    assert niveis == sorted(niveis)
+
+    # O índice alterado aos poucos responde igual a um montado do zero
+    assert encontrados == IndiceBusca(CAMPOS, registros.values()).buscar(termo, campos)
+
+    for limite in (1, 7, 50):
+        assert indice.buscar(termo, campos, limite) == encontrados[:limite]
+
+
+def test_termo_curto_acha_trecho_no_meio():
+    indice = IndiceBusca(CAMPOS, [
+        SimpleNamespace(id=1, cliente='Bia', telefone='1'),
+        SimpleNamespace(id=2, cliente='Ana', telefone='2'),
+        SimpleNamespace(id=3, cliente='Zé', telefone='3')
+    ])
+    assert indice.buscar('a') == [2, 1]
+    assert indice.buscar('e') == [3]
+    assert indice.buscar('') == []
+    assert indice.buscar('a', limite=0) == []
+
+
+def test_campo_nao_indexado():
+    with pytest.raises(ValueError):
+        IndiceBusca(CAMPOS).buscar('ana', 'pet')
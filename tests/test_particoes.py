@@ -0,0 +1,126 @@
+"""Partições mensais: contagens, maior id, manifesto e busca conferidos contra os registros"""
+import os
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from agenda import studio
+from agenda.busca import normalizar
+from agenda.diario import _estado_arquivo
+from agenda.particoes import ARQUIVO_MANIFESTO, RepositorioParticionado
+from agenda.registros import Agendamento
+from agenda.repositorio import cache_repositorios
+
+CLIENTES = ['Ana Souza', 'Bia Lima', 'José Silva', 'Tânia']
+
+
+def _agendamento(aleatorio, data=None):
+    data = data or date.today() + timedelta(days=aleatorio.randint(-400, 90))
+    return Agendamento.de_dict({
+        'cliente': aleatorio.choice(CLIENTES),
+        'telefone': f'11 9{aleatorio.randint(0, 9999):04d}',
+        'servico': 'Combo',
+        'data': data.isoformat(),
+        'hora': f'{aleatorio.randint(8, 18):02d}:00',
+        'tipo_taxa': 'Sem taxas'
+    })
+
+
+def _abrir(arquivo):
+    """Abre do disco, sem reaproveitar o repositório guardado no cache"""
+    cache_repositorios.limpar()
+    return studio.abrir(arquivo, 'json')
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    yield str(tmp_path / 'agenda.json')
+    cache_repositorios.limpar()
+
+
+def _conferir(repositorio):
+    todos = repositorio.todos()
+    assert repositorio.contar() == len(todos)
+    for termo in ('na', '87', 'silva', '9'):
+        esperados = {
+            agendamento.id for agendamento in todos
+            if normalizar(termo) in normalizar(agendamento.cliente) or termo in agendamento.telefone
+        }
+        encontrados = repositorio.pesquisar(termo)
+        assert {agendamento.id for agendamento in encontrados} == esperados
+        assert all(repositorio.obter(agendamento.id) == agendamento for agendamento in encontrados)
+
+
+def test_operacoes_aleatorias_com_reaberturas(arquivo):
+    aleatorio = random.Random(5)
+    repositorio = _abrir(arquivo)
+    repositorio.inserir_lote([_agendamento(aleatorio) for _ in range(300)])
+    usados = {agendamento.id for agendamento in repositorio.todos()}
+
+    for passo in range(600):
+        if passo % 150 == 0:
+            repositorio = _abrir(arquivo)
+        if passo % 100 == 0:
+            # Monta o índice de busca, que depois acompanha as gravações
+            repositorio.pesquisar('an', limite=5)
+        ids = [agendamento.id for agendamento in repositorio.todos()]
+        operacao = aleatorio.random()
+        if operacao < 0.6 or not ids:
+            agendamento = repositorio.inserir(_agendamento(aleatorio))
+            assert agendamento.id not in usados
+            usados.add(agendamento.id)
+        elif operacao < 0.85:
+            agendamento = _agendamento(aleatorio)
+            agendamento.id = aleatorio.choice(ids)
+            repositorio.atualizar(agendamento)
+        else:
+            repositorio.excluir(aleatorio.choice(ids))
+        if passo % 20 == 0:
+            _conferir(repositorio)
+
+    repositorio = _abrir(arquivo)
+    _conferir(repositorio)
+    assert repositorio.maior_id == max(usados)
+
+
+def test_manifesto_so_muda_quando_um_mes_aparece_ou_some(arquivo):
+    aleatorio = random.Random(1)
+    futuro = date.today() + timedelta(days=40)
+    repositorio = _abrir(arquivo)
+    manifesto = os.path.join(repositorio.pasta, ARQUIVO_MANIFESTO)
+
+    primeiro = repositorio.inserir(_agendamento(aleatorio, futuro))
+    estado = _estado_arquivo(manifesto)
+    segundo = repositorio.inserir(_agendamento(aleatorio, futuro))
+    repositorio.excluir(segundo.id)
+    assert _estado_arquivo(manifesto) == estado
+
+    repositorio.excluir(primeiro.id)
+    assert _estado_arquivo(manifesto) != estado
+
+    repositorio = _abrir(arquivo)
+    assert repositorio.contar() == 0
+    assert repositorio.maior_id == segundo.id
+
+
+def test_particao_fora_do_manifesto_e_recuperada(arquivo, monkeypatch):
+    aleatorio = random.Random(2)
+    futuro = date.today() + timedelta(days=40)
+    repositorio = _abrir(arquivo)
+    repositorio.inserir(_agendamento(aleatorio, futuro))
+
+    # Queda entre a gravação na partição do mês novo e a do manifesto
+    def cair(self):
+        raise SystemExit('queda')
+
+    with monkeypatch.context() as contexto:
+        contexto.setattr(RepositorioParticionado, '_salvar_manifesto', cair)
+        with pytest.raises(SystemExit):
+            repositorio.inserir(_agendamento(aleatorio, futuro + timedelta(days=31)))
+
+    repositorio = _abrir(arquivo)
+    assert repositorio.contar() == 2
+    assert repositorio.obter(2) is not None
+    assert repositorio.inserir(_agendamento(aleatorio, futuro + timedelta(days=31))).id == 3
+    assert sorted(agendamento.id for agendamento in _abrir(arquivo).todos()) == [1, 2, 3]
@@ -1,54 +1,126 @@
 import streamlit as st
-import json
-import os
 from datetime import datetime
-import pandas as pd
+import os
+import time
+from agenda import metricas
+from agenda.medicao import cronometrar, registrar_tempo
+from agenda.pet import ARQUIVO_DADOS, abrir, atualizar_agendamento, criar_agendamento, excluir_agendamento
+from agenda.registros import colunas
+
+# Início desta execução do script (para medir o tempo de cada rerun)
+inicio_execucao = time.perf_counter()
+
+# Métricas opcionais do rerun (AGENDA_METRICAS=metricas.prom ou metricas.jsonl)
+coletor_metricas = metricas.iniciar_rerun('pet')
 
 st.set_page_config(page_title="Sistema de Agendamento PET", layout="wide")
 
 st.title('🐾 Sistema de Agendamento PET - CRUD Completo')
 
 # Inicializar variáveis de sessão
-if 'agendamentos' not in st.session_state:
-    st.session_state.agendamentos = []
 if 'editar_index' not in st.session_state:
     st.session_state.editar_index = None
 if 'modo_edicao' not in st.session_state:
     st.session_state.modo_edicao = False
+if 'tempos' not in st.session_state:
+    st.session_state.tempos = {}
+if 'listar_cursores' not in st.session_state:
+    st.session_state.listar_cursores = [None]
+    st.session_state.listar_filtros = None
+
+# Armazenamento: 'json' (snapshot + log de operações) ou 'sqlite'
+# (com AGENDA_GRAVACAO_ADIADA=1 o JSON vai para o disco numa thread, sem segurar o rerun)
+BACKEND = os.environ.get('AGENDA_BACKEND', 'json')
+
+# Máximo de resultados exibidos na pesquisa (os mais relevantes)
+LIMITE_RESULTADOS = 100
+
+# Opções de agendamentos por página em "Listar Todos"
+TAMANHOS_PAGINA = [25, 50, 100]
 
 # Funções auxiliares
+@metricas.medir('carregar_agendamentos', registros=None)
 def carregar_agendamentos():
-    """Carrega os agendamentos do arquivo JSON"""
-    arquivo_json = 'agendamentos.json'
-    if os.path.exists(arquivo_json):
-        try:
-            with open(arquivo_json, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return []
-    return []
+    """Abre o repositório de agendamentos"""
+    return abrir(ARQUIVO_DADOS, BACKEND)
 
-def salvar_agendamentos(agendamentos):
-    """Salva os agendamentos no arquivo JSON"""
-    arquivo_json = 'agendamentos.json'
+@metricas.medir('salvar_agendamento', registros=None)
+def salvar_agendamento(operacao, *args):
+    """Executa uma operação do CRUD (criar, atualizar ou excluir) sobre o repositório"""
     try:
-        with open(arquivo_json, 'w', encoding='utf-8') as f:
-            json.dump(agendamentos, f, ensure_ascii=False, indent=4)
+        operacao(repositorio, *args)
+        metricas.somar_registros(1)
         return True
     except Exception as e:
         st.error(f'Erro ao salvar: {e}')
         return False
 
-def formatar_data(data_str):
-    """Formata data para exibição"""
-    try:
-        data_obj = datetime.strptime(data_str, '%Y-%m-%d')
-        return data_obj.strftime('%d/%m/%Y')
-    except:
-        return data_str
+def mostrar_painel_metricas(resumo):
+    """Painel de administração: tempo, bytes e registros de cada trecho do rerun"""
+    with st.sidebar.expander("⏱️ Desempenho (admin)"):
+        st.caption(f"Este rerun: {resumo['segundos'] * 1000:.1f} ms (gravando em {metricas.ARQUIVO_METRICAS})")
+        st.dataframe(metricas.linhas_do_painel(resumo), use_container_width=True, hide_index=True)
+        anteriores = [rerun for rerun in metricas.recentes if rerun['app'] == resumo['app']][-10:]
+        st.caption("Reruns recentes (fragmentos incluídos):")
+        st.dataframe(
+            [{'Momento': rerun['momento'][11:], 'Tipo': rerun['tipo'], 'ms': round(rerun['segundos'] * 1000, 1)}
+             for rerun in reversed(anteriores)],
+            use_container_width=True,
+            hide_index=True
+        )
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def total_agendamentos(_repositorio, versao):
+    """Total de agendamentos por versão dos dados (a sidebar só precisa dele)"""
+    return _repositorio.contar()
 
-# Carregar agendamentos do arquivo
-st.session_state.agendamentos = carregar_agendamentos()
+@st.cache_data(max_entries=16, show_spinner=False)
+def estatisticas_rapidas(_repositorio, versao):
+    """Totais gerais, calculados uma vez por versão dos dados (cache compartilhado entre sessões).
+
+    Os distintos percorrem o histórico inteiro: só "Listar Todos" pede.
+    """
+    return {
+        'total': total_agendamentos(_repositorio, versao),
+        'pets': _repositorio.contar_distintos('pet'),
+        'tutores': _repositorio.contar_distintos('tutor')
+    }
+
+def escolher_agendamento(acao):
+    """Seleção em duas etapas: filtra por período ou pesquisa e só então lista os candidatos"""
+    modo = st.radio("Encontrar por:", ["Período", "Tutor ou Pet"], horizontal=True, key=f"{acao}_modo")
+    if modo == "Período":
+        hoje = datetime.now().date()
+        periodo = st.date_input("Período:", value=(hoje, hoje), format="DD/MM/YYYY", key=f"{acao}_periodo")
+        if len(periodo) < 2:
+            periodo = (periodo[0], periodo[0]) if periodo else (hoje, hoje)
+        candidatos, mais = repositorio.pagina(LIMITE_RESULTADOS, None, periodo[0], periodo[1], crescente=True)
+    else:
+        termo = st.text_input("Digite o nome do tutor ou pet:", key=f"{acao}_termo")
+        candidatos = repositorio.pesquisar(termo, limite=LIMITE_RESULTADOS) if termo else []
+        mais = len(candidatos) == LIMITE_RESULTADOS
+    
+    if mais:
+        st.caption(f"Mostrando os primeiros {LIMITE_RESULTADOS} agendamentos; refine o filtro para ver outros.")
+    
+    # O valor escolhido é o id; os rótulos são montados só para os candidatos
+    rotulos = {ag.id: f"{ag.pet} - {ag.data_formatada} {ag.hora} (Tutor: {ag.tutor})" for ag in candidatos}
+    id_selecionado = st.selectbox(
+        f"Selecione o agendamento para {acao}:",
+        list(rotulos),
+        format_func=rotulos.get,
+        index=None,
+        placeholder="Escolha um agendamento..." if rotulos else "Nenhum agendamento encontrado",
+        key=f"{acao}_selecionado"
+    )
+    return repositorio.obter(id_selecionado) if id_selecionado is not None else None
+
+# Abrir o repositório de agendamentos
+try:
+    repositorio = carregar_agendamentos()
+except Exception as e:
+    st.error(f'Erro ao carregar agendamentos: {e}')
+    st.stop()
 
 # Sidebar para navegação
 st.sidebar.title("Navegação")
@@ -58,81 +130,122 @@ opcao = st.sidebar.radio(
 )
 
   # FUNÇÃO: LISTAR TODOS OS AGENDAMENTOS
-if opcao == "📋 Listar Todos":
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_listar_todos")
+def pagina_listar_todos():
+    # pandas só é carregado quando a página monta uma tabela
+    import pandas as pd
+    
     st.header("📋 Todos os Agendamentos")
     
-    if st.session_state.agendamentos:
-        # Converter para DataFrame para melhor visualização
-        df = pd.DataFrame(st.session_state.agendamentos)
-        
-        # Formatar data para exibição
-        if 'data' in df.columns:
-            df['data_formatada'] = df['data'].apply(formatar_data)
+    estatisticas = estatisticas_rapidas(repositorio, repositorio.versao)
+    if estatisticas['total']:
+        # Mostrar estatísticas (memorizadas por versão dos dados)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total de Agendamentos", estatisticas['total'])
+        with col2:
+            st.metric("Pets Únicos", estatisticas['pets'])
+        with col3:
+            st.metric("Tutores Únicos", estatisticas['tutores'])
         
-        # Mostrar estatísticas
+        # Filtros e tamanho da página
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total de Agendamentos", len(st.session_state.agendamentos))
+            periodo = st.date_input("Período:", value=(), format="DD/MM/YYYY")
         with col2:
-            st.metric("Pets Únicos", df['pet'].nunique() if 'pet' in df.columns else 0)
+            ordem = st.selectbox("Ordem:", ["Mais recentes", "Mais antigos"])
         with col3:
-            st.metric("Tutores Únicos", df['tutor'].nunique() if 'tutor' in df.columns else 0)
+            tamanho_pagina = st.selectbox("Por página:", TAMANHOS_PAGINA, index=1)
         
-        # Mostrar tabela
-        st.dataframe(
-            df[['tutor', 'pet', 'data_formatada', 'hora']] if 'data_formatada' in df.columns else df,
-            use_container_width=True,
-            column_config={
-                "tutor": "Tutor",
-                "pet": "Pet",
-                "data_formatada": "Data",
-                "hora": "Hora"
-            }
+        data_inicio = periodo[0] if len(periodo) > 0 else None
+        data_fim = periodo[1] if len(periodo) > 1 else None
+        
+        # Mudou algum filtro: volta para a primeira página
+        chave_filtros = (data_inicio, data_fim, ordem, tamanho_pagina)
+        if st.session_state.listar_filtros != chave_filtros:
+            st.session_state.listar_filtros = chave_filtros
+            st.session_state.listar_cursores = [None]
+        cursores = st.session_state.listar_cursores
+        
+        # Só a página visível é lida do repositório (já ordenada por data e hora)
+        pagina, proximo_cursor = repositorio.pagina(
+            tamanho_pagina, cursores[-1], data_inicio, data_fim, crescente=(ordem == "Mais antigos")
         )
+        
+        if pagina:
+            df = pd.DataFrame(colunas(pagina, ('tutor', 'pet', 'data_formatada', 'hora')))
+            st.dataframe(
+                df,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "tutor": "Tutor",
+                    "pet": "Pet",
+                    "data_formatada": "Data",
+                    "hora": "Hora"
+                }
+            )
+        else:
+            st.info("📭 Nenhum agendamento no período escolhido.")
+        
+        # Navegação entre páginas (o clique ajusta o cursor e reexecuta só este fragmento)
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            st.button("⬅️ Anterior", disabled=len(cursores) == 1, on_click=cursores.pop)
+        with col2:
+            st.caption(f"Página {len(cursores)}")
+        with col3:
+            st.button("Próxima ➡️", disabled=proximo_cursor is None, on_click=cursores.append, args=(proximo_cursor,))
     else:
         st.info("📭 Nenhum agendamento cadastrado ainda.")
 
 # FUNÇÃO: PESQUISAR POR NOME
-elif opcao == "🔍 Pesquisar":
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_pesquisar")
+def pagina_pesquisar():
     st.header("🔍 Pesquisar Agendamentos")
     
     col1, col2 = st.columns(2)
     with col1:
         tipo_pesquisa = st.radio(
             "Pesquisar por:",
-            ["Tutor", "Pet"]
+            ["Tutor", "Pet", "Tutor ou Pet"]
         )
     
     with col2:
         termo_pesquisa = st.text_input(f"Digite o nome do {tipo_pesquisa.lower()}:")
     
     if termo_pesquisa:
-        resultados = []
-        for agendamento in st.session_state.agendamentos:
-            if tipo_pesquisa == "Tutor":
-                if termo_pesquisa.lower() in agendamento['tutor'].lower():
-                    resultados.append(agendamento)
-            else:
-                if termo_pesquisa.lower() in agendamento['pet'].lower():
-                    resultados.append(agendamento)
+        # Busca no índice (sem diferenciar maiúsculas e acentos), mais relevantes primeiro
+        if tipo_pesquisa == "Tutor":
+            resultados = repositorio.pesquisar(termo_pesquisa, 'tutor', LIMITE_RESULTADOS)
+        elif tipo_pesquisa == "Pet":
+            resultados = repositorio.pesquisar(termo_pesquisa, 'pet', LIMITE_RESULTADOS)
+        else:
+            resultados = repositorio.pesquisar(termo_pesquisa, limite=LIMITE_RESULTADOS)
         
         if resultados:
             st.success(f"✅ Encontrados {len(resultados)} resultado(s)")
+            if len(resultados) == LIMITE_RESULTADOS:
+                st.caption(f"Mostrando os {LIMITE_RESULTADOS} resultados mais relevantes; refine a pesquisa para ver outros.")
             
             for i, agendamento in enumerate(resultados, 1):
-                with st.expander(f"Agendamento {i}: {agendamento['pet']} - {formatar_data(agendamento['data'])}"):
+                with st.expander(f"Agendamento {i}: {agendamento.pet} - {agendamento.data_formatada}"):
                     col1, col2 = st.columns(2)
                     with col1:
-                        st.write(f"*Tutor:* {agendamento['tutor']}")
-                        st.write(f"*Data:* {formatar_data(agendamento['data'])}")
+                        st.write(f"*Tutor:* {agendamento.tutor}")
+                        st.write(f"*Data:* {agendamento.data_formatada}")
                     with col2:
-                        st.write(f"*Pet:* {agendamento['pet']}")
-                        st.write(f"*Hora:* {agendamento['hora']}")
+                        st.write(f"*Pet:* {agendamento.pet}")
+                        st.write(f"*Hora:* {agendamento.hora}")
         else:
             st.warning(f"⚠️ Nenhum agendamento encontrado para '{termo_pesquisa}'")
 
 # FUNÇÃO: CRIAR NOVO AGENDAMENTO
-elif opcao == "➕ Novo Agendamento":
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_novo_agendamento")
+def pagina_novo_agendamento():
     st.header("➕ Novo Agendamento")
     
     with st.form("form_novo_agendamento"):
@@ -156,16 +269,7 @@ elif opcao == "➕ Novo Agendamento":
             if not tutor or not pet:
                 st.error("⚠️ Por favor, preencha todos os campos obrigatórios!")
             else:
-                novo_agendamento = {
-                    'id': len(st.session_state.agendamentos) + 1,
-                    'tutor': tutor,
-                    'pet': pet,
-                    'data': data.strftime('%Y-%m-%d'),
-                    'hora': hora.strftime('%H:%M')
-                }
-                
-                st.session_state.agendamentos.append(novo_agendamento)
-                if salvar_agendamentos(st.session_state.agendamentos):
+                if salvar_agendamento(criar_agendamento, tutor, pet, data, hora):
                     st.balloons()
                     st.success(f"✅ Agendamento para {pet} salvo com sucesso!")
                     st.rerun()
@@ -173,50 +277,39 @@ elif opcao == "➕ Novo Agendamento":
                     st.error("❌ Erro ao salvar agendamento!")
 
 # FUNÇÃO: EDITAR AGENDAMENTO
-elif opcao == "✏️ Editar":
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_editar")
+def pagina_editar():
     st.header("✏️ Editar Agendamento")
     
-    if not st.session_state.agendamentos:
+    if not repositorio.contar():
         st.info("📭 Nenhum agendamento para editar.")
     else:
-        # Listar agendamentos para seleção
-        opcoes = [f"{ag['pet']} - {formatar_data(ag['data'])} {ag['hora']} (Tutor: {ag['tutor']})" 
-                 for ag in st.session_state.agendamentos]
+        agendamento_editar = escolher_agendamento("editar")
         
-        selecionado = st.selectbox(
-            "Selecione o agendamento para editar:",
-            opcoes,
-            index=None,
-            placeholder="Escolha um agendamento..."
-        )
-        
-        if selecionado:
-            index_selecionado = opcoes.index(selecionado)
-            agendamento_editar = st.session_state.agendamentos[index_selecionado]
-            
+        if agendamento_editar is not None:
             with st.form("form_editar_agendamento"):
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     tutor_edit = st.text_input(
                         "Nome do Tutor:", 
-                        value=agendamento_editar['tutor'],
+                        value=agendamento_editar.tutor,
                         key="editar_tutor"
                     )
                     pet_edit = st.text_input(
                         "Nome do Pet:", 
-                        value=agendamento_editar['pet'],
+                        value=agendamento_editar.pet,
                         key="editar_pet"
                     )
                 
                 with col2:
-                    # Converter string para datetime
-                    data_original = datetime.strptime(agendamento_editar['data'], '%Y-%m-%d')
-                    hora_original = datetime.strptime(agendamento_editar['hora'], '%H:%M').time()
+                    # A hora volta para time; a data já vem pronta do registro
+                    hora_original = datetime.strptime(agendamento_editar.hora, '%H:%M').time()
                     
                     data_edit = st.date_input(
                         "Data do Agendamento:", 
-                        value=data_original,
+                        value=agendamento_editar.data_objeto,
                         key="editar_data"
                     )
                     hora_edit = st.time_input(
@@ -236,52 +329,36 @@ elif opcao == "✏️ Editar":
                         st.error("⚠️ Por favor, preencha todos os campos!")
                     else:
                         # Atualizar agendamento
-                        st.session_state.agendamentos[index_selecionado] = {
-                            'id': agendamento_editar.get('id', index_selecionado + 1),
-                            'tutor': tutor_edit,
-                            'pet': pet_edit,
-                            'data': data_edit.strftime('%Y-%m-%d'),
-                            'hora': hora_edit.strftime('%H:%M')
-                        }
-                        
-                        if salvar_agendamentos(st.session_state.agendamentos):
+                        if salvar_agendamento(
+                            atualizar_agendamento, agendamento_editar.id, tutor_edit, pet_edit, data_edit, hora_edit
+                        ):
                             st.success("✅ Agendamento atualizado com sucesso!")
                             st.rerun()
                         else:
                             st.error("❌ Erro ao atualizar agendamento!")
 
 # FUNÇÃO: EXCLUIR AGENDAMENTO
-elif opcao == "🗑️ Excluir":
+@st.fragment
+@cronometrar(st.session_state.tempos, "pagina_excluir")
+def pagina_excluir():
     st.header("🗑️ Excluir Agendamento")
     
-    if not st.session_state.agendamentos:
+    if not repositorio.contar():
         st.info("📭 Nenhum agendamento para excluir.")
     else:
-        # Listar agendamentos para seleção
-        opcoes = [f"{ag['pet']} - {formatar_data(ag['data'])} {ag['hora']} (Tutor: {ag['tutor']})" 
-                 for ag in st.session_state.agendamentos]
+        agendamento_excluir = escolher_agendamento("excluir")
         
-        selecionado = st.selectbox(
-            "Selecione o agendamento para excluir:",
-            opcoes,
-            index=None,
-            placeholder="Escolha um agendamento..."
-        )
-        
-        if selecionado:
-            index_selecionado = opcoes.index(selecionado)
-            agendamento_excluir = st.session_state.agendamentos[index_selecionado]
-            
+        if agendamento_excluir is not None:
             # Mostrar detalhes do agendamento selecionado
             st.warning("⚠️ Você está prestes a excluir o seguinte agendamento:")
             
             col1, col2 = st.columns(2)
             with col1:
-                st.info(f"*Tutor:* {agendamento_excluir['tutor']}")
-                st.info(f"*Data:* {formatar_data(agendamento_excluir['data'])}")
+                st.info(f"*Tutor:* {agendamento_excluir.tutor}")
+                st.info(f"*Data:* {agendamento_excluir.data_formatada}")
             with col2:
-                st.info(f"*Pet:* {agendamento_excluir['pet']}")
-                st.info(f"*Hora:* {agendamento_excluir['hora']}")
+                st.info(f"*Pet:* {agendamento_excluir.pet}")
+                st.info(f"*Hora:* {agendamento_excluir.hora}")
             
             # Confirmação de exclusão
             col1, col2, col3 = st.columns(3)
@@ -292,14 +369,31 @@ elif opcao == "🗑️ Excluir":
             
             if confirmar:
                 # Remover agendamento
-                agendamento_removido = st.session_state.agendamentos.pop(index_selecionado)
+                agendamento_removido = agendamento_excluir
                 
-                if salvar_agendamentos(st.session_state.agendamentos):
-                    st.error(f"🗑️ Agendamento de {agendamento_removido['pet']} excluído com sucesso!")
+                if salvar_agendamento(excluir_agendamento, agendamento_removido.id):
+                    st.error(f"🗑️ Agendamento de {agendamento_removido.pet} excluído com sucesso!")
                     st.rerun()
                 else:
                     st.error("❌ Erro ao excluir agendamento!")
 
+# Mostrar a página escolhida (as páginas com widgets são fragmentos:
+# interagir com elas reexecuta só a própria página)
+PAGINAS = {
+    "📋 Listar Todos": pagina_listar_todos,
+    "🔍 Pesquisar": pagina_pesquisar,
+    "➕ Novo Agendamento": pagina_novo_agendamento,
+    "✏️ Editar": pagina_editar,
+    "🗑️ Excluir": pagina_excluir
+}
+try:
+    PAGINAS[opcao]()
+except BaseException:
+    # st.rerun() (depois de gravar) e st.stop() interrompem o script aqui:
+    # as métricas do rerun são fechadas (e gravadas) mesmo assim
+    metricas.encerrar_rerun(coletor_metricas)
+    raise
+
 # Rodapé com informações
 st.sidebar.markdown("---")
 st.sidebar.info("""
@@ -310,11 +404,19 @@ st.sidebar.info("""
 - ✏️ *Editar*: Modifique agendamentos existentes
 - 🗑️ *Excluir*: Remova agendamentos
 
-Todos os dados são salvos em agendamentos.json
+Todos os dados são salvos na pasta agendamentos/ (um arquivo por mês)
 """)
 
 # Mostrar estatísticas na sidebar
-if st.session_state.agendamentos:
+total = total_agendamentos(repositorio, repositorio.versao)
+if total:
     st.sidebar.markdown("### 📊 Estatísticas")
-    total = len(st.session_state.agendamentos)
     st.sidebar.metric("Agendamentos Totais", total)
+
+# Tempo do script inteiro (reruns de fragmento não passam por aqui)
+registrar_tempo(st.session_state.tempos, 'script', time.perf_counter() - inicio_execucao)
+
+# Fecha as métricas do rerun (reruns de fragmento fecham as suas na própria página)
+resumo_metricas = metricas.encerrar_rerun(coletor_metricas)
+if resumo_metricas:
+    mostrar_painel_metricas(resumo_metricas)